@@ -74,7 +74,7 @@ export class Bearer {
      * @return Promise for call completion
      */
     public async callConnect() {
-        call(this._bearerInterface, 'Connect', []);
+        return call(this._bearerInterface, 'Connect', {});
     }
 
     /**
@@ -83,7 +83,7 @@ export class Bearer {
      * @return Promise for call completion
      */
     public async callDisconnect() {
-        call(this._bearerInterface, 'Disconnect', []);
+        return call(this._bearerInterface, 'Disconnect', {});
     }
 
     private _listenForPropertyChanges() {
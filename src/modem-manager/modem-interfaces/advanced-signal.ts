@@ -79,7 +79,7 @@ export class AdvancedSignal {
      */
     public async setupPolling(rate: number) {
         if(rate >= 0) {
-            return call(this._advancedSignalInterface, 'Setup', rate);
+            return call(this._advancedSignalInterface, 'Setup', {}, rate);
         }
 
         throw 'AdvancedSignal.setupPolling: Invalid input: rate must be a positive integer. It is fed into DBus as an unsigned 32-bit integer.';
@@ -108,7 +108,7 @@ export class AdvancedSignal {
                 "error-rate-threshold": errorRate
             }
 
-            return call(this._advancedSignalInterface, 'SetupThreshold', {}, settings);
+            return call(this._advancedSignalInterface, 'SetupThresholds', {}, settings);
         }
 
         throw 'AdvancedSignal.setupThreshold: Invalid input: threshold must be a positive integer. It is fed into DBus as an unsigned 32-bit integer.';
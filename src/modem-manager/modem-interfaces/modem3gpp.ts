@@ -72,17 +72,17 @@ export class Modem3gpp {
     }
 
     /**
-     * @hidden
      * Request registration with a given mobile network.
      * @param operator_id The operator ID (ie, "MCCMNC", like "310260") to register. An empty string can be used to register to the home network.
+     * @return Promise for call completion
      */
-    public register(operator_id: string) {
-
+    public async register(operator_id: string) {
+        return call(this._modem3gppInterface, 'Register', {}, operator_id);
     }
 
     /**
-     * @hidden
-     * @returns array of dictionaries with the following format
+     * Scan for available networks.
+     * @returns Promise of an array of dictionaries with the following format
      * @link Modem3gppNetworkAvailability
      * @link ModemAccessTechnology
      * 
@@ -102,9 +102,9 @@ export class Modem3gpp {
      * }
      * ```
      */
-    public scan(): object[] {
-
-        return [];
+    public async scan(): Promise<object[]> {
+        // network scans can take minutes on real hardware
+        return call(this._modem3gppInterface, 'Scan', {timeout: 120000});
     }
 
     /**
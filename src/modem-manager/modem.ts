@@ -323,7 +323,6 @@ export class Modem {
     }
 
     /**
-     * @hidden
      * Enable or disable the modem.
      * When enabled, the modem's radio is powered on and data sessions, voice calls, location services, and Short Message Service may be available.
      * When disabled, the modem enters low-power state and no network-related operations are available. 
@@ -331,7 +330,7 @@ export class Modem {
      * @return Promise for call completion
      */
     public async callEnable(toggle: boolean = true) {
-
+        return call(this._modemInterface, 'Enable', {}, toggle);
     }
 
     /** 
@@ -354,7 +353,7 @@ export class Modem {
     public async callCreateBearer(bearerProperties: Partial<BearerProperties>): Promise<Bearer> {
         return new Promise(async (resolve, reject) => {
             try {
-                let bearerPath = await call(this._modemInterface, 'CreateBearer', bearerProperties);
+                let bearerPath = await call(this._modemInterface, 'CreateBearer', {}, bearerProperties);
                 let bearer = await Bearer.init(this._bus, bearerPath);
                 resolve(bearer);
             } catch(e) {
@@ -364,14 +363,13 @@ export class Modem {
     }
 
     /**
-     * @hidden
      * Delete an existing packet data bearer.
      * If the bearer is currently active and providing packet data server, it will be disconnected and that packet data service will terminate. 
      * @param objectPath String: Object path of the bearer to delete
      * @return Promise for call completion
      */
     public async callDeleteBearer(objectPath: string) {
-
+        return call(this._modemInterface, 'DeleteBearer', {}, objectPath);
     }
 
     /**
@@ -6,10 +6,18 @@ dbus-daemon --config-file=/usr/share/dbus-1/system.conf --print-address
 
 cd /usr/src/chadburn-test/python-dbusmock
 
-python3 -m dbusmock --template modemmanager > /dev/null &
-sleep 1
-python3 -m dbusmock --template networkmanager > /dev/null &
-sleep 1
+rm -f /run/dbusmock.ready
+python3 -m dbusmock --template modemmanager --template networkmanager --ready-file /run/dbusmock.ready > /dev/null &
+mock_pid=$!
+
+# wait until both mocks own their bus names and have loaded their templates
+while [ ! -e /run/dbusmock.ready ]; do
+    if ! kill -0 $mock_pid 2> /dev/null; then
+        echo "dbusmock failed to start" >&2
+        exit 1
+    fi
+    sleep 0.05
+done
 
 cd /usr/src/chadburn-test
 npm run test
\ No newline at end of file
@@ -0,0 +1,197 @@
+# coding: UTF-8
+'''Main entry point for running dbusmock as a program.
+
+Besides a single mock object, this can serve several templates with their bus
+names in one process and main loop, and tell a supervisor when they are all
+ready. Each template gets its own bus connection, so that its objects are only
+reachable under its own bus name.
+'''
+
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.  See http://www.gnu.org/copyleft/lgpl.html for the full text
+# of the license.
+
+import argparse
+import json
+import os
+import socket
+import sys
+from typing import Any, Dict, List, Optional
+
+import dbus
+import dbus.mainloop.glib
+import dbus.service
+from gi.repository import GLib
+
+from dbusmock import mockobject
+
+
+def parse_args() -> argparse.Namespace:
+    '''Parse command line arguments'''
+
+    parser = argparse.ArgumentParser(description='mock D-Bus object')
+    parser.add_argument('-s', '--system', action='store_true',
+                        help='put object(s) on system bus (default: session bus or template\'s SYSTEM_BUS flag)')
+    parser.add_argument('--session', action='store_true',
+                        help='put object(s) on session bus (default without template; overrides template\'s SYSTEM_BUS flag)')
+    parser.add_argument('-l', '--logfile', metavar='PATH',
+                        help='path of log file')
+    parser.add_argument('-t', '--template', metavar='NAME', action='append',
+                        help='template to load (instead of specifying name, path, interface); '
+                        'can be given several times to serve several templates in one process')
+    parser.add_argument('name', metavar='NAME', nargs='?',
+                        help='D-Bus name to claim (e. g. "com.example.MyService") (if not using -t)')
+    parser.add_argument('path', metavar='PATH', nargs='?',
+                        help='D-Bus object path for initial/main object (if not using -t)')
+    parser.add_argument('interface', metavar='INTERFACE', nargs='?',
+                        help='main D-Bus interface name for initial object (if not using -t)')
+    parser.add_argument('-m', '--is-object-manager', action='store_true',
+                        help='automatically implement the org.freedesktop.DBus.ObjectManager interface')
+    parser.add_argument('-p', '--parameters', metavar='JSON', action='append',
+                        help='JSON dictionary of parameters to pass to the template; with several templates, '
+                        'the n-th --parameters applies to the n-th --template')
+    parser.add_argument('--seed',
+                        help='master seed for the templates\' random values (default: $DBUSMOCK_SEED or 0)')
+    parser.add_argument('--ready-fd', metavar='FD', type=int,
+                        help='write "READY=1" to this file descriptor and close it once all names are '
+                        'owned and all templates are loaded')
+    parser.add_argument('--ready-file', metavar='PATH',
+                        help='create this file (containing the process ID) once all names are owned and '
+                        'all templates are loaded')
+
+    args = parser.parse_args()
+
+    if args.template:
+        if args.name:
+            parser.error('--template and specifying NAME are mutually exclusive')
+        if len(args.parameters or []) > len(args.template):
+            parser.error('more --parameters than --template options')
+    else:
+        if not args.name or not args.path or not args.interface:
+            parser.error('Not using a template, you must specify NAME, PATH, and INTERFACE')
+        if args.parameters:
+            parser.error('--parameters only makes sense with --template')
+
+    if args.system and args.session:
+        parser.error('--system and --session are mutually exclusive')
+
+    return args
+
+
+def parse_parameters(text: Optional[str]) -> Optional[Dict[str, Any]]:
+    '''Parse a --parameters argument, exiting on errors'''
+
+    if not text:
+        return None
+    try:
+        parameters = json.loads(text)
+    except ValueError as detail:
+        sys.stderr.write(f'Malformed JSON given for parameters: {detail}\n')
+        sys.exit(2)
+    if not isinstance(parameters, dict):
+        sys.stderr.write('JSON parameters must be a dictionary\n')
+        sys.exit(2)
+    return parameters
+
+
+def get_bus(system_bus: bool, private: bool = False) -> dbus.bus.BusConnection:
+    '''Connect to the system or session bus, honouring the *_BUS_ADDRESS variables
+
+    private: Open a new connection instead of using the shared one
+    '''
+    if system_bus:
+        if 'DBUS_SYSTEM_BUS_ADDRESS' in os.environ:
+            return dbus.bus.BusConnection(os.environ['DBUS_SYSTEM_BUS_ADDRESS'])
+        return dbus.SystemBus(private=private)
+    if 'DBUS_SESSION_BUS_ADDRESS' in os.environ:
+        return dbus.bus.BusConnection(os.environ['DBUS_SESSION_BUS_ADDRESS'])
+    return dbus.SessionBus(private=private)
+
+
+def notify_ready(ready_fd: Optional[int], ready_file: Optional[str]) -> bool:
+    '''Tell a supervisor that the mock is ready
+
+    This uses the given fd or file, and sd_notify() style $NOTIFY_SOCKET if set.
+    '''
+    if ready_fd is not None:
+        os.write(ready_fd, b'READY=1\n')
+        os.close(ready_fd)
+    if ready_file:
+        # write to a temporary file first, so that nobody sees it half written
+        with open(ready_file + '.tmp', 'w', encoding='UTF-8') as f:
+            f.write(f'{os.getpid()}\n')
+        os.replace(ready_file + '.tmp', ready_file)
+    notify_socket = os.environ.get('NOTIFY_SOCKET')
+    if notify_socket:
+        if notify_socket.startswith('@'):
+            notify_socket = '\0' + notify_socket[1:]
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto(f'READY=1\nMAINPID={os.getpid()}'.encode('UTF-8'), notify_socket)
+    return False
+
+
+def main() -> None:
+    args = parse_args()
+    dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
+
+    if args.seed is not None:
+        mockobject.seed_random(args.seed)
+
+    # (template, module, bus name, path, interface, is_object_manager, parameters)
+    mocks: List[tuple] = []
+    if args.template:
+        for i, template in enumerate(args.template):
+            module = mockobject.load_module(template)
+            is_object_manager = getattr(module, 'IS_OBJECT_MANAGER', False)
+            if is_object_manager and not hasattr(module, 'MAIN_IFACE'):
+                interface = mockobject.OBJECT_MANAGER_IFACE
+            else:
+                interface = module.MAIN_IFACE
+            parameters = parse_parameters(args.parameters[i] if i < len(args.parameters or []) else None)
+            mocks.append((template, module, module.BUS_NAME, module.MAIN_OBJ, interface, is_object_manager, parameters))
+    else:
+        mocks.append((None, None, args.name, args.path, args.interface, args.is_object_manager, None))
+
+    main_loop = GLib.MainLoop()
+    # keep references, the names get released when these get garbage collected
+    bus_names = []
+    logfile_owner: Optional[mockobject.DBusMockObject] = None
+
+    for template, module, name, path, interface, is_object_manager, parameters in mocks:
+        system_bus = args.system or (module is not None and not args.session and module.SYSTEM_BUS)
+        # objects are exported per connection, not per name; a connection of
+        # its own keeps the objects of each mock off the other mocks' names
+        bus = get_bus(system_bus, private=len(mocks) > 1)
+        # quit mock when the bus is going down
+        bus.add_signal_receiver(main_loop.quit, signal_name='Disconnected',
+                                path='/org/freedesktop/DBus/Local',
+                                dbus_interface='org.freedesktop.DBus.Local')
+        bus_name = dbus.service.BusName(name, bus, allow_replacement=True,
+                                        replace_existing=True, do_not_queue=True)
+        bus_names.append(bus_name)
+
+        main_object = mockobject.DBusMockObject(bus_name, path, interface, {},
+                                                args.logfile if logfile_owner is None else None,
+                                                is_object_manager)
+        # all mocks log into the same stream
+        if logfile_owner is None:
+            logfile_owner = main_object
+        else:
+            main_object.logfile = logfile_owner.logfile
+            main_object.is_logfile_owner = False
+
+        if template is not None:
+            main_object.AddTemplate(template, parameters)
+
+        mockobject.objects[path] = main_object
+
+    if args.ready_fd is not None or args.ready_file or 'NOTIFY_SOCKET' in os.environ:
+        GLib.idle_add(notify_ready, args.ready_fd, args.ready_file)
+
+    main_loop.run()
+
+
+if __name__ == '__main__':
+    main()
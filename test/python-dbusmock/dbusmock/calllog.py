@@ -0,0 +1,174 @@
+# coding: UTF-8
+'''Streaming call log files.
+
+A call log file starts with the MAGIC header, followed by one frame per
+logged method call. A frame is a little-endian uint32 body length and a body
+in D-Bus wire format with the signature "ttsssg" (sequence number,
+timestamp in ns, object path, interface, method name, argument signature),
+directly followed by the call arguments marshalled with that argument
+signature.
+
+CallLogSink writes such files on a background thread, so that the mock's
+main loop never waits for the disk. iter_calls() reads them back lazily,
+without needing a bus.
+'''
+
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.  See http://www.gnu.org/copyleft/lgpl.html for the full text
+# of the license.
+
+import os
+import queue
+import sys
+import threading
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, NamedTuple, Optional, Sequence, Union
+
+from dbusmock import wire
+
+MAGIC = b'DBUSMOCK-CALLS-1'
+
+RECORD_SIGNATURE = 'ttsssg'
+
+# maximum number of records waiting for the writer thread
+QUEUE_SIZE = 100000
+
+
+class CallRecord(NamedTuple):
+    '''One logged method call'''
+
+    seq: int
+    timestamp_ns: int
+    path: str
+    interface: str
+    method: str
+    signature: str
+    args: Sequence[Any]
+
+
+def encode_record(record: CallRecord) -> bytes:
+    '''Encode a call record into a frame'''
+
+    marshaller = wire.Marshaller()
+    marshaller.write_values(RECORD_SIGNATURE, record[:6])
+    marshaller.write_values(record.signature, record.args)
+    return wire.frame(bytes(marshaller.buf))
+
+
+def write_records(f: BinaryIO, records: Sequence[CallRecord]) -> None:
+    '''Write a complete call log stream with the given records to f'''
+
+    f.write(MAGIC)
+    for record in records:
+        f.write(encode_record(record))
+
+
+class CallLogSink:
+    '''Append call records to a rotating file on a background thread
+
+    path: File to write to
+    max_bytes: Rotate the file when it grows beyond this size; 0 disables
+               rotation
+    backup_count: Number of rotated files to keep, as path.1 (newest) to
+                  path.N (oldest); with 0 the file just starts over
+
+    When the writer falls behind by QUEUE_SIZE records, further records get
+    dropped and counted in "dropped"; records which cannot be encoded or
+    written get skipped and counted in "failed".
+    '''
+
+    def __init__(self, path: str, max_bytes: int = 0, backup_count: int = 0) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.dropped = 0
+        self.failed = 0
+        self._queue: 'queue.Queue[Optional[CallRecord]]' = queue.Queue(QUEUE_SIZE)
+        self._file = self._open()
+        self._thread = threading.Thread(target=self._run, name='dbusmock-calllog', daemon=True)
+        self._thread.start()
+
+    def put(self, record: CallRecord) -> None:
+        '''Queue a call record for writing'''
+
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        '''Write all queued records and close the file'''
+
+        self._queue.put(None)
+        self._thread.join()
+
+    def _open(self) -> BinaryIO:
+        # pylint: disable=consider-using-with
+        f = open(self.path, 'wb')
+        f.write(MAGIC)
+        return f
+
+    def _rotate(self) -> None:
+        self._file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                if os.path.exists(f'{self.path}.{i}'):
+                    os.replace(f'{self.path}.{i}', f'{self.path}.{i + 1}')
+            os.replace(self.path, f'{self.path}.1')
+        self._file = self._open()
+
+    def _run(self) -> None:
+        last_error = ''
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            try:
+                self._file.write(encode_record(record))
+                if self._queue.empty():
+                    self._file.flush()
+                if self.max_bytes and self._file.tell() >= self.max_bytes:
+                    self._rotate()
+            except Exception as e:  # pylint: disable=broad-except
+                self.failed += 1
+                # do not flood stderr when e. g. the disk is full
+                error = f'{type(e).__name__}: {e}'
+                if error != last_error:
+                    sys.stderr.write(f'dbusmock: cannot write call {record.method} to {self.path}: {error}\n')
+                    last_error = error
+        self._file.close()
+
+
+def iter_calls(source: Union[str, Path, BinaryIO]) -> Iterator[CallRecord]:
+    '''Lazily iterate over the call records of a call log file
+
+    source: File name or binary file object, positioned at the start of a
+            call log stream
+    '''
+    if isinstance(source, (str, Path)):
+        with open(source, 'rb') as f:
+            yield from iter_calls(f)
+        return
+
+    if source.read(len(MAGIC)) != MAGIC:
+        raise ValueError('not a dbusmock call log')
+    for body in wire.iter_frames(source):
+        unmarshaller = wire.Unmarshaller(body)
+        fields = unmarshaller.read_values(RECORD_SIGNATURE)
+        yield CallRecord(*fields, unmarshaller.read_values(fields[5]))
+
+
+def iter_rotated_calls(path: str) -> Iterator[CallRecord]:
+    '''Lazily iterate over a call log and its rotated backups, oldest first'''
+
+    backups = []
+    i = 1
+    while os.path.exists(f'{path}.{i}'):
+        backups.append(f'{path}.{i}')
+        i += 1
+    for backup in reversed(backups):
+        yield from iter_calls(backup)
+    if os.path.exists(path):
+        yield from iter_calls(path)
@@ -0,0 +1,172 @@
+# coding: UTF-8
+'''Virtual clock for timed mock behaviour.
+
+All timestamps and timeouts of the mock go through a VirtualClock, so that
+long running scenarios can be compressed: the clock runs at an adjustable
+rate relative to real time (0 pauses it), and can be advanced in jumps, which
+runs all timeouts that become due on the way in order, each seeing the clock
+at its due time.
+
+Timeouts are kept in a heap of due times; only the earliest one has a real
+GLib timeout armed at any time.
+'''
+
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.  See http://www.gnu.org/copyleft/lgpl.html for the full text
+# of the license.
+
+import heapq
+import itertools
+import math
+import time
+import traceback
+from typing import Callable, Dict, List, Optional, Tuple
+
+from gi.repository import GLib
+
+
+class _Timeout:
+    '''A pending timeout; due is in ns of virtual elapsed time'''
+
+    __slots__ = ('due', 'interval', 'callback')
+
+    def __init__(self, due: int, interval: int, callback: Callable[[], bool]) -> None:
+        self.due = due
+        self.interval = interval
+        self.callback = callback
+
+
+class VirtualClock:
+    '''Clock and timeout scheduler running at an adjustable rate
+
+    rate: Virtual seconds per real second
+    '''
+
+    def __init__(self, rate: float = 1.0) -> None:
+        if rate < 0:
+            raise ValueError('clock rate must not be negative')
+        self.rate = rate
+        # virtual elapsed ns at real monotonic time _base_real
+        self._base_elapsed = 0
+        self._base_real = time.monotonic_ns()
+        self._epoch_ns = time.time_ns()
+        self._monotonic_ns = self._base_real
+        self._ids = itertools.count(1)
+        self._timeouts: Dict[int, _Timeout] = {}
+        self._queue: List[Tuple[int, int]] = []
+        self._source_id: Optional[int] = None
+
+    def elapsed_ns(self) -> int:
+        '''Return the virtual ns elapsed since the clock was created'''
+
+        return self._base_elapsed + int((time.monotonic_ns() - self._base_real) * self.rate)
+
+    def time_ns(self) -> int:
+        '''Virtual equivalent of time.time_ns()'''
+
+        return self._epoch_ns + self.elapsed_ns()
+
+    def time(self) -> float:
+        '''Virtual equivalent of time.time()'''
+
+        return self.time_ns() / 1e9
+
+    def monotonic(self) -> float:
+        '''Virtual equivalent of time.monotonic()'''
+
+        return (self._monotonic_ns + self.elapsed_ns()) / 1e9
+
+    def _set_elapsed(self, elapsed: int) -> None:
+        self._base_elapsed = elapsed
+        self._base_real = time.monotonic_ns()
+
+    def set_rate(self, rate: float) -> None:
+        '''Change the clock rate; 0 stops the clock'''
+
+        if rate < 0:
+            raise ValueError('clock rate must not be negative')
+        self._set_elapsed(self.elapsed_ns())
+        self.rate = rate
+        self._arm()
+
+    def advance(self, seconds: float) -> None:
+        '''Jump forward, running all timeouts which become due on the way'''
+
+        if seconds < 0:
+            raise ValueError('cannot move the clock backwards')
+        target = self.elapsed_ns() + int(seconds * 1e9)
+        while self._queue and self._queue[0][0] <= target:
+            self._set_elapsed(max(self._queue[0][0], self.elapsed_ns()))
+            self._run_next()
+        self._set_elapsed(max(target, self.elapsed_ns()))
+        self._arm()
+
+    def timeout_add(self, interval: int, callback: Callable[[], bool]) -> int:
+        '''Call callback() every interval virtual milliseconds while it returns True
+
+        Return an ID for source_remove().
+        '''
+        timeout_id = next(self._ids)
+        self._schedule(timeout_id, _Timeout(self.elapsed_ns() + interval * 1000000, interval, callback))
+        self._arm()
+        return timeout_id
+
+    def source_remove(self, timeout_id: int) -> None:
+        '''Remove a timeout added with timeout_add()'''
+
+        # the queue entry gets skipped when it comes up
+        self._timeouts.pop(timeout_id, None)
+
+    def pending(self) -> int:
+        '''Return the number of pending timeouts'''
+
+        return len(self._timeouts)
+
+    def _schedule(self, timeout_id: int, timeout: _Timeout) -> None:
+        self._timeouts[timeout_id] = timeout
+        heapq.heappush(self._queue, (timeout.due, timeout_id))
+
+    def _run_next(self) -> None:
+        due, timeout_id = heapq.heappop(self._queue)
+        timeout = self._timeouts.get(timeout_id)
+        if timeout is None or timeout.due != due:
+            return
+        try:
+            again = timeout.callback()
+        except Exception:  # pylint: disable=broad-except
+            # as with GLib, a failing callback only loses its own timeout
+            traceback.print_exc()
+            again = False
+        if again and timeout_id in self._timeouts:
+            timeout.due = due + max(timeout.interval, 1) * 1000000
+            heapq.heappush(self._queue, (timeout.due, timeout_id))
+        else:
+            self._timeouts.pop(timeout_id, None)
+
+    def _arm(self) -> None:
+        '''Arm a real GLib timeout for the earliest pending timeout'''
+
+        if self._source_id is not None:
+            GLib.source_remove(self._source_id)
+            self._source_id = None
+        # drop removed timeouts from the front, so that they do not keep waking us up
+        while self._queue and self._queue[0][1] not in self._timeouts:
+            heapq.heappop(self._queue)
+        if not self._queue or self.rate == 0:
+            return
+        # with a very slow clock, the delay exceeds what GLib takes; the
+        # timeout then fires early, and _dispatch() arms it again for the rest
+        delay = min((self._queue[0][0] - self.elapsed_ns()) / self.rate / 1e6, GLib.MAXUINT32)
+        self._source_id = GLib.timeout_add(max(math.ceil(delay), 0), self._dispatch)
+
+    def _dispatch(self) -> bool:
+        self._source_id = None
+        now = self.elapsed_ns()
+        try:
+            while self._queue and self._queue[0][0] <= now:
+                self._run_next()
+        finally:
+            self._arm()
+        return False
@@ -0,0 +1,181 @@
+# coding: UTF-8
+'''Declarative fleet descriptions.
+
+A fleet description is a JSON document which describes mock objects with
+their interfaces, typed properties and canned method replies, without any
+Python code:
+
+{
+  "objects": {
+    "/org/example/Device/0": {
+      "org.example.Device": {
+        "properties": {"Name": ["s", "dev0"], "Ports": ["a(su)", [["tty0", 1]]]},
+        "methods": {
+          "Reset": {"in": "b"},
+          "GetPorts": {"out": "as", "return": [["tty0"]]},
+          "Break": {"error": "org.example.Error.Failed"}
+        }
+      }
+    }
+  }
+}
+
+Property values are [signature, value] pairs; variants inside them are
+[signature, value] pairs as well. Byte arrays can be given as strings. A
+method's "return" lists one value per single complete type of its "out"
+signature; with "error", calls fail with that D-Bus error name instead. The
+first interface of an object is its primary one.
+
+load_fleet() compiles such a description into mock objects in one
+DBusMockObject.add_objects() call.
+'''
+
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.  See http://www.gnu.org/copyleft/lgpl.html for the full text
+# of the license.
+
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, TextIO, Union
+
+import dbus
+
+from dbusmock import wire
+
+_BASIC = {
+    'y': dbus.Byte,
+    'b': dbus.Boolean,
+    'n': dbus.Int16,
+    'q': dbus.UInt16,
+    'i': dbus.Int32,
+    'u': dbus.UInt32,
+    'x': dbus.Int64,
+    't': dbus.UInt64,
+    'd': dbus.Double,
+    's': dbus.String,
+    'o': dbus.ObjectPath,
+    'g': dbus.Signature,
+}
+
+
+def _check_signature(signature: Any, single: bool = False) -> str:
+    '''Validate a signature from a description, optionally of exactly one single complete type'''
+
+    try:
+        types = list(dbus.Signature(signature)) if isinstance(signature, str) else None
+    except ValueError:
+        types = None
+    if types is None or (single and len(types) != 1):
+        kind = 'single complete type' if single else 'signature'
+        raise ValueError(f'{signature!r} is not a valid D-Bus {kind}')
+    return signature
+
+
+def to_dbus(signature: str, value: Any, variant_level: int = 0) -> Any:
+    '''Convert a JSON value to the dbus-python type of a single complete signature'''
+
+    return _to_dbus(_check_signature(signature, single=True), value, variant_level)
+
+
+def _to_dbus(signature: str, value: Any, variant_level: int = 0) -> Any:
+    code = signature[0]
+    if code in _BASIC:
+        if code in 'ynqiuxt':
+            value = int(value)
+        elif code == 'd':
+            value = float(value)
+        return _BASIC[code](value, variant_level=variant_level)
+    if code == 'v':
+        inner_signature, inner = value
+        return to_dbus(inner_signature, inner, variant_level + 1)
+    if code == '(':
+        members = wire.split_signature(signature[1:-1])
+        if len(members) != len(value):
+            raise ValueError(f'struct {signature} needs {len(members)} members, got {value!r}')
+        return dbus.Struct([_to_dbus(sig, v) for sig, v in zip(members, value)],
+                           signature=signature[1:-1], variant_level=variant_level)
+    if code == 'a':
+        element = signature[1:]
+        if element == 'y' and isinstance(value, str):
+            return dbus.ByteArray(value.encode('UTF-8'), variant_level=variant_level)
+        if element[0] == '{':
+            key_sig, value_sig = wire.split_signature(element[1:-1])
+            return dbus.Dictionary({_to_dbus(key_sig, k): _to_dbus(value_sig, v) for k, v in value.items()},
+                                   signature=element[1:-1], variant_level=variant_level)
+        return dbus.Array([_to_dbus(element, v) for v in value], signature=element, variant_level=variant_level)
+    raise ValueError(f'unsupported D-Bus type {signature}')
+
+
+def _canned_method(name: str, out_signature: str, spec: Dict[str, Any]) -> Callable:
+    '''Build the implementation of a method with a canned reply'''
+
+    error = spec.get('error')
+    out_types = wire.split_signature(_check_signature(out_signature))
+    values = spec.get('return', [])
+    if not error and len(values) != len(out_types):
+        raise ValueError(f'method {name} returns {out_signature!r}, but "return" has {len(values)} values')
+    reply = [to_dbus(sig, v) for sig, v in zip(out_types, values)]
+    ret = None if not reply else reply[0] if len(reply) == 1 else tuple(reply)
+
+    def method(self, *args):  # pylint: disable=unused-argument
+        if error:
+            raise dbus.exceptions.DBusException(spec.get('message', f'{name} failed'), name=error)
+        return ret
+
+    return method
+
+
+def compile_fleet(description: Dict[str, Any]):
+    '''Compile a parsed fleet description
+
+    Return the (path → interface → properties, path → interface → method
+    tuples) maps for DBusMockObject.add_objects().
+    '''
+    new_objects: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    methods: Dict[str, Dict[str, List[tuple]]] = {}
+
+    if not isinstance(description, dict) or not isinstance(description.get('objects', {}), dict):
+        raise ValueError('a fleet description must be a JSON object with an "objects" object')
+
+    for path, interfaces in description.get('objects', {}).items():
+        try:
+            new_objects[path] = {
+                interface: {name: to_dbus(*typed) for name, typed in spec.get('properties', {}).items()}
+                for interface, spec in interfaces.items()}
+            methods[path] = {
+                interface: [(name, _check_signature(m.get('in', '')), m.get('out', ''),
+                             _canned_method(name, m.get('out', ''), m))
+                            for name, m in spec.get('methods', {}).items()]
+                for interface, spec in interfaces.items()}
+        except (TypeError, ValueError, AttributeError, IndexError, KeyError) as e:
+            raise ValueError(f'invalid description of object {path}: {e}') from e
+
+    return (new_objects, methods)
+
+
+def load_fleet(mock, source: Union[str, Path, TextIO, Dict[str, Any]], emit_added: bool = False) -> List[str]:
+    '''Add the objects of a fleet description to a mock
+
+    mock: DBusMockObject to add the objects to
+    source: JSON file name, text file object, or an already parsed description
+    emit_added: Emit InterfacesAdded for every new object, if the mock is an
+                ObjectManager
+
+    Return the paths of the new objects.
+    '''
+    if isinstance(source, (str, Path)):
+        with open(source, encoding='UTF-8') as f:
+            description = json.load(f)
+    elif isinstance(source, dict):
+        description = source
+    else:
+        description = json.load(source)
+
+    new_objects, methods = compile_fleet(description)
+    mock.add_objects(new_objects, methods)
+    if emit_added:
+        for path in new_objects:
+            mock.object_manager_emit_added(path)
+    return list(new_objects)
@@ -0,0 +1,190 @@
+# coding: UTF-8
+'''Load generator which replays chadburn's access pattern against a mock.
+
+Each worker process opens its own bus connection and repeatedly does what a
+client starting up does: call GetManagedObjects() on the ObjectManager, then
+for every object and interface introspect the object, call GetAll() and add a
+match rule for its PropertiesChanged signal (node-dbus introspects again for
+every interface it wraps). The match rules stay in place, so the mock fans its
+signals out to all workers while they run; the workers drop the signals
+between operations. Failed calls get counted, and the worker goes on. The
+report gives throughput, p50/p99 latency and errors per operation, over all
+workers.
+
+Run it as
+
+  python3 -m dbusmock.loadgen --system org.freedesktop.ModemManager1 /org/freedesktop/ModemManager1
+
+while the mock is running.
+'''
+
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.  See http://www.gnu.org/copyleft/lgpl.html for the full text
+# of the license.
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import dbus
+import dbus.mainloop.glib
+from gi.repository import GLib
+
+OPERATIONS = ('GetManagedObjects', 'Introspect', 'GetAll', 'AddMatch')
+
+# interfaces every object has, which clients do not wrap
+_STANDARD_INTERFACES = ('org.freedesktop.DBus.Introspectable', 'org.freedesktop.DBus.Properties',
+                        'org.freedesktop.DBus.Peer', 'org.freedesktop.DBus.Mock')
+
+
+def _connect(address: Optional[str], system_bus: bool) -> dbus.bus.BusConnection:
+    # dispatching through a main loop is what hands incoming signals to the
+    # message filter
+    mainloop = dbus.mainloop.glib.DBusGMainLoop()
+    if address:
+        return dbus.bus.BusConnection(address, mainloop=mainloop)
+    # private connections, so that forked workers do not share a socket
+    if system_bus:
+        return dbus.SystemBus(private=True, mainloop=mainloop)
+    return dbus.SessionBus(private=True, mainloop=mainloop)
+
+
+def _drop_message(_bus: dbus.bus.BusConnection, _message: dbus.lowlevel.Message) -> int:
+    return dbus.lowlevel.HANDLER_RESULT_HANDLED
+
+
+def worker(address: Optional[str], system_bus: bool, name: str, path: str,
+           iterations: int, duration: float) -> Tuple[Dict[str, List[int]], Dict[str, int]]:
+    '''Run the access pattern
+
+    Return operation → latencies in ns, and operation → number of failed
+    calls.
+    '''
+    bus = _connect(address, system_bus)
+    bus.add_message_filter(_drop_message)
+    context = GLib.MainContext.default()
+    latencies: Dict[str, List[int]] = {op: [] for op in OPERATIONS}
+    errors: Dict[str, int] = {op: 0 for op in OPERATIONS}
+
+    def timed(op, func, *args):
+        # drop the signals which arrived since the last operation
+        while context.iteration(False):
+            pass
+        start = time.perf_counter_ns()
+        try:
+            result = func(*args)
+        except dbus.exceptions.DBusException:
+            errors[op] += 1
+            return None
+        latencies[op].append(time.perf_counter_ns() - start)
+        return result
+
+    deadline = time.monotonic() + duration if duration else None
+    iteration = 0
+    rules: List[str] = []
+    while (deadline is None and iteration < iterations) or (deadline is not None and time.monotonic() < deadline):
+        iteration += 1
+        managed = timed('GetManagedObjects', bus.call_blocking, name, path, 'org.freedesktop.DBus.ObjectManager',
+                        'GetManagedObjects', '', [])
+        old_rules, rules = rules, []
+        for object_path in managed or {}:
+            for interface in managed[object_path]:
+                if interface in _STANDARD_INTERFACES:
+                    continue
+                timed('Introspect', bus.call_blocking, name, object_path, 'org.freedesktop.DBus.Introspectable',
+                      'Introspect', '', [])
+                timed('GetAll', bus.call_blocking, name, object_path, dbus.PROPERTIES_IFACE, 'GetAll', 's', [interface])
+                rule = (f"type='signal',sender='{name}',path='{object_path}',"
+                        f"interface='{dbus.PROPERTIES_IFACE}',member='PropertiesChanged'")
+                timed('AddMatch', bus.add_match_string, rule)
+                rules.append(rule)
+        # the new subscriptions are in place, so drop the ones of the previous
+        # round; this keeps the number of match rules bounded
+        for rule in old_rules:
+            try:
+                bus.remove_match_string(rule)
+            except dbus.exceptions.DBusException:
+                # its AddMatch failed
+                pass
+
+    bus.close()
+    return latencies, errors
+
+
+def percentile(sorted_values: List[int], p: float) -> int:
+    '''Nearest-rank percentile of an ascending list'''
+
+    if not sorted_values:
+        return 0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def run(name: str, path: str, workers: int = 1, iterations: int = 1, duration: float = 0,
+        address: Optional[str] = None, system_bus: bool = False) -> Dict[str, Dict[str, float]]:
+    '''Run the load in parallel worker processes
+
+    name: Bus name of the mock
+    path: Object path of its ObjectManager
+    workers: Number of worker processes, each with its own bus connection
+    iterations: Number of times each worker runs the access pattern
+    duration: Instead of a number of iterations, run for that many seconds
+    address: Bus address; by default the system or session bus
+
+    Return an operation → statistics map with "count" (of successful calls),
+    "throughput" (per second, over the wall time of the run), "p50-ms",
+    "p99-ms", "max-ms" and "errors" (number of failed calls).
+    '''
+    args = [(address, system_bus, name, path, iterations, duration)] * workers
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.starmap(worker, args)
+    elapsed = time.perf_counter() - start
+
+    report = {}
+    for op in OPERATIONS:
+        values = sorted(v for latencies, _ in results for v in latencies[op])
+        report[op] = {'count': len(values),
+                      'throughput': len(values) / elapsed,
+                      'p50-ms': percentile(values, 50) / 1e6,
+                      'p99-ms': percentile(values, 99) / 1e6,
+                      'max-ms': (values[-1] if values else 0) / 1e6,
+                      'errors': sum(errors[op] for _, errors in results)}
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='replay a D-Bus client access pattern against a mock')
+    parser.add_argument('-s', '--system', action='store_true', help='use the system bus (default: session bus)')
+    parser.add_argument('-a', '--address', help='bus address to connect to')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('-n', '--iterations', type=int, default=10,
+                        help='times each worker runs the access pattern (default: 10)')
+    parser.add_argument('-d', '--duration', type=float, default=0,
+                        help='run for that many seconds instead of a number of iterations')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    parser.add_argument('name', help='bus name of the mock, e. g. org.freedesktop.ModemManager1')
+    parser.add_argument('path', help='object path of its ObjectManager, e. g. /org/freedesktop/ModemManager1')
+    args = parser.parse_args()
+
+    report = run(args.name, args.path, args.workers, args.iterations, args.duration, args.address, args.system)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return
+    print(f'{"operation":<20} {"count":>10} {"ops/s":>12} {"p50 ms":>10} {"p99 ms":>10} {"max ms":>10} {"errors":>8}')
+    for op, stats in report.items():
+        print(f'{op:<20} {stats["count"]:>10} {stats["throughput"]:>12.1f} '
+              f'{stats["p50-ms"]:>10.3f} {stats["p99-ms"]:>10.3f} {stats["max-ms"]:>10.3f} {stats["errors"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
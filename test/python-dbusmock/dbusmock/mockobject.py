@@ -13,36 +13,170 @@ __copyright__ = '''
 (c) 2017 - 2022 Martin Pitt <martin@piware.de>
 '''
 
+import bisect
+import collections
 import copy
 import functools
 import importlib
 import importlib.util
+import itertools
 import os
+import random
 import sys
+import tempfile
 import time
 import types
 from pathlib import Path
-from typing import Optional, Dict, Any, List, Tuple, Sequence, KeysView
-from xml.etree import ElementTree
+from typing import TYPE_CHECKING, Optional, Dict, Any, BinaryIO, Callable, List, Set, Tuple, Sequence, KeysView
 
 import dbus
 import dbus.service
+from gi.repository import GLib
 
-# we do not use this ourselves, but mock methods often want to use this
-os  # pyflakes pylint: disable=pointless-statement
+from dbusmock import calllog, clock, wire
 
-# global path -> DBusMockObject mapping
-objects: Dict[str, 'DBusMockObject'] = {}
+# these are only needed when the corresponding Mock methods get called, and
+# get imported there to keep the start of the mock fast
+if TYPE_CHECKING:
+    from dbusmock import profiling, ratelimit
+
+# we do not use these ourselves, but mock methods often want to use them
+os  # pyflakes pylint: disable=pointless-statement
+time  # pyflakes pylint: disable=pointless-statement
 
 MOCK_IFACE = 'org.freedesktop.DBus.Mock'
 OBJECT_MANAGER_IFACE = 'org.freedesktop.DBus.ObjectManager'
 
+# interfaces which every object has, and which are not announced by an ObjectManager
+STANDARD_INTERFACES = (dbus.PROPERTIES_IFACE, dbus.INTROSPECTABLE_IFACE, 'org.freedesktop.DBus.Peer', MOCK_IFACE)
+
+# default number of replies kept by memoized methods
+MEMOIZE_SIZE = 128
+
+# default and maximum number of entries returned by paged methods
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
 
 PropsType = Dict[str, Any]
 # (in_signature, out_signature, code, dbus_wrapper_fn)
 MethodType = Tuple[str, str, str, str]
-# (timestamp, method_name, call_args)
-CallLogType = Tuple[int, str, Sequence[Any]]
+# (sequence_number, timestamp_ns, method_name, call_args)
+CallLogType = Tuple[int, int, str, Sequence[Any]]
+
+# sequence numbers of logged calls, monotonic across all objects
+_call_sequence = itertools.count(1)
+
+# optional streaming sink which gets every logged call, see SetCallLogSink()
+call_log_sink: Optional[calllog.CallLogSink] = None
+
+# maximum number of calls kept in each object's call_log; 0 is unlimited
+call_log_limit = 0
+
+# running profiling session, see StartProfiling()
+profiling_session: Optional['profiling.ProfilingSession'] = None
+
+# clock for all timestamps and add_timeout(), see AdvanceClock() and SetClockRate()
+virtual_clock = clock.VirtualClock()
+
+# (interface, signal name) -> rate limit, see SetSignalRateLimit()
+signal_limits: Dict[Tuple[str, str], 'ratelimit.SignalLimit'] = {}
+# (interface, signal name) -> number of signals emitted without rate limit
+_signal_counts: Dict[Tuple[str, str], int] = collections.Counter()
+
+# (interface, method) -> fault injection, see SetFaultInjection(); interface '' matches all
+fault_injectors: Dict[Tuple[str, str], '_FaultInjector'] = {}
+# (interface, method) -> number of logged calls and of injected faults
+_call_counts: Dict[Tuple[str, str], int] = collections.Counter()
+_fault_counts: Dict[Tuple[str, str], int] = collections.Counter()
+
+# master seed of get_random(), see seed_random()
+random_seed = os.environ.get('DBUSMOCK_SEED', '0')
+_random_streams: Dict[str, random.Random] = {}
+
+# optional streaming sink which gets every emitted signal, see SetEventLogSink()
+event_log_sink: Optional[calllog.CallLogSink] = None
+_event_sequence = itertools.count(1)
+
+
+def _page_limit(limit: int) -> int:
+    '''Apply the default and maximum page size to a requested limit'''
+
+    return min(limit or PAGE_SIZE, MAX_PAGE_SIZE)
+
+
+class ObjectRegistry(dict):
+    '''Path → DBusMockObject mapping with a sorted index of its paths
+
+    The index allows walking a subtree in path order without scanning or
+    sorting the whole mapping, which keeps paged replies bounded in both
+    memory and time.
+    '''
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._paths: List[str] = []
+        # incremented on every change of the objects, their properties or methods;
+        # memoized method replies are only valid within one generation
+        self.generation = 0
+
+    def __setitem__(self, path: str, obj: 'DBusMockObject') -> None:
+        if path not in self:
+            bisect.insort(self._paths, path)
+        super().__setitem__(path, obj)
+        self.generation += 1
+
+    def __delitem__(self, path: str) -> None:
+        super().__delitem__(path)
+        del self._paths[bisect.bisect_left(self._paths, path)]
+        self.generation += 1
+
+    def pop(self, path, *default):
+        if path in self:
+            del self._paths[bisect.bisect_left(self._paths, path)]
+            self.generation += 1
+        return super().pop(path, *default)
+
+    def clear(self) -> None:
+        super().clear()
+        self._paths.clear()
+        self.generation += 1
+
+    def add_many(self, new_objects: Dict[str, 'DBusMockObject']) -> None:
+        '''Add many path → object entries, sorting the index only once'''
+
+        self._paths.extend([path for path in new_objects if path not in self])
+        super().update(new_objects)
+        self._paths.sort()
+        self.generation += 1
+
+    def page(self, prefix: str, cursor: str, limit: int) -> Tuple[List[str], str]:
+        '''Return a page of paths below prefix
+
+        prefix: Only return paths starting with this (but not equal to it)
+        cursor: Only return paths sorting after this; use '' for the first page
+        limit: Maximum number of paths to return; 0 selects PAGE_SIZE, and it
+               is capped to MAX_PAGE_SIZE
+
+        Return a (paths, next_cursor) tuple; next_cursor is '' when there are
+        no more paths below prefix.
+        '''
+        limit = _page_limit(limit)
+        if cursor and cursor >= prefix:
+            start = bisect.bisect_right(self._paths, cursor)
+        else:
+            start = bisect.bisect_left(self._paths, prefix)
+        end = min(start + limit, len(self._paths))
+
+        # paths sharing a prefix are contiguous in sort order
+        paths = [p for p in self._paths[start:end] if p.startswith(prefix) and p != prefix]
+        if end < len(self._paths) and self._paths[end].startswith(prefix):
+            return (paths, self._paths[end - 1])
+        return (paths, '')
+
+
+# global path -> DBusMockObject mapping
+objects = ObjectRegistry()
 
 
 def load_module(name: str):
@@ -119,6 +253,11 @@ def _wrap_in_dbus_variant(value):
         return dbus.String(str(value), variant_level=1)
     if isinstance(value, dbus.types.Array):
         return value
+    if isinstance(value, (dbus.types.Dictionary, dbus.types.Struct)):
+        return type(value)(value, signature=value.signature, variant_level=1)
+    # str and bytes based types have no conjugate()
+    if isinstance(value, (dbus.types.ObjectPath, dbus.types.Signature, dbus.types.ByteArray)):
+        return type(value)(value, variant_level=1)
     if type(value) in dbus_types:
         return type(value)(value.conjugate(), variant_level=1)
     if isinstance(value, str):
@@ -126,6 +265,51 @@ def _wrap_in_dbus_variant(value):
     raise dbus.exceptions.DBusException(f'could not wrap type {type(value)}')
 
 
+def _as_variant(value: Any) -> Any:
+    '''Wrap a property value for an a{sv} reply, with the type dbus-python would guess'''
+
+    if isinstance(value, bool):
+        return dbus.Boolean(value, variant_level=1)
+    if type(value) is int:  # pylint: disable=unidiomatic-typecheck
+        return (dbus.Int32 if -2 ** 31 <= value < 2 ** 31 else dbus.Int64)(value, variant_level=1)
+    if type(value) is float:  # pylint: disable=unidiomatic-typecheck
+        return dbus.Double(value, variant_level=1)
+    try:
+        return _wrap_in_dbus_variant(value)
+    except dbus.exceptions.DBusException:
+        # plain containers; leave it to dbus-python
+        return value
+
+
+def _deep_sizeof(value: Any) -> int:
+    '''Approximate the memory used by a (dbus-python or plain Python) value'''
+
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_sizeof(k) + _deep_sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_deep_sizeof(v) for v in value)
+    return size
+
+
+def _dump_fd(write: Callable[[BinaryIO], None]) -> dbus.types.UnixFd:
+    '''Run write() on an anonymous file and return it as a D-Bus file descriptor
+
+    The file is read from its start by the receiver, which allows passing large
+    dumps without marshalling them through the bus daemon.
+    '''
+    if hasattr(os, 'memfd_create'):
+        f = os.fdopen(os.memfd_create('dbusmock-dump', os.MFD_CLOEXEC), 'w+b')
+    else:
+        f = tempfile.TemporaryFile()  # pylint: disable=consider-using-with
+    with f:
+        write(f)
+        f.flush()
+        f.seek(0)
+        # this dup()s the file descriptor
+        return dbus.types.UnixFd(f)
+
+
 def _convert_args(signature: str, args: Tuple[Any, ...]) -> List[Any]:
     """
     Convert types of arguments according to signature, using
@@ -143,6 +327,107 @@ def _convert_args(signature: str, args: Tuple[Any, ...]) -> List[Any]:
                                             name='org.freedesktop.DBus.Error.InvalidArgs')
 
 
+def _call_log_index(call_log: Sequence[CallLogType], seq: int) -> int:
+    '''Return the index of the first call log row with a sequence number after seq'''
+
+    lo, hi = 0, len(call_log)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if call_log[mid][0] <= seq:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _call_matches(method: str, args_filter: Sequence[Any], name: str, args: Sequence[Any]) -> bool:
+    '''Check if a logged call is of method and starts with the args_filter arguments'''
+
+    return name == method and len(args) >= len(args_filter) and all(
+        arg == expected for arg, expected in zip(args, args_filter))
+
+
+class _CallWaiter:  # pylint: disable=too-few-public-methods
+    '''Pending WaitForCall() request'''
+
+    def __init__(self, method: str, args_filter: Sequence[Any], reply_handler: Callable, error_handler: Callable) -> None:
+        self.method = method
+        self.args_filter = args_filter
+        self.reply_handler = reply_handler
+        self.error_handler = error_handler
+        self.timeout_id = 0
+
+
+class _ReplyCache:
+    '''LRU cache of the replies of a memoized method
+
+    All entries get dropped when the objects or properties of the mock change.
+    '''
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.generation = objects.generation
+        self.replies: 'collections.OrderedDict[bytes, Any]' = collections.OrderedDict()
+
+    def _check_generation(self) -> None:
+        if self.generation != objects.generation:
+            self.replies.clear()
+            self.generation = objects.generation
+
+    def lookup(self, key: bytes) -> Tuple[bool, Any]:
+        '''Return (True, reply) for a cached reply, or (False, None)'''
+
+        self._check_generation()
+        try:
+            self.replies.move_to_end(key)
+        except KeyError:
+            return (False, None)
+        return (True, self.replies[key])
+
+    def store(self, key: bytes, reply: Any) -> None:
+        self._check_generation()
+        self.replies[key] = reply
+        if len(self.replies) > self.maxsize:
+            self.replies.popitem(last=False)
+
+
+class _FaultInjector:
+    '''Make a random share of the calls of a method fail
+
+    rate: Probability that a call starts a burst of failures
+    error_name: D-Bus error name to fail with
+    burst: Number of consecutive calls which fail in each burst
+    rng: random.Random to decide with
+    '''
+
+    def __init__(self, rate: float, error_name: str, burst: int, rng: random.Random) -> None:
+        self.rate = rate
+        self.error_name = error_name
+        self.burst = max(burst, 1)
+        self.rng = rng
+        self.remaining = 0
+
+    def fails(self) -> bool:
+        '''Decide whether the current call fails'''
+
+        if self.remaining:
+            self.remaining -= 1
+            return True
+        if self.rng.random() < self.rate:
+            self.remaining = self.burst - 1
+            return True
+        return False
+
+
+def _inject_fault(interface: str, method: str) -> None:
+    '''Raise an injected fault for a call if SetFaultInjection() asks for one'''
+
+    injector = fault_injectors.get((interface, method)) or fault_injectors.get(('', method))
+    if injector is not None and injector.fails():
+        _fault_counts[(interface, method)] += 1
+        raise dbus.exceptions.DBusException(f'injected fault in {method}', name=injector.error_name)
+
+
 def loggedmethod(self, func):
     """Decorator for a method to end in the call log"""
 
@@ -154,9 +439,8 @@ def loggedmethod(self, func):
         in_signature = getattr(func, '_dbus_in_signature', '')
         args = _convert_args(in_signature, args)
 
-        self.log(fname + _format_args(args))
-        self.call_log.append((int(time.time()), fname, args))
-        self.MethodCalled(fname, args)
+        self._log_call(getattr(func, '_dbus_interface', ''), fname, in_signature, args)
+        _inject_fault(getattr(func, '_dbus_interface', ''), fname)
 
         return func(*[self_arg, *args], **kwargs)
 
@@ -191,7 +475,9 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
         is_object_manager: If True, the GetManagedObjects method will
                            automatically be implemented on the object, returning
                            all objects which have this one’s path as a prefix of
-                           theirs. Note that the InterfacesAdded and
+                           theirs. GetManagedObjectsPaged(cursor, limit) is
+                           added as well, for trees whose full reply would be
+                           too large. Note that the InterfacesAdded and
                            InterfacesRemoved signals will not be automatically
                            emitted.
         '''
@@ -202,6 +488,9 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
         self.interface = interface
         self.is_object_manager = is_object_manager
         self.object_manager: Optional[DBusMockObject] = None
+        # the mock object which created this one with AddObject(), directly
+        # or indirectly; Reset() only removes the objects of its own mock
+        self.main_object: DBusMockObject = self
 
         self._template: Optional[str] = None
         self._template_parameters: Optional[PropsType] = None
@@ -210,6 +499,15 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
         self.logfile = open(logfile, 'wb') if logfile else None
         self.is_logfile_owner = True
         self.call_log: List[CallLogType] = []
+        self._call_waiters: List[_CallWaiter] = []
+        self._timeouts: Set[int] = set()
+        # (interface, method) -> cache of memoized methods
+        self._reply_caches: Dict[Tuple[str, str], _ReplyCache] = {}
+        # incremented on every property change; interface -> name -> version of last change
+        self.props_version = 0
+        self._prop_versions: Dict[str, Dict[str, int]] = {}
+        # interface -> GetAll() reply, dropped on property changes
+        self._get_all_cache: Dict[str, dbus.Dictionary] = {}
 
         if props is None:
             props = {}
@@ -225,23 +523,51 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
 
     def _set_up_object_manager(self) -> None:
         '''Set up this mock object as a D-Bus ObjectManager.'''
-        if self.path == '/':
-            cond = 'k != \'/\''
-        else:
-            cond = f'k.startswith(\'{self.path}/\')'
-
         self.AddMethod(OBJECT_MANAGER_IFACE,
                        'GetManagedObjects', '', 'a{oa{sa{sv}}}',
-                       'ret = {dbus.ObjectPath(k): objects[k].props ' +
-                       '  for k in objects.keys() if ' + cond + '}')
+                       'ret = self._managed_objects()')
+        self.AddMethod(OBJECT_MANAGER_IFACE,
+                       'GetManagedObjectsPaged', 'su', 'a{oa{sa{sv}}}s',
+                       'ret = self._managed_objects_page(args[0], args[1])')
         self.object_manager = self
 
+    def _manages(self, path: str) -> bool:
+        '''Check if an object is below this ObjectManager and belongs to its mock'''
+
+        prefix = '/' if self.path == '/' else self.path + '/'
+        return path.startswith(prefix) and path != self.path and objects[path].main_object is self.main_object
+
+    def _managed_objects(self) -> Dict[str, PropsType]:
+        '''Return the reply of GetManagedObjects()
+
+        When one process serves several mocks, this only covers the objects
+        of this one's mock.
+        '''
+        return {dbus.ObjectPath(p): objects[p].managed_interfaces() for p in objects.keys() if self._manages(p)}
+
+    def _managed_objects_page(self, cursor: str, limit: int) -> Tuple[Dict[str, PropsType], str]:
+        '''Return one page of GetManagedObjects() and the cursor for the next one.
+
+        This is the implementation of the GetManagedObjectsPaged(cursor,
+        limit) method: pass '' as cursor for the first page, and the returned
+        cursor for subsequent ones, until it is ''. A limit of 0 selects the
+        default page size. Pages may have fewer entries than the limit when
+        other mocks in the same process have objects in the same subtree.
+        '''
+        prefix = '/' if self.path == '/' else self.path + '/'
+        paths, next_cursor = objects.page(prefix, cursor, limit)
+        return ({dbus.ObjectPath(p): objects[p].managed_interfaces() for p in paths if self._manages(p)}, next_cursor)
+
     def _reset(self, props: PropsType) -> None:
         # interface -> name -> value
         self.props = {self.interface: props}
+        self._get_all_cache = {}
+        self.props_version += 1
+        self._prop_versions = {self.interface: dict.fromkeys(props, self.props_version)}
 
         # interface -> name -> (in_signature, out_signature, code, dbus_wrapper_fn)
         self.methods: Dict[str, Dict[str, MethodType]] = {self.interface: {}}
+        objects.generation += 1
 
         if self.is_object_manager:
             self._set_up_object_manager()
@@ -255,8 +581,12 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
 
         if not interface_name:
             interface_name = self.interface
+        if interface_name not in self.props:
+            raise dbus.exceptions.DBusException(
+                'no such interface ' + interface_name,
+                name=self.interface + '.UnknownInterface')
         try:
-            return self.GetAll(interface_name)[property_name]
+            return self.props[interface_name][property_name]
         except KeyError as e:
             raise dbus.exceptions.DBusException(
                 'no such property ' + property_name,
@@ -265,19 +595,42 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
     @dbus.service.method(dbus.PROPERTIES_IFACE,
                          in_signature='s', out_signature='a{sv}')
     def GetAll(self, interface_name: str, *_, **__) -> PropsType:
-        '''Standard D-Bus API for getting all property values'''
+        '''Standard D-Bus API for getting all property values
 
+        Python callers get the cached reply, which must not be modified.
+        '''
         self.log(f'GetAll {self.path} {interface_name}')
 
         if not interface_name:
             interface_name = self.interface
+        return self._get_all_reply(interface_name)
+
+    def _get_all_reply(self, interface_name: str) -> dbus.Dictionary:
+        '''Return the GetAll() reply of an interface
+
+        The reply is cached and shared by all callers until a property of the
+        interface changes, so it must not be modified.
+        '''
         try:
-            return self.props[interface_name]
+            return self._get_all_cache[interface_name]
+        except KeyError:
+            pass
+        try:
+            iface_props = self.props[interface_name]
         except KeyError as e:
+            # interfaces with only methods exist, they just have no properties
+            if interface_name in self.methods:
+                return dbus.Dictionary({}, signature='sv')
             raise dbus.exceptions.DBusException(
                 'no such interface ' + interface_name,
                 name=self.interface + '.UnknownInterface') from e
 
+        # build the reply with explicitly typed variants once, instead of
+        # having dbus-python guess the type of every value on every call
+        reply = dbus.Dictionary({name: _as_variant(value) for name, value in iface_props.items()}, signature='sv')
+        self._get_all_cache[interface_name] = reply
+        return reply
+
     @dbus.service.method(dbus.PROPERTIES_IFACE,
                          in_signature='ssv', out_signature='')
     def Set(self, interface_name: str, property_name: str, value: Any, *_, **__) -> None:
@@ -297,7 +650,7 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
                 'no such property ' + property_name,
                 name=self.interface + '.UnknownProperty')
 
-        iface_props[property_name] = value
+        self._set_property(interface_name, property_name, value)
 
         self.EmitSignal('org.freedesktop.DBus.Properties',
                         'PropertiesChanged',
@@ -342,6 +695,89 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
         if path in objects:
             raise dbus.exceptions.DBusException(f'object {path} already exists', name='org.freedesktop.DBus.Mock.NameError')
 
+        obj = self._new_object(path, interface, properties)
+        try:
+            obj.AddMethods(interface, methods)
+        except Exception:
+            obj.remove_from_connection()
+            raise
+
+        objects[path] = obj
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='a{oa{sa{sv}}}',
+                         out_signature='')
+    def AddObjects(self, new_objects: Dict[str, Dict[str, PropsType]]) -> None:
+        '''Add many D-Bus objects to the mock at once
+
+        new_objects: A path → interface → property_name → value map, as
+                     returned by GetManagedObjects(); the first interface of
+                     each object is its primary one
+
+        This is much faster than calling AddObject() and AddProperties() for
+        each object when building large trees. As with AddObject(),
+        InterfacesAdded signals are *not* emitted.
+        '''
+        self.add_objects(new_objects)
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='sb',
+                         out_signature='ao')
+    def LoadFleet(self, path: str, emit_added: bool) -> List[str]:
+        '''Add the objects of a JSON fleet description to the mock
+
+        path: JSON file with the description; see dbusmock.fleet for the format
+        emit_added: Emit InterfacesAdded for every new object, if this is an
+                    ObjectManager
+
+        Return the paths of the new objects.
+        '''
+        from dbusmock import fleet  # pylint: disable=import-outside-toplevel
+
+        try:
+            return dbus.Array(fleet.load_fleet(self, path, emit_added), signature='o')
+        except (OSError, ValueError) as e:
+            raise dbus.exceptions.DBusException(f'Cannot load fleet {path}: {e}',
+                                                name='org.freedesktop.DBus.Mock.FleetError') from e
+
+    def add_objects(self, new_objects: Dict[str, Dict[str, PropsType]],
+                    methods: Optional[Dict[str, Dict[str, List[MethodType]]]] = None) -> None:
+        '''Add many D-Bus objects to the mock at once
+
+        This is the Python API behind AddObjects(), which also takes a
+        path → interface → list of method tuples map (see AddMethods()) for
+        the objects' methods; the method code may be a function.
+        '''
+        for path, interfaces in new_objects.items():
+            if path in objects:
+                raise dbus.exceptions.DBusException(f'object {path} already exists', name='org.freedesktop.DBus.Mock.NameError')
+            if not interfaces:
+                raise dbus.exceptions.DBusException(f'object {path} has no interfaces', name='org.freedesktop.DBus.Mock.NameError')
+
+        created = {}
+        try:
+            for path, interfaces in new_objects.items():
+                main_interface, *other_interfaces = interfaces
+                obj = self._new_object(path, main_interface, interfaces[main_interface])
+                created[path] = obj
+                for interface in other_interfaces:
+                    obj.props.setdefault(interface, {})
+                    for name, value in interfaces[interface].items():
+                        obj._set_property(interface, name, value)  # pylint: disable=protected-access
+                for interface, iface_methods in (methods or {}).get(path, {}).items():
+                    obj.AddMethods(interface, iface_methods)
+        except Exception:
+            # the new objects are already exported; take them off the bus
+            # again, so that the call has no effect
+            for obj in created.values():
+                obj.remove_from_connection()
+            raise
+
+        objects.add_many(created)
+
+    def _new_object(self, path: str, interface: str, properties: PropsType) -> 'DBusMockObject':
+        '''Create a mock object which belongs to the same mock as this one'''
+
         obj = DBusMockObject(self.bus_name,
                              path,
                              interface,
@@ -349,10 +785,9 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
         # make sure created objects inherit the log file stream
         obj.logfile = self.logfile
         obj.object_manager = self.object_manager
+        obj.main_object = self.main_object
         obj.is_logfile_owner = False
-        obj.AddMethods(interface, methods)
-
-        objects[path] = obj
+        return obj
 
     @dbus.service.method(MOCK_IFACE,
                          in_signature='s',
@@ -365,7 +800,11 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
         '''
         try:
             objects[path].remove_from_connection()
+            objects[path].remove_timeouts()
+            objects[path].cancel_call_waiters(f'object {path} was removed')
             del objects[path]
+            for limit in signal_limits.values():
+                limit.discard(path)
         except KeyError as e:
             raise dbus.exceptions.DBusException(
                 f'object {path} does not exist',
@@ -381,12 +820,27 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
         originally created with a template (from the command line, the Python
         API or by calling AddTemplate over D-Bus), it will be
         re-instantiated with that template.
+
+        When one process serves several mocks, the objects of the other mocks
+        stay untouched. Settings which apply to the whole process also stay as
+        they are, as they span all mocks: fault injection, signal rate limits,
+        the call and event log sinks, the call log limit, profiling, the
+        virtual clock and the master seed of get_random().
         '''
         # Clear other existing objects.
-        for obj_name, obj in objects.items():
+        own = [obj_name for obj_name, obj in objects.items() if obj.main_object is self.main_object]
+        for obj_name in own:
             if obj_name != self.path:
-                obj.remove_from_connection()
-        objects.clear()
+                objects[obj_name].remove_from_connection()
+            objects[obj_name].remove_timeouts()
+            objects[obj_name].cancel_call_waiters('the mock was reset')
+            for limit in signal_limits.values():
+                limit.discard(obj_name)
+        if len(own) == len(objects):
+            objects.clear()
+        else:
+            for obj_name in own:
+                del objects[obj_name]
 
         # Reinitialise our state. Carefully remove new methods from our dict;
         # they don't not actually exist if they are a statically defined
@@ -439,6 +893,14 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
               When specifying '', the method will not do anything (except
               logging) and return None.
 
+              When calling AddMethod from Python, code can also be a
+              function, which gets called with the object and the
+              arguments. If it is decorated with deferred(), it gets called
+              with the object, a reply and an error handler, and the
+              arguments instead, and the method call is only answered once
+              one of the handlers gets called. If it is decorated with
+              memoized(), its replies get cached, see SetMethodMemoization().
+
 
         This is meant for adding a method to a mock at runtime, from any programming language.
         You can also use it in templates in the load() function.
@@ -467,6 +929,11 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
         dbus_method.__name__ = str(name)
         dbus_method._dbus_in_signature = in_sig
         dbus_method._dbus_args = [f'arg{i}' for i in range(1, n_args + 1)]
+        if getattr(code, '_dbusmock_deferred', False):
+            dbus_method._dbus_async_callbacks = ('reply_handler', 'error_handler')
+        self._reply_caches.pop((interface, str(name)), None)
+        if getattr(code, '_dbusmock_memoize', 0):
+            self._reply_caches[(interface, str(name))] = _ReplyCache(code._dbusmock_memoize)
 
         # for convenience, add mocked methods on the primary interface as
         # callable methods
@@ -474,6 +941,8 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
             setattr(self.__class__, name, dbus_method)
 
         self.methods.setdefault(interface, {})[str(name)] = (in_sig, out_sig, code, dbus_method)
+        # new interfaces show up in the ObjectManager replies
+        objects.generation += 1
 
     @dbus.service.method(MOCK_IFACE,
                          in_signature='sa(ssss)',
@@ -490,6 +959,39 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
         for method in methods:
             self.AddMethod(interface, *method)
 
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='ssu',
+                         out_signature='')
+    def SetMethodMemoization(self, interface: str, name: str, maxsize: int) -> None:
+        '''Cache the replies of a method which only depends on its arguments and the mock's state
+
+        interface: D-Bus interface of the method. For convenience you can
+                   specify '' here for the object's main interface (as
+                   specified on construction).
+        name: Name of the method
+        maxsize: Number of replies (for distinct arguments) to keep, least
+                 recently used ones get dropped first; 0 disables caching
+
+        The method's code only runs for arguments which are not in the cache;
+        calls are still logged. Any property change, adding methods, and
+        adding or removing objects, anywhere in the mock drops all cached
+        replies. This is meant
+        for methods like GetManagedObjects() on a static tree, or canned
+        replies.
+        '''
+        if not interface:
+            interface = self.interface
+        if name not in self.methods.get(interface, {}):
+            raise dbus.exceptions.DBusException(f'method {interface}.{name} does not exist',
+                                                name='org.freedesktop.DBus.Mock.NameError')
+        if getattr(self.methods[interface][name][2], '_dbusmock_deferred', False):
+            raise dbus.exceptions.DBusException(f'cannot memoize deferred method {interface}.{name}',
+                                                name='org.freedesktop.DBus.Mock.NameError')
+        if maxsize:
+            self._reply_caches[(interface, name)] = _ReplyCache(maxsize)
+        else:
+            self._reply_caches.pop((interface, name), None)
+
     def _set_property(self, interface, name, value):
         # copy.copy removes one level of variant-ness, which means that the
         # types get exported in introspection data correctly, but we can't do
@@ -498,6 +1000,41 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
             value = copy.copy(value)
 
         self.props.setdefault(interface, {})[name] = value
+        self._get_all_cache.pop(interface, None)
+        self.props_version += 1
+        objects.generation += 1
+        self._prop_versions.setdefault(interface, {})[name] = self.props_version
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='st',
+                         out_signature='ta{sv}')
+    def GetPropertiesSince(self, interface: str, version: int) -> Tuple[int, PropsType]:
+        '''Get the properties which changed after a given version
+
+        interface: D-Bus interface to get the properties of. For convenience
+                   you can specify '' here for the object's main interface
+                   (as specified on construction).
+        version: Only return properties which changed after this version; use
+                 0 to get all properties
+
+        Return the current version of the object's properties and a
+        property_name → value map of the changed ones. Every property change
+        through Set(), UpdateProperties() or AddProperty() increments the
+        version, so a client can keep in sync by passing the last returned
+        version to the next call instead of calling GetAll() again.
+        '''
+        if not interface:
+            interface = self.interface
+        try:
+            iface_props = self.props[interface]
+        except KeyError as e:
+            raise dbus.exceptions.DBusException(
+                'no such interface ' + interface,
+                name=self.interface + '.UnknownInterface') from e
+
+        versions = self._prop_versions.get(interface, {})
+        changed = {name: value for name, value in iface_props.items() if versions.get(name, 0) > version}
+        return (self.props_version, dbus.Dictionary(changed, signature='sv'))
 
     @dbus.service.method(MOCK_IFACE,
                          in_signature='sa{sv}',
@@ -602,6 +1139,7 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
                     fn._dbus_in_signature,
                     fn._dbus_out_signature, '', fn
                 )
+                objects.generation += 1
 
         if parameters is None:
             parameters = {}
@@ -620,9 +1158,25 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
         args = _convert_args(signature, sigargs)
 
         path = details.get("path", self.path)
+        dest = details.get("destination", None)
+
+        def send(args: Sequence[Any]) -> None:
+            self._send_signal(path, interface, name, signature, args, dest)
+
+        limit = signal_limits.get((interface, name))
+        if limit is None:
+            _signal_counts[(interface, name)] += 1
+            send(args)
+        elif interface == dbus.PROPERTIES_IFACE and name == 'PropertiesChanged':
+            from dbusmock import ratelimit  # pylint: disable=import-outside-toplevel
+            limit.submit(dest, path, args, send, args[0], ratelimit.merge_properties_changed)
+        else:
+            limit.submit(dest, path, args, send)
+
+    def _send_signal(self, path: str, interface: str, name: str, signature: str, args: Sequence[Any],
+                     dest: Optional[str]) -> None:
         sig = dbus.lowlevel.SignalMessage(path, interface, name)
         sig.append(*args, signature=signature)
-        dest = details.get("destination", None)
         if dest is not None:
             sig.set_destination(dest)
 
@@ -630,6 +1184,64 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
             conn = location[0]
             conn.send_message(sig)
         self.log(f'emit {path} {interface}.{name}{_format_args(args)}')
+        if event_log_sink is not None:
+            event_log_sink.put(calllog.CallRecord(next(_event_sequence), virtual_clock.elapsed_ns(),
+                                                  path, interface, name, signature, args))
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='ssdus',
+                         out_signature='')
+    def SetSignalRateLimit(self, interface: str, name: str, rate: float, burst: int, overflow: str) -> None:  # pylint: disable=no-self-use
+        '''Limit how fast a signal gets emitted.
+
+        interface: D-Bus interface of the signal
+        name: Name of the signal
+        rate: Maximum signals per second, per destination connection
+              (broadcasts share one limit); 0 removes the limit
+        burst: Number of signals which can go out at once after a quiet period
+        overflow: What to do with signals beyond the limit: "drop" them,
+                  "coalesce" them (send them once the limit allows, merging
+                  waiting PropertiesChanged signals of the same object and
+                  interface into one with the latest state), or
+                  "block" the mock until the limit allows sending
+
+        This protects the bus and slow clients from floods of signals, and
+        allows probing a client's throughput. See GetSignalStats() for the
+        resulting counts. The rate is in real time, regardless of
+        SetClockRate().
+        '''
+        old = signal_limits.pop((interface, name), None)
+        if old is not None:
+            old.cancel()
+        if rate:
+            from dbusmock import ratelimit  # pylint: disable=import-outside-toplevel
+
+            try:
+                signal_limits[(interface, name)] = ratelimit.SignalLimit(rate, burst, overflow)
+            except ValueError as e:
+                raise dbus.exceptions.DBusException(str(e), name='org.freedesktop.DBus.Mock.RateLimitError') from e
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='',
+                         out_signature='a{sa{st}}')
+    def GetSignalStats(self) -> Dict[str, Dict[str, int]]:  # pylint: disable=no-self-use
+        '''Get counts of emitted signals.
+
+        Return an "interface.signal" → statistics map, for all signals which
+        were emitted or have a rate limit. The statistics are "emitted",
+        "dropped", "coalesced" (replaced or merged into a waiting signal),
+        "blocked-ms" (time the mock was held up) and "waiting" (signals
+        waiting to be sent when coalescing).
+        '''
+        stats: Dict[str, Dict[str, int]] = {}
+        for (interface, name), count in _signal_counts.items():
+            stats[f'{interface}.{name}'] = {'emitted': count, 'dropped': 0, 'coalesced': 0, 'blocked-ms': 0, 'waiting': 0}
+        for (interface, name), limit in signal_limits.items():
+            limited = limit.stats()
+            limited['emitted'] += _signal_counts.get((interface, name), 0)
+            stats[f'{interface}.{name}'] = limited
+        return dbus.Dictionary({key: dbus.Dictionary(value, signature='st') for key, value in stats.items()},
+                               signature='sa{st}')
 
     @dbus.service.method(MOCK_IFACE,
                          in_signature='sssav',
@@ -673,12 +1285,12 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
     @dbus.service.method(MOCK_IFACE,
                          in_signature='',
                          out_signature='a(tsav)')
-    def GetCalls(self) -> List[CallLogType]:
+    def GetCalls(self) -> List[Tuple[int, str, Sequence[Any]]]:
         '''List all the logged calls since the last call to ClearCalls().
 
         Return a list of (timestamp, method_name, args_list) tuples.
         '''
-        return self.call_log
+        return [(row[1] // 1000000000, row[2], row[3]) for row in self.call_log]
 
     @dbus.service.method(MOCK_IFACE,
                          in_signature='s',
@@ -688,7 +1300,225 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
 
         Return a list of (timestamp, args_list) tuples.
         '''
-        return [(row[0], row[2]) for row in self.call_log if row[1] == method]
+        return [(row[1] // 1000000000, row[3]) for row in self.call_log if row[2] == method]
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='tsu',
+                         out_signature='a(ttsav)')
+    def GetCallsSince(self, seq: int, method_filter: str, limit: int) -> List[CallLogType]:
+        '''List logged calls after a given sequence number.
+
+        seq: Only return calls with a sequence number greater than this; use 0
+             to start at the beginning of the log
+        method_filter: Only return calls of this method; use '' for all calls
+        limit: Maximum number of calls to return; 0 selects the default page
+               size, and it is capped to a maximum page size
+
+        Return a list of (sequence_number, timestamp_ns, method_name,
+        args_list) tuples. Sequence numbers increase monotonically across all
+        mock objects and are not reset by ClearCalls(), so tail the log by
+        passing the last returned sequence number to the next call.
+        '''
+        limit = _page_limit(limit)
+        calls = []
+        for i in range(_call_log_index(self.call_log, seq), len(self.call_log)):
+            row = self.call_log[i]
+            if not method_filter or row[2] == method_filter:
+                calls.append(row)
+                if len(calls) >= limit:
+                    break
+        return calls
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='',
+                         out_signature='h')
+    def DumpCalls(self) -> dbus.types.UnixFd:
+        '''Return the logged calls as a file descriptor.
+
+        This returns the same calls as GetCalls(), but in the binary call log
+        format described in dbusmock.calllog, and through a file descriptor
+        (a memfd) instead of the message. Read it with
+        dbusmock.calllog.iter_calls(). As the interface and argument
+        signature of a call are not kept in memory, the interface is empty and
+        the signature is guessed from the argument types.
+        '''
+        records = [calllog.CallRecord(seq, timestamp, self.path, '', method,
+                                      ''.join(wire.guess_signature(a) for a in args), args)
+                   for (seq, timestamp, method, args) in self.call_log]
+        return _dump_fd(lambda f: calllog.write_records(f, records))
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='',
+                         out_signature='h')
+    def DumpState(self) -> dbus.types.UnixFd:  # pylint: disable=no-self-use
+        '''Return the properties of all mock objects as a file descriptor.
+
+        The snapshot format is described in dbusmock.snapshot; read it with
+        dbusmock.snapshot.iter_snapshot(). Unlike GetManagedObjects() this
+        covers all objects, and does not go through the bus daemon.
+        '''
+        from dbusmock import snapshot  # pylint: disable=import-outside-toplevel
+
+        return _dump_fd(lambda f: snapshot.write_snapshot(f, objects))
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='u',
+                         out_signature='a{sv}')
+    def GetMemoryReport(self, top_n: int) -> PropsType:  # pylint: disable=no-self-use
+        '''Report approximately where the memory of the mock objects goes.
+
+        top_n: Number of heaviest objects to list
+
+        Return a map with the keys "objects" (number of mock objects),
+        "properties" (total number of properties), "interfaces" (interface
+        name → (property count, approximate bytes)), "call-log-length" and
+        "call-log-bytes" (summed over all objects), "timeouts" (number of
+        pending timeouts) and "heaviest-objects" (list of (path, approximate
+        bytes of properties and call log), heaviest first).
+
+        Sizes are estimated with sys.getsizeof() over the property values and
+        call log entries, so this costs time proportional to the size of the
+        mock; do not call it in a tight loop.
+        '''
+        interfaces: Dict[str, List[int]] = {}
+        object_sizes = []
+        n_properties = 0
+        call_log_length = 0
+        call_log_bytes = 0
+        n_timeouts = 0
+
+        for path, obj in objects.items():
+            object_bytes = 0
+            for iface, iface_props in obj.props.items():
+                iface_bytes = _deep_sizeof(iface_props)
+                stats = interfaces.setdefault(iface, [0, 0])
+                stats[0] += len(iface_props)
+                stats[1] += iface_bytes
+                n_properties += len(iface_props)
+                object_bytes += iface_bytes
+            log_bytes = _deep_sizeof(obj.call_log)
+            call_log_length += len(obj.call_log)
+            call_log_bytes += log_bytes
+            n_timeouts += len(obj._timeouts)  # pylint: disable=protected-access
+            object_sizes.append((path, object_bytes + log_bytes))
+
+        object_sizes.sort(key=lambda entry: entry[1], reverse=True)
+
+        return {
+            'objects': dbus.UInt32(len(objects)),
+            'properties': dbus.UInt32(n_properties),
+            'interfaces': dbus.Dictionary({iface: dbus.Struct((dbus.UInt32(count), dbus.UInt64(size)), signature='ut')
+                                           for iface, (count, size) in interfaces.items()}, signature='s(ut)'),
+            'call-log-length': dbus.UInt64(call_log_length),
+            'call-log-bytes': dbus.UInt64(call_log_bytes),
+            'timeouts': dbus.UInt32(n_timeouts),
+            'heaviest-objects': dbus.Array([dbus.Struct((dbus.ObjectPath(path), dbus.UInt64(size)), signature='ot')
+                                            for path, size in object_sizes[:top_n]], signature='(ot)'),
+        }
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='savu',
+                         out_signature='tav',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def WaitForCall(self, method: str, args_filter: Sequence[Any], timeout: int,
+                    reply_handler: Callable, error_handler: Callable) -> None:
+        '''Wait until a particular method gets called.
+
+        method: Name of the method to wait for
+        args_filter: Leading arguments which the call must have; use an empty
+                     list to accept any arguments
+        timeout: Maximum time to wait in milliseconds; 0 only checks the
+                 calls which were already logged
+
+        Return the (timestamp, args_list) tuple of the matching call, like
+        GetMethodCalls(). Calls which were logged since the last ClearCalls()
+        match immediately. If there is no matching call within timeout, this
+        fails with org.freedesktop.DBus.Mock.TimeoutError. If the object gets
+        removed or the mock reset while waiting, this fails with
+        org.freedesktop.DBus.Mock.CancelledError.
+
+        This replaces polling GetCalls() or GetMethodCalls() in a loop.
+        '''
+        for row in self.call_log:
+            if _call_matches(method, args_filter, row[2], row[3]):
+                reply_handler(row[1] // 1000000000, row[3])
+                return
+
+        if not timeout:
+            error_handler(dbus.exceptions.DBusException(f'no call of {method} was logged',
+                                                        name='org.freedesktop.DBus.Mock.TimeoutError'))
+            return
+        waiter = _CallWaiter(method, args_filter, reply_handler, error_handler)
+        waiter.timeout_id = GLib.timeout_add(timeout, self._call_wait_timeout, waiter)
+        self._call_waiters.append(waiter)
+
+    def _call_wait_timeout(self, waiter: _CallWaiter) -> bool:
+        self._call_waiters.remove(waiter)
+        waiter.error_handler(dbus.exceptions.DBusException(
+            f'timed out waiting for call of {waiter.method}',
+            name='org.freedesktop.DBus.Mock.TimeoutError'))
+        return False
+
+    def cancel_call_waiters(self, reason: str) -> None:
+        '''Fail all pending WaitForCall() requests on this object'''
+
+        waiters, self._call_waiters = self._call_waiters, []
+        for waiter in waiters:
+            GLib.source_remove(waiter.timeout_id)
+            waiter.error_handler(dbus.exceptions.DBusException(
+                f'stopped waiting for call of {waiter.method}: {reason}',
+                name='org.freedesktop.DBus.Mock.CancelledError'))
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='ssdsus',
+                         out_signature='')
+    def SetFaultInjection(self, interface: str, method: str, rate: float, error_name: str,  # pylint: disable=no-self-use
+                          burst: int, seed: str) -> None:
+        '''Make calls of a method fail at random.
+
+        interface: D-Bus interface of the method; '' applies to the method
+                   on all interfaces
+        method: Name of the method
+        rate: Probability (0 to 1) that a call starts a burst of failures; 0
+              removes the fault injection
+        error_name: D-Bus error name which failing calls return, e. g.
+                    "org.freedesktop.ModemManager1.Error.Core.Failed"
+        burst: Number of consecutive calls which fail in each burst (at
+               least 1)
+        seed: Seed for deciding which calls fail; '' uses a stream derived
+              from the master seed (see get_random())
+
+        This applies to all mock objects, to methods added with AddMethod()
+        as well as template methods. Failing calls are still logged; see
+        GetCallStats() for the counts.
+        '''
+        fault_injectors.pop((interface, method), None)
+        if not rate:
+            return
+        if not 0 < rate <= 1:
+            raise dbus.exceptions.DBusException('rate must be between 0 and 1',
+                                                name='org.freedesktop.DBus.Mock.FaultInjectionError')
+        if '.' not in error_name:
+            raise dbus.exceptions.DBusException(f'invalid D-Bus error name {error_name!r}',
+                                                name='org.freedesktop.DBus.Mock.FaultInjectionError')
+        name = f'fault:{interface}.{method}'
+        rng = random.Random(f'{seed}:{name}') if seed else get_random(name, restart=True)
+        fault_injectors[(interface, method)] = _FaultInjector(rate, error_name, burst, rng)
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='',
+                         out_signature='a{s(tt)}')
+    def GetCallStats(self) -> Dict[str, Tuple[int, int]]:  # pylint: disable=no-self-use
+        '''Get call and injected fault counts of all mock objects.
+
+        Return an "interface.method" → (calls, injected faults) map for all
+        methods which were called. Unlike the call log, this is not affected
+        by ClearCalls() or SetCallLogLimit().
+        '''
+        return dbus.Dictionary({f'{interface}.{method}': dbus.Struct((dbus.UInt64(calls),
+                                                                      dbus.UInt64(_fault_counts.get((interface, method), 0))),
+                                                                     signature='tt')
+                                for (interface, method), calls in _call_counts.items()}, signature='s(tt)')
 
     @dbus.service.method(MOCK_IFACE,
                          in_signature='',
@@ -698,6 +1528,164 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
 
         self.call_log = []
 
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='stu',
+                         out_signature='')
+    def SetCallLogSink(self, path: str, max_bytes: int, backup_count: int) -> None:  # pylint: disable=no-self-use
+        '''Stream all logged calls of all mock objects into a file.
+
+        path: File to write to; it gets overwritten. Use '' to stop streaming.
+        max_bytes: Rotate the file when it grows beyond this size; 0 disables
+                   rotation
+        backup_count: Number of rotated files to keep, as path.1 (newest)
+                      to path.N (oldest)
+
+        The file is written on a background thread in the compact binary
+        format described in dbusmock.calllog, which also provides a reader.
+        Together with SetCallLogLimit() this allows soak tests to keep every
+        call without holding them all in memory.
+        '''
+        global call_log_sink  # pylint: disable=global-statement
+
+        if call_log_sink is not None:
+            call_log_sink.close()
+            call_log_sink = None
+        if path:
+            call_log_sink = calllog.CallLogSink(path, max_bytes, backup_count)
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='stu',
+                         out_signature='')
+    def SetEventLogSink(self, path: str, max_bytes: int, backup_count: int) -> None:  # pylint: disable=no-self-use
+        '''Stream all emitted signals into a file.
+
+        path: File to write to; it gets overwritten. Use '' to stop streaming.
+        max_bytes: Rotate the file when it grows beyond this size; 0 disables
+                   rotation
+        backup_count: Number of rotated files to keep, as path.1 (newest)
+                      to path.N (oldest)
+
+        This uses the call log format of dbusmock.calllog, with the signal
+        name in place of the method name, and the virtual clock's elapsed
+        time since the start of the mock as timestamp. With a fixed seed (see
+        get_random()) and a stopped clock driven by AdvanceClock(), two runs
+        produce identical files, so this exports the event schedule of a
+        seed for comparing workloads.
+        '''
+        global event_log_sink, _event_sequence  # pylint: disable=global-statement
+
+        if event_log_sink is not None:
+            event_log_sink.close()
+            event_log_sink = None
+        if path:
+            _event_sequence = itertools.count(1)
+            event_log_sink = calllog.CallLogSink(path, max_bytes, backup_count)
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='u',
+                         out_signature='')
+    def SetCallLogLimit(self, limit: int) -> None:  # pylint: disable=no-self-use
+        '''Limit the number of calls kept in memory.
+
+        limit: Maximum number of most recent calls which each mock object
+               keeps for GetCalls() and friends; 0 keeps all of them
+        '''
+        global call_log_limit  # pylint: disable=global-statement
+
+        call_log_limit = limit
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='s',
+                         out_signature='')
+    def StartProfiling(self, mode: str) -> None:  # pylint: disable=no-self-use
+        '''Start profiling the mock's main loop.
+
+        mode: "cprofile" for exact call counts and times, or "sample" for a
+              low overhead sampling profiler; append "+tracemalloc" to also
+              trace memory allocations
+
+        This profiles everything the mock does on its main loop, i. e. method
+        dispatch, property access, introspection and signal emission of all
+        mock objects, until StopProfiling() gets called. The results of an
+        earlier session which could not be written get dropped.
+        '''
+        global profiling_session  # pylint: disable=global-statement
+
+        if profiling_session is not None and profiling_session.running:
+            raise dbus.exceptions.DBusException(
+                f'profiling in mode {profiling_session.mode} is already running',
+                name='org.freedesktop.DBus.Mock.ProfilingError')
+        from dbusmock import profiling  # pylint: disable=import-outside-toplevel
+
+        try:
+            profiling_session = profiling.ProfilingSession(mode)
+        except ValueError as e:
+            raise dbus.exceptions.DBusException(str(e), name='org.freedesktop.DBus.Mock.ProfilingError') from e
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='s',
+                         out_signature='')
+    def StopProfiling(self, path: str) -> None:  # pylint: disable=no-self-use
+        '''Stop profiling and write the results.
+
+        path: File to write the profile to: a pstats file for "cprofile"
+              mode, "collapsed stacks" text for "sample" mode. With
+              "+tracemalloc", a tracemalloc snapshot gets written to
+              path + ".tracemalloc".
+
+        If the results cannot be written, profiling stays stopped and the
+        results are kept, so that StopProfiling() can be called again with
+        another path.
+        '''
+        global profiling_session  # pylint: disable=global-statement
+
+        if profiling_session is None:
+            raise dbus.exceptions.DBusException('profiling is not running',
+                                                name='org.freedesktop.DBus.Mock.ProfilingError')
+        profiling_session.stop()
+        try:
+            profiling_session.write(path)
+        except OSError as e:
+            raise dbus.exceptions.DBusException(f'cannot write profiling results to {e.filename}: {e.strerror}',
+                                                name='org.freedesktop.DBus.Mock.ProfilingError') from e
+        profiling_session = None
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='d',
+                         out_signature='')
+    def AdvanceClock(self, seconds: float) -> None:  # pylint: disable=no-self-use
+        '''Move the mock's virtual clock forward.
+
+        seconds: Number of seconds to jump ahead
+
+        All timeouts which become due within that time run before this
+        returns, in order, each seeing the clock at its due time. This lets
+        long scenarios (e. g. churn over a day) run in a fraction of the time.
+        '''
+        try:
+            virtual_clock.advance(seconds)
+        except ValueError as e:
+            raise dbus.exceptions.DBusException(str(e), name='org.freedesktop.DBus.Mock.ClockError') from e
+
+    @dbus.service.method(MOCK_IFACE,
+                         in_signature='d',
+                         out_signature='')
+    def SetClockRate(self, rate: float) -> None:  # pylint: disable=no-self-use
+        '''Change the speed of the mock's virtual clock.
+
+        rate: Virtual seconds per real second; e. g. 60 runs an hour of
+              timeouts in a minute, and 0 stops the clock so that time only
+              moves with AdvanceClock()
+
+        The clock determines timeouts of templates, logged timestamps and the
+        timestamps of the call log. WaitForCall() timeouts are not affected,
+        as they correspond to the caller's D-Bus timeout.
+        '''
+        try:
+            virtual_clock.set_rate(rate)
+        except ValueError as e:
+            raise dbus.exceptions.DBusException(str(e), name='org.freedesktop.DBus.Mock.ClockError') from e
+
     @dbus.service.signal(MOCK_IFACE, signature='sav')
     def MethodCalled(self, name, args):
         '''Signal emitted for every called mock method.
@@ -710,20 +1698,39 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
     def object_manager_emit_added(self, path: str) -> None:
         '''Emit ObjectManager.InterfacesAdded signal'''
 
-        if self.object_manager is not None:
+        if self.object_manager is not None and self.object_manager._manages(path):  # pylint: disable=protected-access
             self.object_manager.EmitSignal(OBJECT_MANAGER_IFACE, 'InterfacesAdded',
                                            'oa{sa{sv}}', [dbus.ObjectPath(path),
-                                                          objects[path].props])
+                                                          objects[path].managed_interfaces()])
 
     def object_manager_emit_removed(self, path: str) -> None:
         '''Emit ObjectManager.InterfacesRemoved signal'''
 
-        if self.object_manager is not None:
+        if self.object_manager is not None and self.object_manager._manages(path):  # pylint: disable=protected-access
             self.object_manager.EmitSignal(OBJECT_MANAGER_IFACE, 'InterfacesRemoved',
                                            'oas', [dbus.ObjectPath(path),
-                                                   objects[path].props])
-
-    def mock_method(self, interface: str, dbus_method: str, in_signature: str, *m_args, **_) -> Any:
+                                                   dbus.Array(objects[path].managed_interfaces().keys(), signature='s')])
+
+    def _log_call(self, interface: str, method: str, signature: str, args: Sequence[Any]) -> None:
+        '''Record a method call and answer pending WaitForCall() requests for it'''
+
+        self.log(method + _format_args(args))
+        _call_counts[(interface, method)] += 1
+        seq = next(_call_sequence)
+        timestamp = virtual_clock.time_ns()
+        self.call_log.append((seq, timestamp, method, args))
+        if call_log_limit and len(self.call_log) > call_log_limit:
+            del self.call_log[:len(self.call_log) - call_log_limit]
+        if call_log_sink is not None:
+            call_log_sink.put(calllog.CallRecord(seq, timestamp, self.path, interface, method, signature, args))
+        self.MethodCalled(method, args)
+
+        for waiter in [w for w in self._call_waiters if _call_matches(w.method, w.args_filter, method, args)]:
+            self._call_waiters.remove(waiter)
+            GLib.source_remove(waiter.timeout_id)
+            waiter.reply_handler(timestamp // 1000000000, args)
+
+    def mock_method(self, interface: str, dbus_method: str, in_signature: str, *m_args, **kwargs) -> Any:
         '''Master mock method.
 
         This gets "instantiated" in AddMethod(). Execute the code snippet of
@@ -734,27 +1741,98 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
         try:
             args = _convert_args(in_signature, m_args)
 
-            self.log(dbus_method + _format_args(args))
-            self.call_log.append((int(time.time()), str(dbus_method), args))
-            self.MethodCalled(dbus_method, args)
+            self._log_call(interface, str(dbus_method), in_signature, args)
+            _inject_fault(interface, str(dbus_method))
 
             # The code may be a Python 3 string to interpret, or may be a function
             # object (if AddMethod was called from within Python itself, rather than
             # over D-Bus).
             code = self.methods[interface][dbus_method][2]
+            if getattr(code, '_dbusmock_deferred', False):
+                return code(self, kwargs['reply_handler'], kwargs['error_handler'], *args)
+
+            cache = self._reply_caches.get((interface, str(dbus_method)))
+            if cache is not None:
+                try:
+                    key = wire.marshal(in_signature, args)
+                except Exception:  # pylint: disable=broad-except
+                    # e. g. variants of types which the key encoding cannot
+                    # guess; such calls just bypass the cache
+                    cache = None
+            if cache is not None:
+                found, reply = cache.lookup(key)
+                if found:
+                    return reply
+
+            reply = None
             if code and isinstance(code, types.FunctionType):
-                return code(self, *args)
-            if code:
+                reply = code(self, *args)
+            elif code:
                 loc = locals().copy()
                 exec(code, globals(), loc)  # pylint: disable=exec-used
-                if 'ret' in loc:
-                    return loc['ret']
+                reply = loc.get('ret')
+
+            if cache is not None:
+                cache.store(key, reply)
+            return reply
         except Exception as e:
             self.log(dbus_method + ' raised: ' + str(e))
             raise e
 
         return None
 
+    def managed_interfaces(self) -> Dict[str, dbus.Dictionary]:
+        '''Return the interface → properties map of this object for an ObjectManager
+
+        This has all interfaces with properties or methods, including ones
+        which only have methods, but not the STANDARD_INTERFACES every object
+        has, nor the ObjectManager interface. The property maps are copies, so
+        callers may modify them.
+        '''
+        interfaces = {}
+        for interface in itertools.chain(self.props, self.methods):
+            if interface not in interfaces and interface not in STANDARD_INTERFACES and interface != OBJECT_MANAGER_IFACE:
+                if interface in self.props:
+                    interfaces[interface] = dbus.Dictionary(self._get_all_reply(interface), signature='sv')
+                else:
+                    interfaces[interface] = dbus.Dictionary({}, signature='sv')
+        return dbus.Dictionary(interfaces, signature='sa{sv}')
+
+    def add_timeout(self, interval: int, callback: Callable[..., bool], *args) -> int:
+        '''Call callback(*args) every interval milliseconds while it returns True
+
+        This is meant for templates which simulate periodic behaviour of an
+        object. Return an ID for remove_timeout(). Unlike with plain GLib
+        timeouts, all timeouts of an object are removed automatically when the
+        object gets removed or the mock gets reset. The interval is measured
+        on virtual_clock, so it follows AdvanceClock() and SetClockRate().
+        '''
+        def run() -> bool:
+            again = False
+            try:
+                again = callback(*args)
+            finally:
+                if not again:
+                    self._timeouts.discard(source_id)
+            return again
+
+        source_id = virtual_clock.timeout_add(interval, run)
+        self._timeouts.add(source_id)
+        return source_id
+
+    def remove_timeout(self, source_id: int) -> None:
+        '''Remove a timeout added with add_timeout()'''
+
+        if source_id in self._timeouts:
+            self._timeouts.remove(source_id)
+            virtual_clock.source_remove(source_id)
+
+    def remove_timeouts(self) -> None:
+        '''Remove all timeouts added with add_timeout()'''
+
+        for source_id in list(self._timeouts):
+            self.remove_timeout(source_id)
+
     def log(self, msg: str) -> None:
         '''Log a message, prefixed with a timestamp.
 
@@ -766,7 +1844,7 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
         else:
             fd = sys.stdout.fileno()
 
-        os.write(fd, f'{time.time():.3f} {msg}\n'.encode('UTF-8'))
+        os.write(fd, f'{virtual_clock.time():.3f} {msg}\n'.encode('UTF-8'))
 
     @dbus.service.method(dbus.INTROSPECTABLE_IFACE,
                          in_signature='',
@@ -794,6 +1872,9 @@ class DBusMockObject(dbus.service.Object):  # pylint: disable=too-many-instance-
 
         xml = dbus.service.Object.Introspect(self, object_path, connection)
 
+        # imported here, as it is not needed for starting up the mock
+        from xml.etree import ElementTree  # pylint: disable=import-outside-toplevel
+
         tree = ElementTree.fromstring(xml)
 
         for name, name_props in self.props.items():
@@ -846,6 +1927,61 @@ dbus.service._method_lookup = _dbusmock_method_lookup  # pylint: disable=protect
 #
 
 
+def deferred(func: Callable) -> Callable:
+    '''Mark a method implementation for AddMethod() as answering asynchronously
+
+    func gets called as func(self, reply_handler, error_handler, *args) and
+    must eventually call reply_handler() with the return values, or
+    error_handler() with an exception. This allows templates to simulate
+    methods which take a while, without blocking the main loop.
+    '''
+    func._dbusmock_deferred = True  # type: ignore[attr-defined]
+    return func
+
+
+def seed_random(seed: Any) -> None:
+    '''Set the master seed of get_random()
+
+    All streams start over, so that templates loaded afterwards generate the
+    same values and events for the same seed.
+    '''
+    global random_seed  # pylint: disable=global-statement
+
+    random_seed = str(seed)
+    _random_streams.clear()
+
+
+def get_random(name: str, restart: bool = False) -> random.Random:
+    '''Return the pseudo random stream called name
+
+    Each stream is derived from just the master seed (see seed_random(); it
+    defaults to the DBUSMOCK_SEED environment variable, or 0) and its name, so
+    the values of one generator do not depend on how many others exist or how
+    much randomness they consumed. Templates should use a separate stream per
+    generator and object, like "signal:/org/freedesktop/ModemManager1/Modem/0".
+
+    restart: Start the stream over, for values which must come out the same
+             every time an object gets (re)created, like serial numbers
+    '''
+    if restart or name not in _random_streams:
+        _random_streams[name] = random.Random(f'{random_seed}:{name}')
+    return _random_streams[name]
+
+
+def memoized(func: Optional[Callable] = None, *, maxsize: int = MEMOIZE_SIZE) -> Callable:
+    '''Mark a method implementation for AddMethod() as cacheable
+
+    Use as @memoized or @memoized(maxsize=N). The replies of the method get
+    cached by arguments, until the objects or properties of the mock change;
+    see SetMethodMemoization().
+    '''
+    def decorate(f: Callable) -> Callable:
+        f._dbusmock_memoize = maxsize  # type: ignore[attr-defined]
+        return f
+
+    return decorate(func) if func is not None else decorate
+
+
 def get_objects() -> KeysView[str]:
     '''Return all existing object paths'''
 
@@ -0,0 +1,128 @@
+# coding: UTF-8
+'''Profiling of a running mock.
+
+A profiling session records where the mock's main loop spends its time,
+either with cProfile (exact call counts and times, written as a pstats file)
+or with a sampling profiler (low overhead, written as "collapsed stacks" text
+with one "frame;frame;frame count" line per distinct stack, as understood by
+flame graph tools). Optionally, tracemalloc records memory allocations in
+addition, which get written next to the profile as a tracemalloc snapshot.
+'''
+
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.  See http://www.gnu.org/copyleft/lgpl.html for the full text
+# of the license.
+
+import cProfile
+import collections
+import os
+import sys
+import threading
+import tracemalloc
+from types import FrameType
+from typing import Counter, Optional
+
+MODES = ('cprofile', 'sample')
+
+# seconds between two samples of the sampling profiler
+SAMPLE_INTERVAL = 0.005
+
+# number of frames tracemalloc records per allocation
+TRACEMALLOC_FRAMES = 10
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}'
+
+
+class SamplingProfiler:
+    '''Periodically sample the stack of a thread from a background thread'''
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='dbusmock-sampler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame: Optional[FrameType] = sys._current_frames().get(self.thread_id)  # pylint: disable=protected-access
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def write(self, path: str) -> None:
+        with open(path, 'w', encoding='UTF-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class ProfilingSession:
+    '''Profile the calling thread until stop() is called
+
+    mode: "cprofile" or "sample", optionally followed by "+tracemalloc" to
+          also trace memory allocations
+    '''
+
+    def __init__(self, mode: str) -> None:
+        profiler, _, extra = mode.partition('+')
+        if profiler not in MODES or extra not in ('', 'tracemalloc'):
+            raise ValueError(f'unknown profiling mode {mode!r}, must be one of {", ".join(MODES)}, optionally with "+tracemalloc"')
+
+        self.mode = mode
+        self.running = True
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[SamplingProfiler] = None
+        self._tracemalloc = extra == 'tracemalloc'
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+        if self._tracemalloc:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        if profiler == 'cprofile':
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        else:
+            self._sampler = SamplingProfiler(threading.get_ident())
+            self._sampler.start()
+
+    def stop(self) -> None:
+        '''Stop all collectors, keeping their results for write()'''
+
+        if not self.running:
+            return
+        self.running = False
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        if self._tracemalloc:
+            self._snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+    def write(self, path: str) -> None:
+        '''Write the results of a stopped session
+
+        The profile gets written to path, a tracemalloc snapshot to
+        path + ".tracemalloc". This raises OSError if a file cannot be
+        written; the results are kept, so that writing can be tried again.
+        '''
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(path)
+        if self._sampler is not None:
+            self._sampler.write(path)
+        if self._snapshot is not None:
+            self._snapshot.dump(path + '.tracemalloc')
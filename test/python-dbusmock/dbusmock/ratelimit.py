@@ -0,0 +1,183 @@
+# coding: UTF-8
+'''Rate limiting of emitted signals.
+
+A SignalLimit caps how fast one signal type gets emitted, with a token bucket
+per destination connection (broadcast signals share one). What happens to
+signals beyond the limit depends on the overflow mode:
+
+ - "drop": they get counted and discarded
+ - "coalesce": they wait until the bucket has tokens again; PropertiesChanged
+   signals of the same object and interface get merged while they wait, so
+   that a client eventually sees the latest state; other signals (like
+   InterfacesAdded) stand for events, and all of them get sent in order
+ - "block": the emitting code sleeps until the bucket has a token again,
+   which holds up the whole mock, like a scenario waiting for a slow bus
+
+The limits are in real time, as they model the throughput of the bus and
+its clients, not the simulated time of the mock.
+'''
+
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.  See http://www.gnu.org/copyleft/lgpl.html for the full text
+# of the license.
+
+import collections
+import itertools
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import dbus
+from gi.repository import GLib
+
+OVERFLOW_MODES = ('drop', 'coalesce', 'block')
+
+SendFunc = Callable[[Sequence[Any]], None]
+
+
+class TokenBucket:
+    '''Allow rate events per second on average, and bursts of up to burst events'''
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self._last = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def take(self) -> bool:
+        '''Take a token if there is one'''
+
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        '''Return the seconds until the next token is available'''
+
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+def merge_properties_changed(old: Sequence[Any], new: Sequence[Any]) -> List[Any]:
+    '''Merge two PropertiesChanged argument lists of the same interface'''
+
+    changed = dict(old[1])
+    changed.update(new[1])
+    invalidated = [name for name in old[2] if name not in new[1]]
+    invalidated += [name for name in new[2] if name not in invalidated]
+    return [new[0], dbus.Dictionary(changed, signature='sv'), dbus.Array(invalidated, signature='s')]
+
+
+class SignalLimit:
+    '''Rate limit and statistics of one signal type
+
+    rate: Signals per second per destination
+    burst: Number of signals which can be sent at once after a quiet period
+    overflow: One of OVERFLOW_MODES
+    '''
+
+    def __init__(self, rate: float, burst: int, overflow: str) -> None:
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        if overflow not in OVERFLOW_MODES:
+            raise ValueError(f'unknown overflow mode {overflow!r}, must be one of {", ".join(OVERFLOW_MODES)}')
+        self.rate = rate
+        self.burst = burst
+        self.overflow = overflow
+        self.emitted = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.blocked_ns = 0
+        self._buckets: Dict[str, TokenBucket] = {}
+        # destination -> (emitter path, coalescing key) -> (args, send function), oldest first
+        self._pending: Dict[str, 'collections.OrderedDict[Tuple[Any, ...], Tuple[Sequence[Any], SendFunc]]'] = {}
+        self._timers: Dict[str, int] = {}
+        self._serial = itertools.count()
+
+    def submit(self, destination: Optional[str], path: str, args: Sequence[Any], send: SendFunc,
+               key: Any = None, merge: Optional[Callable[[Sequence[Any], Sequence[Any]], Sequence[Any]]] = None) -> None:
+        '''Send a signal now, or handle it according to the overflow mode
+
+        destination: Unique name the signal is addressed to, or None for
+                     broadcasts
+        path: Object path of the emitter
+        args: Signal arguments, passed to send()
+        key: Identifies what the signal is about within the emitter (e. g. the
+             interface of PropertiesChanged); waiting signals with the same
+             path and key get coalesced. None never coalesces the signal.
+        merge: Called with the waiting and the new arguments when coalescing;
+               by default the new ones replace the waiting ones
+        '''
+        dest = destination or ''
+        bucket = self._buckets.get(dest)
+        if bucket is None:
+            bucket = self._buckets[dest] = TokenBucket(self.rate, self.burst)
+
+        # keep the order of signals: nothing overtakes waiting ones
+        if not self._pending.get(dest) and bucket.take():
+            self.emitted += 1
+            send(args)
+        elif self.overflow == 'drop':
+            self.dropped += 1
+        elif self.overflow == 'block':
+            wait = bucket.wait_time()
+            time.sleep(wait)
+            self.blocked_ns += int(wait * 1e9)
+            bucket.take()
+            self.emitted += 1
+            send(args)
+        else:
+            pending = self._pending.setdefault(dest, collections.OrderedDict())
+            pending_key = (path, next(self._serial) if key is None else key)
+            if pending_key in pending:
+                self.coalesced += 1
+                if merge is not None:
+                    args = merge(pending[pending_key][0], args)
+            pending[pending_key] = (args, send)
+            self._arm(dest)
+
+    def _arm(self, dest: str) -> None:
+        if dest not in self._timers:
+            delay = math.ceil(self._buckets[dest].wait_time() * 1000)
+            self._timers[dest] = GLib.timeout_add(delay, self._flush, dest)
+
+    def _flush(self, dest: str) -> bool:
+        del self._timers[dest]
+        pending = self._pending[dest]
+        bucket = self._buckets[dest]
+        while pending and bucket.take():
+            args, send = pending.popitem(last=False)[1]
+            self.emitted += 1
+            send(args)
+        if pending:
+            self._arm(dest)
+        return False
+
+    def discard(self, path: str) -> None:
+        '''Forget the waiting signals of an object which went away'''
+
+        for pending in self._pending.values():
+            for pending_key in [k for k in pending if k[0] == path]:
+                del pending[pending_key]
+
+    def cancel(self) -> None:
+        '''Stop sending waiting signals'''
+
+        for timer in self._timers.values():
+            GLib.source_remove(timer)
+        self._timers.clear()
+        self._pending.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'emitted': self.emitted, 'dropped': self.dropped, 'coalesced': self.coalesced,
+                'blocked-ms': self.blocked_ns // 1000000,
+                'waiting': sum(len(pending) for pending in self._pending.values())}
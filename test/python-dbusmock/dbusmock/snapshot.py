@@ -0,0 +1,49 @@
+# coding: UTF-8
+'''State snapshot files.
+
+A snapshot starts with the MAGIC header, followed by one frame per mock
+object (see dbusmock.wire.frame()). Each frame body is in D-Bus wire format
+with the signature "oa{sa{sv}}": the object path and its interface →
+property → value map, as in GetManagedObjects().
+'''
+
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.  See http://www.gnu.org/copyleft/lgpl.html for the full text
+# of the license.
+
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, Tuple, Union
+
+from dbusmock import wire
+
+MAGIC = b'DBUSMOCK-STATE-1'
+
+OBJECT_SIGNATURE = 'oa{sa{sv}}'
+
+
+def write_snapshot(f: BinaryIO, objects: Dict[str, Any]) -> None:
+    '''Write the properties of all given path → DBusMockObject entries to f'''
+
+    f.write(MAGIC)
+    for path, obj in objects.items():
+        f.write(wire.frame(wire.marshal(OBJECT_SIGNATURE, (path, obj.props))))
+
+
+def iter_snapshot(source: Union[str, Path, BinaryIO]) -> Iterator[Tuple[str, Dict[str, Dict[str, Any]]]]:
+    '''Lazily iterate over the (path, interface → property → value) entries of a snapshot
+
+    source: File name or binary file object, positioned at the start of a
+            snapshot
+    '''
+    if isinstance(source, (str, Path)):
+        with open(source, 'rb') as f:
+            yield from iter_snapshot(f)
+        return
+
+    if source.read(len(MAGIC)) != MAGIC:
+        raise ValueError('not a dbusmock snapshot')
+    for body in wire.iter_frames(source):
+        path, props = wire.unmarshal(OBJECT_SIGNATURE, body)
+        yield (path, props)
@@ -19,8 +19,9 @@ __copyright__ = '''
 from typing import List, Dict, Optional
 from enum import Enum
 
-import uuid
-import binascii
+import itertools
+import math
+import time
 
 import dbus
 from dbusmock import MOCK_IFACE, OBJECT_MANAGER_IFACE, mockobject
@@ -37,11 +38,41 @@ MANAGER_OBJ = '/org/freedesktop/ModemManager1'
 MODEM_IFACE = 'org.freedesktop.ModemManager1.Modem'
 MODEM_BASE_OBJ = '/org/freedesktop/ModemManager1/Modem/'
 MODEM3GPP_IFACE = 'org.freedesktop.ModemManager1.Modem.Modem3gpp'
+SIGNAL_IFACE = 'org.freedesktop.ModemManager1.Modem.Signal'
+LOCATION_IFACE = 'org.freedesktop.ModemManager1.Modem.Location'
+SIMPLE_IFACE = 'org.freedesktop.ModemManager1.Modem.Simple'
 SIM_IFACE = 'org.freedesktop.ModemManager1.Sim'
 SIM_BASE_OBJ = '/org/freedesktop/ModemManager1/SIM/'
-BEAERER_IFACE = 'org.freedesktop.ModemManager1.Bearer'
+BEARER_IFACE = 'org.freedesktop.ModemManager1.Bearer'
 BEARER_BASE_OBJ = '/org/freedesktop/ModemManager1/Bearer/'
 
+# how often, in ms, a modem checks signal thresholds when polling is disabled
+SIGNAL_THRESHOLD_INTERVAL = 1000
+
+# data port which bearers connect through
+BEARER_INTERFACE = 'wwx000011121314'
+
+# meters per degree of latitude
+METERS_PER_DEGREE = 111320
+
+# maximum ScanNetworkCount; the generated operator codes run out at 600 * 198
+MAX_SCAN_NETWORKS = 10000
+
+# signal measurement -> (initial value, minimum, maximum) for each access technology
+SIGNAL_RANGES = {'Umts': {'rssi': (-70.0, -110.0, -30.0),
+                          'rscp': (-80.0, -120.0, -25.0),
+                          'ecio': (-6.0, -24.0, 0.0),
+                          'error-rate': (0.5, 0.0, 10.0)},
+                 'Lte': {'rssi': (-65.0, -100.0, -30.0),
+                         'rsrq': (-9.0, -20.0, -3.0),
+                         'rsrp': (-95.0, -140.0, -44.0),
+                         'snr': (12.0, -20.0, 30.0),
+                         'error-rate': (0.5, 0.0, 10.0)},
+                 'Nr5g': {'rsrq': (-11.0, -20.0, -3.0),
+                          'rsrp': (-100.0, -140.0, -44.0),
+                          'snr': (15.0, -20.0, 40.0),
+                          'error-rate': (0.5, 0.0, 10.0)}}
+
 
 class BearerAllowedAuth(Enum):
     # Unknown.
@@ -223,6 +254,40 @@ class BearerType(Enum):
     MM_BEARER_TYPE_DEDICATED = 3
 
 
+class Modem3gppNetworkAvailability(Enum):
+    # Unknown availability.
+    MM_MODEM_3GPP_NETWORK_AVAILABILITY_UNKNOWN = 0
+
+    # Network is available.
+    MM_MODEM_3GPP_NETWORK_AVAILABILITY_AVAILABLE = 1
+
+    # Network is the current one.
+    MM_MODEM_3GPP_NETWORK_AVAILABILITY_CURRENT = 2
+
+    # Network is forbidden.
+    MM_MODEM_3GPP_NETWORK_AVAILABILITY_FORBIDDEN = 3
+
+
+class Modem3gppRegistrationState(Enum):
+    # Not registered, not searching for new operator to register.
+    MM_MODEM_3GPP_REGISTRATION_STATE_IDLE = 0
+
+    # Registered on home network.
+    MM_MODEM_3GPP_REGISTRATION_STATE_HOME = 1
+
+    # Not registered, searching for new operator to register with.
+    MM_MODEM_3GPP_REGISTRATION_STATE_SEARCHING = 2
+
+    # Registration denied.
+    MM_MODEM_3GPP_REGISTRATION_STATE_DENIED = 3
+
+    # Unknown registration status.
+    MM_MODEM_3GPP_REGISTRATION_STATE_UNKNOWN = 4
+
+    # Registered on a roaming network.
+    MM_MODEM_3GPP_REGISTRATION_STATE_ROAMING = 5
+
+
 class ModemAccessTechnology(Enum):
     # The access technology used is unknown.
     MM_MODEM_ACCESS_TECHNOLOGY_UNKNOWN = 0
@@ -537,6 +602,32 @@ class ModemCdmaRmProtocol(Enum):
     MM_MODEM_CDMA_RM_PROTOCOL_STU_III = 5
 
 
+class ModemLocationSource(Enum):
+    # None.
+    MM_MODEM_LOCATION_SOURCE_NONE = 0
+
+    # Location Area Code and Cell ID.
+    MM_MODEM_LOCATION_SOURCE_3GPP_LAC_CI = 1 << 0
+
+    # GPS location given by predefined keys.
+    MM_MODEM_LOCATION_SOURCE_GPS_RAW = 1 << 1
+
+    # GPS location given as NMEA traces.
+    MM_MODEM_LOCATION_SOURCE_GPS_NMEA = 1 << 2
+
+    # CDMA base station position.
+    MM_MODEM_LOCATION_SOURCE_CDMA_BS = 1 << 3
+
+    # No location given, just GPS module setup.
+    MM_MODEM_LOCATION_SOURCE_GPS_UNMANAGED = 1 << 4
+
+    # Mobile Station Assisted A-GPS location requested.
+    MM_MODEM_LOCATION_SOURCE_AGPS_MSA = 1 << 5
+
+    # Mobile Station Based A-GPS location requested.
+    MM_MODEM_LOCATION_SOURCE_AGPS_MSB = 1 << 6
+
+
 class ModemLock(Enum):
     # Lock reason unknown.
     MM_MODEM_LOCK_UNKNOWN = 0
@@ -724,18 +815,33 @@ class ModemStateFailedReason(Enum):
     # SIM is available, but unusable (e.g. permanently locked).
     MM_MODEM_STATE_FAILED_REASON_SIM_ERROR = 3
 
+def managedModem(path):
+    return dbusmock.get_object(path).managed_interfaces()
+
 def getManagedModems(self, objects):
     paths = [path for path in objects if MODEM_BASE_OBJ in path]
     modems = {}
 
     for path in paths:
-        modems[path] = {MODEM_IFACE: dbusmock.get_object(path).GetAll(MODEM_IFACE),
-                        'org.freedesktop.DBus.Properties': {}}
-    print(modems)
+        modems[path] = managedModem(path)
 
     return dbus.Dictionary(modems, signature='oa{sa{sv}}')
 
+def getManagedModemsPaged(self, objects, cursor, limit):
+    paths, next_cursor = objects.page(MODEM_BASE_OBJ, cursor, limit)
+    modems = {path: managedModem(path) for path in paths}
+
+    return (dbus.Dictionary(modems, signature='oa{sa{sv}}'), next_cursor)
+
+bearer_index = itertools.count()
+
+
 def load(mock, parameters):
+    global bearer_index  # pylint: disable=global-statement
+    bearer_index = itertools.count()
+    if 'Seed' in parameters:
+        mockobject.seed_random(parameters['Seed'])
+
     # Main object
     manager_props = {'Version': parameters.get('Version', '1.20.0')}
     manager_methods = [('ScanDevices', '', '', ''),
@@ -748,17 +854,64 @@ def load(mock, parameters):
 
     obj = dbusmock.get_object(MANAGER_OBJ)
     obj.getManagedModems = getManagedModems
+    obj.getManagedModemsPaged = getManagedModemsPaged
     obj.AddMethod('org.freedesktop.DBus.ObjectManager', 'GetManagedObjects', '', 'a{oa{sa{sv}}}', 'ret = self.getManagedModems(self, objects)')
+    obj.AddMethod('org.freedesktop.DBus.ObjectManager', 'GetManagedObjectsPaged', 'su', 'a{oa{sa{sv}}}s', 'ret = self.getManagedModemsPaged(self, objects, args[0], args[1])')
+    # both only depend on the mock's state, so repeated calls on an unchanged tree are served from cache;
+    # with hotplug churn the tree hardly stays unchanged between calls, so there it is off unless asked for
+    churn_interval = int(parameters.get('ChurnInterval', 0))
+    if parameters.get('MemoizeManagedObjects', not churn_interval):
+        obj.SetMethodMemoization(OBJECT_MANAGER_IFACE, 'GetManagedObjects', 1)
+        obj.SetMethodMemoization(OBJECT_MANAGER_IFACE, 'GetManagedObjectsPaged', mockobject.MEMOIZE_SIZE)
+
+    for index in range(int(parameters.get('ModemCount', 1))):
+        addModem(mock, index, parameters)
+
+    # hotplug churn: every ChurnInterval ms, ChurnBurst modems disappear for ChurnDowntime ms
+    if churn_interval:
+        obj.add_timeout(churn_interval, churnModems, obj, int(parameters.get('ChurnBurst', 1)),
+                        int(parameters.get('ChurnDowntime', 1000)), parameters)
+
+
+# optional modem interfaces, as named in the ModemInterfaces parameter
+MODEM_INTERFACES = {'Modem3gpp': MODEM3GPP_IFACE,
+                    'Signal': SIGNAL_IFACE,
+                    'Location': LOCATION_IFACE,
+                    'Simple': SIMPLE_IFACE}
+
+def modemInterfaces(index, parameters):
+    # a list of names for all modems, or a list of such lists which get used for the modems in turn
+    selection = parameters.get('ModemInterfaces', list(MODEM_INTERFACES))
+    if isinstance(selection, str):
+        selection = [name for name in selection.split(',') if name]
+    if selection and not isinstance(selection[0], str):
+        selection = selection[index % len(selection)]
+    unknown = set(selection) - set(MODEM_INTERFACES)
+    if unknown:
+        raise dbus.exceptions.DBusException('Unknown modem interfaces %s, must be some of %s' % (', '.join(sorted(unknown)), ', '.join(MODEM_INTERFACES)),
+                                            name='org.freedesktop.DBus.Mock.TemplateError')
+    return set(selection)
+
+def addModem(mock, index, parameters):
+    modem_path = MODEM_BASE_OBJ + str(index)
+    sim_path = SIM_BASE_OBJ + str(index)
+    enabled = bool(parameters.get('ModemEnabled', True))
+    interfaces = modemInterfaces(index, parameters)
+    # identities stay the same when a modem gets replugged
+    identity = mockobject.get_random('identity:%i' % index, restart=True)
+    imei = luhnComplete('35%012i' % identity.randrange(10 ** 12))
+    imsi = '310410%09i' % identity.randrange(10 ** 9)
+    iccid = luhnComplete('8901410%012i' % identity.randrange(10 ** 12))
 
     # Sample Modem
-    modem_props = {'Sim': dbus.ObjectPath(SIM_BASE_OBJ + '0'), # o
-                   'SimSlots': dbus.Array([dbus.ObjectPath(SIM_BASE_OBJ + '0')], signature='o'), # ao
+    modem_props = {'Sim': dbus.ObjectPath(sim_path), # o
+                   'SimSlots': dbus.Array([dbus.ObjectPath(sim_path)], signature='o'), # ao
                    'PrimarySimSlot': dbus.UInt32(0), # u
                    'Bearers': dbus.Array([], signature='o'), # ao
                    'SupportedCapabilities': dbus.Array([ModemCapability.MM_MODEM_CAPABILITY_CDMA_EVDO.value + ModemCapability.MM_MODEM_CAPABILITY_LTE.value], signature='u'), # au
                    'CurrentCapabilities': dbus.UInt32(ModemCapability.MM_MODEM_CAPABILITY_CDMA_EVDO.value + ModemCapability.MM_MODEM_CAPABILITY_LTE.value), # u
-                   'MaxBearers': dbus.UInt32(2), # u
-                   'MaxActiveBearers': dbus.UInt32(1), # u
+                   'MaxBearers': dbus.UInt32(parameters.get('MaxBearers', 2)), # u
+                   'MaxActiveBearers': dbus.UInt32(parameters.get('MaxActiveBearers', 1)), # u
                    'MaxActiveMultiplexedBearers': dbus.UInt32(0), # u
                    'Manufacturer': 'HarborDigital', # s
                    'Model': 'ModemManager-Mock', # s
@@ -772,31 +925,34 @@ def load(mock, parameters):
                    'Plugin': 'python-dbusmock', # s
                    'PrimaryPort': 'ttyACM0', # s
                    'Ports': dbus.Array([('ttyACM3', 3), ('ttyACM3', 1), ('wwx000011121314', 2), ('ttyACM5', 1), ('ttyACM0', 3), ('ttyACM1', 1), ('ttyACM2', 1), ], signature='(su)'), # a(su)
-                   'EquipmentIdentifier': '12456test', # s
+                   'EquipmentIdentifier': imei, # s
                    'UnlockRequired': dbus.UInt32(ModemLock.MM_MODEM_LOCK_NONE.value), # u
                    'UnlockRetries': dbus.Dictionary({}, signature='uu'), # a{uu}
-                   'State': dbus.Int32(ModemState.MM_MODEM_STATE_REGISTERED.value), # i
+                   'State': dbus.Int32(ModemState.MM_MODEM_STATE_REGISTERED.value if enabled else ModemState.MM_MODEM_STATE_DISABLED.value), # i
                    'StateFailedReason': dbus.UInt32(ModemStateFailedReason.MM_MODEM_STATE_FAILED_REASON_NONE.value), # u
                    'AccessTechnologies': ModemAccessTechnology.MM_MODEM_ACCESS_TECHNOLOGY_LTE.value + ModemAccessTechnology.MM_MODEM_ACCESS_TECHNOLOGY_EVDO0.value, # u
                    'SignalQuality': dbus.Struct((dbus.UInt32(76), dbus.Boolean(True)), signature='ub'), # (ub)
                    'OwnNumbers': dbus.Array([], signature='s'), # as
-                   'PowerState': ModemPowerState.MM_MODEM_POWER_STATE_ON.value, # u
+                   'PowerState': dbus.UInt32(ModemPowerState.MM_MODEM_POWER_STATE_ON.value if enabled else ModemPowerState.MM_MODEM_POWER_STATE_LOW.value), # u
                    'SupportedModes': dbus.Array([dbus.Struct((ModemMode.MM_MODEM_MODE_4G.value + ModemMode.MM_MODEM_MODE_3G.value, ModemMode.MM_MODEM_MODE_4G.value), signature='uu')], signature='(uu)'), # a(uu)
                    'CurrentModes': dbus.Struct((ModemMode.MM_MODEM_MODE_4G.value + ModemMode.MM_MODEM_MODE_3G.value, ModemMode.MM_MODEM_MODE_4G.value), signature='uu'), # (uu)
                    'SupportedBands': dbus.Array([ModemBand.MM_MODEM_BAND_UNKNOWN.value], signature='u'), # au
                    'CurrentBands': dbus.Array([ModemBand.MM_MODEM_BAND_UNKNOWN.value], signature='u'), # au
                    'SupportedIpFamilies': dbus.UInt32(BearerIpFamily.MM_BEARER_IP_FAMILY_IPV4V6.value + BearerIpFamily.MM_BEARER_IP_FAMILY_IPV4.value + BearerIpFamily.MM_BEARER_IP_FAMILY_IPV6.value)} # u
-    modem_methods = [('Ope', '', '', '')]
-    mock.AddObject(MODEM_BASE_OBJ + '0',
+    modem_methods = [('Ope', '', '', ''),
+                     ('Enable', 'b', '', modemEnable),
+                     ('CreateBearer', 'a{sv}', 'o', createBearer),
+                     ('DeleteBearer', 'o', '', deleteBearer),
+                     ('ListBearers', '', 'ao', 'ret = self.props["%s"]["Bearers"]' % MODEM_IFACE)]
+    mock.AddObject(modem_path,
                    MODEM_IFACE,
                    modem_props,
                    modem_methods)
-    mock.object_manager_emit_added(MODEM_BASE_OBJ + '0')
 
     # Sample SIM
     sim_props = {'Active': True,                                            # b
-                 'SimIdentifier': '11111111111111111111',                   # s
-                 'Imsi': '111111111111111',                                 # s
+                 'SimIdentifier': iccid,                                    # s
+                 'Imsi': imsi,                                              # s
                  'Eid': '',                                                 # s
                  'OperatorIdentifier': '310030',                            # s
                  'OperatorName': 'Harbor-test',                             # s
@@ -804,14 +960,45 @@ def load(mock, parameters):
                  'PreferredNetworks': dbus.Array([('310030', 0)], signature='(su)')}            # a(su)
     sim_methods = [('Ope', '', '', '')]
 
-    mock.AddObject(SIM_BASE_OBJ + '0',
+    mock.AddObject(sim_path,
                    SIM_IFACE,
                    sim_props,
                    sim_methods)
-    mock.object_manager_emit_added(SIM_BASE_OBJ + '0')
-
-    modem3gpp_props = {'Imei': '111111111111111',
-                       'RegistrationState': 1,
+    mock.object_manager_emit_added(sim_path)
+
+    obj = dbusmock.get_object(modem_path)
+    obj.state_delays = {'enable': int(parameters.get('EnableDelay', 500)),
+                        'disable': int(parameters.get('DisableDelay', 300)),
+                        'search': int(parameters.get('SearchDelay', 200)),
+                        'register': int(parameters.get('RegisterDelay', 1000))}
+    obj.state_timer = 0
+    obj.abort_state_transition = None
+    obj.bearer_settings = {'connect_delay': int(parameters.get('BearerConnectDelay', 500)),
+                           'disconnect_delay': int(parameters.get('BearerDisconnectDelay', 200)),
+                           'stats_interval': int(parameters.get('BearerStatsInterval', 1000)),
+                           'rx_rate': int(parameters.get('BearerRxRate', 125000)),
+                           'tx_rate': int(parameters.get('BearerTxRate', 25000))}
+
+    if 'Modem3gpp' in interfaces:
+        addModem3gpp(obj, index, parameters, imei, enabled)
+    if 'Simple' in interfaces:
+        simple_methods = [('Connect', 'a{sv}', 'o', simpleConnect),
+                          ('Disconnect', 'o', '', simpleDisconnect),
+                          ('GetStatus', '', 'a{sv}', simpleGetStatus)]
+        obj.AddMethods(SIMPLE_IFACE,
+                       simple_methods)
+    if 'Signal' in interfaces:
+        addSignal(obj)
+    if 'Location' in interfaces:
+        addLocation(obj, index, parameters)
+
+    # announce the modem once it has all its interfaces
+    mock.object_manager_emit_added(modem_path)
+
+
+def addModem3gpp(obj, index, parameters, imei, enabled):
+    modem3gpp_props = {'Imei': imei,
+                       'RegistrationState': dbus.UInt32(Modem3gppRegistrationState.MM_MODEM_3GPP_REGISTRATION_STATE_HOME.value if enabled else Modem3gppRegistrationState.MM_MODEM_3GPP_REGISTRATION_STATE_IDLE.value),
                        'OperatorCode': '310410',
                        'OperatorName': 'AT&T',
                        'EnabledFacilityLocks': 0,
@@ -822,17 +1009,684 @@ def load(mock, parameters):
                        'InitialEpsBearerSettings': dbus.Dictionary({}, signature='sv'),
                        'PacketServiceState': 0,
                        'Nr5gRegistrationSettings': dbus.Dictionary({}, signature='sv')}
-    modem3gpp_methods = [('Register', 's', '', ''),
-                         ('Scan', '', 'aa{sv}', ''),
+    modem3gpp_methods = [('Register', 's', '', modem3gppRegister),
+                         ('Scan', '', 'aa{sv}', modem3gppScan),
                          ('SetEpsUeModeOperation', 'u', '', ''),
                          ('SetInitialEpsBearerSettings', 'a{sv}', '', ''),
                          ('SetNr5gRegistrationSettings', 'a{sv}', '', ''),
                          ('DisableFacilityLock', '(us)', '', ''),
                          ('SetPacketServiceState', 'u', '', '')]
-    
-    obj = dbusmock.get_object(MODEM_BASE_OBJ + '0')
+
     obj.AddProperties(MODEM3GPP_IFACE,
                       modem3gpp_props)
     obj.AddMethods(MODEM3GPP_IFACE,
                    modem3gpp_methods)
 
+    scan_count = int(parameters.get('ScanNetworkCount', 300))
+    if not 0 <= scan_count <= MAX_SCAN_NETWORKS:
+        raise dbus.exceptions.DBusException('ScanNetworkCount must be between 0 and %i' % MAX_SCAN_NETWORKS,
+                                            name='org.freedesktop.DBus.Mock.TemplateError')
+    obj.scan_duration = int(parameters.get('ScanDuration', 3000))
+    obj.scan_results = scanResults(mockobject.get_random('scan:%i' % index, restart=True),
+                                   scan_count,
+                                   modem3gpp_props['OperatorCode'])
+    obj.scan_timer = 0
+    obj.abort_scan = None
+
+
+def luhnComplete(digits):
+    '''Append the Luhn check digit, as used by IMEIs and ICCIDs'''
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        value = int(digit) * (2 if i % 2 == 0 else 1)
+        total += value // 10 + value % 10
+    return digits + str(-total % 10)
+
+def scanResults(rng, count, current_operator):
+    technologies = [ModemAccessTechnology.MM_MODEM_ACCESS_TECHNOLOGY_UMTS.value,
+                    ModemAccessTechnology.MM_MODEM_ACCESS_TECHNOLOGY_HSPA.value,
+                    ModemAccessTechnology.MM_MODEM_ACCESS_TECHNOLOGY_LTE.value]
+    codes = {current_operator} if count else set()
+    while len(codes) < count:
+        codes.add('%03i%0*i' % (rng.randint(200, 799), rng.choice((2, 3)), rng.randint(1, 99)))
+
+    networks = []
+    for code in sorted(codes):
+        if code == current_operator:
+            status = Modem3gppNetworkAvailability.MM_MODEM_3GPP_NETWORK_AVAILABILITY_CURRENT.value
+        else:
+            status = rng.choice((Modem3gppNetworkAvailability.MM_MODEM_3GPP_NETWORK_AVAILABILITY_AVAILABLE.value,
+                                 Modem3gppNetworkAvailability.MM_MODEM_3GPP_NETWORK_AVAILABILITY_AVAILABLE.value,
+                                 Modem3gppNetworkAvailability.MM_MODEM_3GPP_NETWORK_AVAILABILITY_FORBIDDEN.value,
+                                 Modem3gppNetworkAvailability.MM_MODEM_3GPP_NETWORK_AVAILABILITY_UNKNOWN.value))
+        networks.append(dbus.Dictionary({'status': dbus.UInt32(status),
+                                         'operator-long': 'Operator %s' % code,
+                                         'operator-short': 'OP%s' % code,
+                                         'operator-code': code,
+                                         'access-technology': dbus.UInt32(rng.choice(technologies))}, signature='sv'))
+    return dbus.Array(networks, signature='a{sv}')
+
+@mockobject.deferred
+def modem3gppScan(self, reply_handler, error_handler):
+    if self.scan_timer:
+        error_handler(dbus.exceptions.DBusException('Network scan already in progress',
+                                                    name='org.freedesktop.ModemManager1.Error.Core.InProgress'))
+        return
+
+    self.scan_timer = self.add_timeout(self.scan_duration, modem3gppScanDone, self, reply_handler)
+    self.abort_scan = error_handler
+
+def modem3gppScanDone(modem, reply_handler):
+    modem.scan_timer = 0
+    modem.abort_scan = None
+    reply_handler(modem.scan_results)
+    return False
+
+
+def removeModem(mock, index):
+    modem_path = MODEM_BASE_OBJ + str(index)
+    sim_path = SIM_BASE_OBJ + str(index)
+    modem = dbusmock.get_object(modem_path)
+
+    # removing the objects drops their timeouts, so answer the calls which wait for them first
+    cancelStateTransition(modem)
+    if getattr(modem, 'abort_scan', None):
+        modem.remove_timeout(modem.scan_timer)
+        modem.scan_timer = 0
+        abort, modem.abort_scan = modem.abort_scan, None
+        abort(dbus.exceptions.DBusException('Modem was removed',
+                                            name='org.freedesktop.ModemManager1.Error.Core.Aborted'))
+    for bearer_path in modem.props[MODEM_IFACE]['Bearers']:
+        bearer = dbusmock.get_object(bearer_path)
+        if bearer.transition:
+            bearer.transition = 0
+            bearer.abort_transition(dbus.exceptions.DBusException('Modem was removed',
+                                                                  name='org.freedesktop.ModemManager1.Error.Core.Aborted'))
+        # like with ModemManager, bearers are not announced through the ObjectManager
+        mock.RemoveObject(bearer_path)
+
+    mock.object_manager_emit_removed(sim_path)
+    mock.RemoveObject(sim_path)
+    mock.object_manager_emit_removed(modem_path)
+    mock.RemoveObject(modem_path)
+
+def churnModems(manager, burst, downtime, parameters):
+    present = [int(path[len(MODEM_BASE_OBJ):]) for path in dbusmock.get_objects() if path.startswith(MODEM_BASE_OBJ)]
+    for index in mockobject.get_random('churn').sample(present, min(burst, len(present))):
+        removeModem(manager, index)
+        manager.add_timeout(downtime, replugModem, manager, index, parameters)
+    return True
+
+def replugModem(manager, index, parameters):
+    addModem(manager, index, parameters)
+    return False
+
+
+def addSignal(modem):
+    modem.signal_values = {tech: {name: limits[0] for name, limits in values.items()}
+                           for tech, values in SIGNAL_RANGES.items()}
+    modem.signal_reported = None
+    modem.signal_timer = 0
+
+    signal_props = {'Rate': dbus.UInt32(0), # u
+                    'RssiThreshold': dbus.UInt32(0), # u
+                    'ErrorRateThreshold': dbus.Boolean(False), # b
+                    'Cdma': dbus.Dictionary({}, signature='sv'), # a{sv}
+                    'Evdo': dbus.Dictionary({}, signature='sv'), # a{sv}
+                    'Gsm': dbus.Dictionary({}, signature='sv')} # a{sv}
+    for tech, values in modem.signal_values.items():
+        signal_props[tech] = dbus.Dictionary(values, signature='sv') # a{sv}
+    signal_methods = [('Setup', 'u', '', signalSetup),
+                      ('SetupThresholds', 'a{sv}', '', signalSetupThresholds)]
+
+    modem.AddProperties(SIGNAL_IFACE,
+                        signal_props)
+    modem.AddMethods(SIGNAL_IFACE,
+                     signal_methods)
+
+def signalSetup(self, rate):
+    self.UpdateProperties(SIGNAL_IFACE, {'Rate': dbus.UInt32(rate)})
+    restartSignalTimer(self)
+
+def signalSetupThresholds(self, settings):
+    props = {}
+    if 'rssi-threshold' in settings:
+        props['RssiThreshold'] = dbus.UInt32(settings['rssi-threshold'])
+    if 'error-rate-threshold' in settings:
+        props['ErrorRateThreshold'] = dbus.Boolean(settings['error-rate-threshold'])
+    if props:
+        self.UpdateProperties(SIGNAL_IFACE, props)
+    restartSignalTimer(self)
+
+def restartSignalTimer(modem):
+    if modem.signal_timer:
+        modem.remove_timeout(modem.signal_timer)
+        modem.signal_timer = 0
+
+    props = modem.props[SIGNAL_IFACE]
+    if props['Rate']:
+        interval = props['Rate'] * 1000
+    elif props['RssiThreshold'] or props['ErrorRateThreshold']:
+        # with thresholds only, the modem itself keeps measuring
+        interval = SIGNAL_THRESHOLD_INTERVAL
+    else:
+        return
+    modem.signal_reported = None
+    modem.signal_timer = modem.add_timeout(interval, refreshSignal, modem)
+
+def refreshSignal(modem):
+    # random walk within the plausible range of each measurement
+    rng = mockobject.get_random('signal:' + modem.path)
+    for tech, values in modem.signal_values.items():
+        for name, (_, low, high) in SIGNAL_RANGES[tech].items():
+            step = rng.gauss(0.0, (high - low) / 50)
+            values[name] = round(min(high, max(low, values[name] + step)), 1)
+
+    props = modem.props[SIGNAL_IFACE]
+    lte = modem.signal_values['Lte']
+    if modem.signal_reported is not None:
+        rssi_changed = props['RssiThreshold'] and abs(lte['rssi'] - modem.signal_reported['rssi']) >= props['RssiThreshold']
+        error_rate_changed = props['ErrorRateThreshold'] and lte['error-rate'] != modem.signal_reported['error-rate']
+        if (props['RssiThreshold'] or props['ErrorRateThreshold']) and not (rssi_changed or error_rate_changed):
+            return True
+
+    modem.signal_reported = dict(lte)
+    modem.UpdateProperties(SIGNAL_IFACE, {tech: dbus.Dictionary(values, signature='sv')
+                                          for tech, values in modem.signal_values.items()})
+    return True
+
+
+def addLocation(modem, index, parameters):
+    # each modem drives around a circle of the same size, starting at a different angle
+    modem.location_track = {'latitude': float(parameters.get('LocationLatitude', 44.9778)),
+                            'longitude': float(parameters.get('LocationLongitude', -93.2650)),
+                            'radius': float(parameters.get('LocationRadius', 500.0)),
+                            'speed': float(parameters.get('LocationSpeed', 15.0)),
+                            'angle': (index * 0.618 * 2 * math.pi) % (2 * math.pi)}
+    modem.location_fix_interval = int(parameters.get('GpsFixInterval', 1000))
+    modem.location_timer = 0
+
+    location_props = {'Capabilities': dbus.UInt32(ModemLocationSource.MM_MODEM_LOCATION_SOURCE_3GPP_LAC_CI.value + ModemLocationSource.MM_MODEM_LOCATION_SOURCE_GPS_RAW.value + ModemLocationSource.MM_MODEM_LOCATION_SOURCE_GPS_NMEA.value), # u
+                      'SupportedAssistanceData': dbus.UInt32(0), # u
+                      'Enabled': dbus.UInt32(ModemLocationSource.MM_MODEM_LOCATION_SOURCE_NONE.value), # u
+                      'SignalsLocation': dbus.Boolean(False), # b
+                      'Location': dbus.Dictionary({}, signature='uv'), # a{uv}
+                      'SuplServer': '', # s
+                      'AssistanceDataServers': dbus.Array([], signature='s'), # as
+                      'GpsRefreshRate': dbus.UInt32(30)} # u
+    location_methods = [('Setup', 'ub', '', locationSetup),
+                        ('GetLocation', '', 'a{uv}', locationGet),
+                        ('SetSuplServer', 's', '', 'self.UpdateProperties("%s", {"SuplServer": args[0]})' % LOCATION_IFACE),
+                        ('InjectAssistanceData', 'ay', '', ''),
+                        ('SetGpsRefreshRate', 'u', '', locationSetGpsRefreshRate)]
+
+    modem.AddProperties(LOCATION_IFACE,
+                        location_props)
+    modem.AddMethods(LOCATION_IFACE,
+                     location_methods)
+
+def locationSetup(self, sources, signal_location):
+    props = self.props[LOCATION_IFACE]
+    if sources & ~props['Capabilities']:
+        raise dbus.exceptions.DBusException('Cannot enable unsupported location sources',
+                                            name='org.freedesktop.ModemManager1.Error.Core.Unsupported')
+
+    self.UpdateProperties(LOCATION_IFACE, {'Enabled': dbus.UInt32(sources),
+                                           'SignalsLocation': dbus.Boolean(signal_location)})
+    restartLocationTimer(self)
+    refreshLocation(self)
+
+def locationGet(self):
+    return locationValue(self)
+
+def locationSetGpsRefreshRate(self, rate):
+    self.UpdateProperties(LOCATION_IFACE, {'GpsRefreshRate': dbus.UInt32(rate)})
+    restartLocationTimer(self)
+
+def restartLocationTimer(modem):
+    if modem.location_timer:
+        modem.remove_timeout(modem.location_timer)
+        modem.location_timer = 0
+
+    props = modem.props[LOCATION_IFACE]
+    if props['Enabled'] == ModemLocationSource.MM_MODEM_LOCATION_SOURCE_NONE.value:
+        return
+    # a refresh rate of 0 publishes every fix the GPS engine produces
+    interval = props['GpsRefreshRate'] * 1000 or modem.location_fix_interval
+    modem.location_timer = modem.add_timeout(interval, advanceLocation, modem, interval)
+
+def advanceLocation(modem, interval):
+    track = modem.location_track
+    track['angle'] = (track['angle'] + track['speed'] * interval / 1000 / track['radius']) % (2 * math.pi)
+    refreshLocation(modem)
+    return True
+
+def refreshLocation(modem):
+    if modem.props[LOCATION_IFACE]['SignalsLocation']:
+        modem.UpdateProperties(LOCATION_IFACE, {'Location': locationValue(modem)})
+
+def trackPosition(modem):
+    track = modem.location_track
+    latitude = track['latitude'] + track['radius'] * math.sin(track['angle']) / METERS_PER_DEGREE
+    longitude = track['longitude'] + track['radius'] * math.cos(track['angle']) / (METERS_PER_DEGREE * math.cos(math.radians(track['latitude'])))
+    # heading is tangential to the circle, counterclockwise
+    course = (math.degrees(-track['angle'])) % 360
+    return (latitude, longitude, course)
+
+def locationValue(modem):
+    enabled = modem.props[LOCATION_IFACE]['Enabled']
+    latitude, longitude, course = trackPosition(modem)
+    utc = time.gmtime(mockobject.virtual_clock.time())
+    location = {}
+
+    if enabled & ModemLocationSource.MM_MODEM_LOCATION_SOURCE_3GPP_LAC_CI.value:
+        # cells are laid out on a grid of roughly 1km
+        cell = int((latitude + 90) * 100) * 36000 + int((longitude + 180) * 100)
+        location[dbus.UInt32(ModemLocationSource.MM_MODEM_LOCATION_SOURCE_3GPP_LAC_CI.value)] = dbus.String(
+            '310,410,%X,%X,%X' % (cell // 65536 % 65536, cell % 268435456, cell // 65536 % 65536))
+    if enabled & ModemLocationSource.MM_MODEM_LOCATION_SOURCE_GPS_RAW.value:
+        location[dbus.UInt32(ModemLocationSource.MM_MODEM_LOCATION_SOURCE_GPS_RAW.value)] = dbus.Dictionary({
+            'utc-time': time.strftime('%H%M%S', utc),
+            'latitude': dbus.Double(latitude),
+            'longitude': dbus.Double(longitude),
+            'altitude': dbus.Double(250.0)}, signature='sv')
+    if enabled & ModemLocationSource.MM_MODEM_LOCATION_SOURCE_GPS_NMEA.value:
+        location[dbus.UInt32(ModemLocationSource.MM_MODEM_LOCATION_SOURCE_GPS_NMEA.value)] = dbus.String(
+            nmeaTraces(latitude, longitude, course, modem.location_track['speed'], utc))
+
+    return dbus.Dictionary(location, signature='uv')
+
+def nmeaCoordinate(value, degree_digits, hemispheres):
+    degrees = int(abs(value))
+    minutes = (abs(value) - degrees) * 60
+    return '%0*d%07.4f,%s' % (degree_digits, degrees, minutes, hemispheres[0] if value >= 0 else hemispheres[1])
+
+def nmeaSentence(body):
+    checksum = 0
+    for c in body:
+        checksum ^= ord(c)
+    return '$%s*%02X' % (body, checksum)
+
+def nmeaTraces(latitude, longitude, course, speed, utc):
+    hms = time.strftime('%H%M%S.00', utc)
+    lat = nmeaCoordinate(latitude, 2, 'NS')
+    lon = nmeaCoordinate(longitude, 3, 'EW')
+    gga = nmeaSentence('GPGGA,%s,%s,%s,1,08,0.9,250.0,M,0.0,M,,' % (hms, lat, lon))
+    rmc = nmeaSentence('GPRMC,%s,A,%s,%s,%.1f,%.1f,%s,,,A' % (hms, lat, lon, speed * 1.943844, course, time.strftime('%d%m%y', utc)))
+    return gga + '\r\n' + rmc
+
+
+def createBearer(self, properties):
+    bearers = self.props[MODEM_IFACE]['Bearers']
+    if len(bearers) >= self.props[MODEM_IFACE]['MaxBearers']:
+        raise dbus.exceptions.DBusException('Cannot create more than %i bearers' % self.props[MODEM_IFACE]['MaxBearers'],
+                                            name='org.freedesktop.ModemManager1.Error.Core.TooMany')
+
+    index = next(bearer_index)
+    bearer_path = BEARER_BASE_OBJ + str(index)
+    totals = {'attempts': 0, 'failed-attempts': 0, 'total-duration': 0, 'total-rx-bytes': 0, 'total-tx-bytes': 0}
+    bearer_props = {'Interface': '', # s
+                    'Connected': dbus.Boolean(False), # b
+                    'ConnectionError': dbus.Struct(('', ''), signature='ss'), # (ss)
+                    'Suspended': dbus.Boolean(False), # b
+                    'Multiplexed': dbus.Boolean(False), # b
+                    'Ip4Config': dbus.Dictionary({}, signature='sv'), # a{sv}
+                    'Ip6Config': dbus.Dictionary({}, signature='sv'), # a{sv}
+                    'Stats': bearerStats(0, 0, 0, 0, totals), # a{sv}
+                    'ReloadStatsSupported': dbus.Boolean(False), # b
+                    'IpTimeout': dbus.UInt32(20), # u
+                    'BearerType': dbus.UInt32(BearerType.MM_BEARER_TYPE_DEFAULT.value), # u
+                    'ProfileId': dbus.Int32(-1), # i
+                    'Properties': dbus.Dictionary(properties, signature='sv')} # a{sv}
+    bearer_methods = [('Connect', '', '', bearerConnect),
+                      ('Disconnect', '', '', bearerDisconnect)]
+
+    self.AddObject(bearer_path,
+                   BEARER_IFACE,
+                   bearer_props,
+                   bearer_methods)
+
+    bearer = dbusmock.get_object(bearer_path)
+    bearer.index = index
+    bearer.modem = self
+    bearer.transition = 0
+    bearer.abort_transition = None
+    bearer.stats_timer = 0
+    bearer.totals = totals
+
+    self.UpdateProperties(MODEM_IFACE, {'Bearers': dbus.Array(bearers + [dbus.ObjectPath(bearer_path)], signature='o')})
+    return dbus.ObjectPath(bearer_path)
+
+def deleteBearer(self, bearer_path):
+    bearers = self.props[MODEM_IFACE]['Bearers']
+    if bearer_path not in bearers:
+        raise dbus.exceptions.DBusException('No bearer %s' % bearer_path,
+                                            name='org.freedesktop.ModemManager1.Error.Core.NotFound')
+
+    # the bearer object drops its pending transition and stats timeouts on removal
+    bearer = dbusmock.get_object(bearer_path)
+    if bearer.transition:
+        bearer.abort_transition(dbus.exceptions.DBusException('Bearer was deleted',
+                                                              name='org.freedesktop.ModemManager1.Error.Core.Aborted'))
+    self.RemoveObject(bearer_path)
+    self.UpdateProperties(MODEM_IFACE, {'Bearers': dbus.Array([b for b in bearers if b != bearer_path], signature='o')})
+    updateConnectionState(self)
+
+def activeBearers(modem):
+    return [path for path in modem.props[MODEM_IFACE]['Bearers']
+            if dbusmock.get_object(path).props[BEARER_IFACE]['Connected']]
+
+def updateConnectionState(modem):
+    state = modem.props[MODEM_IFACE]['State']
+    if state < ModemState.MM_MODEM_STATE_REGISTERED.value:
+        return
+    if activeBearers(modem):
+        setModemState(modem, ModemState.MM_MODEM_STATE_CONNECTED.value)
+    else:
+        setModemState(modem, ModemState.MM_MODEM_STATE_REGISTERED.value)
+
+@mockobject.deferred
+def bearerConnect(self, reply_handler, error_handler):
+    modem = self.modem
+    if self.transition:
+        error_handler(dbus.exceptions.DBusException('Bearer is already connecting or disconnecting',
+                                                    name='org.freedesktop.ModemManager1.Error.Core.InProgress'))
+        return
+    if self.props[BEARER_IFACE]['Connected']:
+        reply_handler()
+        return
+    if modem.props[MODEM_IFACE]['State'] < ModemState.MM_MODEM_STATE_REGISTERED.value:
+        error_handler(dbus.exceptions.DBusException('Modem is not registered',
+                                                    name='org.freedesktop.ModemManager1.Error.Core.WrongState'))
+        return
+
+    self.totals['attempts'] += 1
+    if len(activeBearers(modem)) >= modem.props[MODEM_IFACE]['MaxActiveBearers']:
+        self.totals['failed-attempts'] += 1
+        error_handler(dbus.exceptions.DBusException('Cannot connect more than %i bearers' % modem.props[MODEM_IFACE]['MaxActiveBearers'],
+                                                    name='org.freedesktop.ModemManager1.Error.Core.TooMany'))
+        return
+
+    if modem.props[MODEM_IFACE]['State'] == ModemState.MM_MODEM_STATE_REGISTERED.value:
+        setModemState(modem, ModemState.MM_MODEM_STATE_CONNECTING.value)
+    self.transition = self.add_timeout(modem.bearer_settings['connect_delay'], bearerConnected, self, reply_handler)
+    self.abort_transition = error_handler
+
+def bearerConnected(bearer, reply_handler):
+    bearer.transition = 0
+    # give every bearer its own /30 in 10.0.0.0/8
+    address = 4 * bearer.index + 1
+    ip4_config = {'method': dbus.UInt32(BearerIpMethod.MM_BEARER_IP_METHOD_STATIC.value),
+                  'address': '10.%i.%i.%i' % (address >> 16 & 0xff, address >> 8 & 0xff, address & 0xff),
+                  'prefix': dbus.UInt32(30),
+                  'gateway': '10.%i.%i.%i' % ((address + 1) >> 16 & 0xff, (address + 1) >> 8 & 0xff, (address + 1) & 0xff),
+                  'dns1': '10.0.0.53',
+                  'mtu': dbus.UInt32(1500)}
+    bearer.connected_at = mockobject.virtual_clock.monotonic()
+    bearer.UpdateProperties(BEARER_IFACE, {'Connected': dbus.Boolean(True),
+                                           'Interface': BEARER_INTERFACE,
+                                           'Ip4Config': dbus.Dictionary(ip4_config, signature='sv'),
+                                           'Stats': bearerStats(0, 0, 0, int(mockobject.virtual_clock.time()), bearer.totals)})
+    updateConnectionState(bearer.modem)
+    bearer.stats_timer = bearer.add_timeout(bearer.modem.bearer_settings['stats_interval'], refreshBearerStats, bearer)
+    reply_handler()
+    return False
+
+@mockobject.deferred
+def bearerDisconnect(self, reply_handler, error_handler):
+    if self.transition:
+        error_handler(dbus.exceptions.DBusException('Bearer is already connecting or disconnecting',
+                                                    name='org.freedesktop.ModemManager1.Error.Core.InProgress'))
+        return
+    if not self.props[BEARER_IFACE]['Connected']:
+        reply_handler()
+        return
+
+    self.remove_timeout(self.stats_timer)
+    self.stats_timer = 0
+    if self.modem.props[MODEM_IFACE]['State'] == ModemState.MM_MODEM_STATE_CONNECTED.value and len(activeBearers(self.modem)) == 1:
+        setModemState(self.modem, ModemState.MM_MODEM_STATE_DISCONNECTING.value)
+    self.transition = self.add_timeout(self.modem.bearer_settings['disconnect_delay'], bearerDisconnected, self, reply_handler)
+    self.abort_transition = error_handler
+
+def bearerDisconnected(bearer, reply_handler):
+    bearer.transition = 0
+    stats = bearer.props[BEARER_IFACE]['Stats']
+    bearer.totals['total-duration'] += int(stats['duration'])
+    bearer.totals['total-rx-bytes'] += int(stats['rx-bytes'])
+    bearer.totals['total-tx-bytes'] += int(stats['tx-bytes'])
+    bearer.UpdateProperties(BEARER_IFACE, {'Connected': dbus.Boolean(False),
+                                           'Interface': '',
+                                           'Ip4Config': dbus.Dictionary({}, signature='sv'),
+                                           'Stats': bearerStats(0, 0, 0, 0, bearer.totals)})
+    updateConnectionState(bearer.modem)
+    reply_handler()
+    return False
+
+def bearerStats(rx_bytes, tx_bytes, duration, start_date, totals):
+    stats = {'rx-bytes': dbus.UInt64(rx_bytes),
+             'tx-bytes': dbus.UInt64(tx_bytes),
+             'duration': dbus.UInt32(duration),
+             'start-date': dbus.UInt64(start_date),
+             'attempts': dbus.UInt32(totals['attempts']),
+             'failed-attempts': dbus.UInt32(totals['failed-attempts']),
+             'total-duration': dbus.UInt32(totals['total-duration'] + duration),
+             'total-rx-bytes': dbus.UInt64(totals['total-rx-bytes'] + rx_bytes),
+             'total-tx-bytes': dbus.UInt64(totals['total-tx-bytes'] + tx_bytes)}
+    return dbus.Dictionary(stats, signature='sv')
+
+def refreshBearerStats(bearer):
+    settings = bearer.modem.bearer_settings
+    stats = bearer.props[BEARER_IFACE]['Stats']
+    seconds = settings['stats_interval'] / 1000
+    rng = mockobject.get_random('bearer-stats:' + bearer.path)
+    # traffic fluctuates between half and one and a half times the nominal rate
+    rx_bytes = int(stats['rx-bytes']) + int(settings['rx_rate'] * seconds * rng.uniform(0.5, 1.5))
+    tx_bytes = int(stats['tx-bytes']) + int(settings['tx_rate'] * seconds * rng.uniform(0.5, 1.5))
+    duration = int(mockobject.virtual_clock.monotonic() - bearer.connected_at)
+    bearer.UpdateProperties(BEARER_IFACE, {'Stats': bearerStats(rx_bytes, tx_bytes, duration, stats['start-date'], bearer.totals)})
+    return True
+
+def setModemState(modem, state, reason=ModemStateChangeReason.MM_MODEM_STATE_CHANGE_REASON_USER_REQUESTED.value):
+    old_state = modem.props[MODEM_IFACE]['State']
+    if state == old_state:
+        return
+
+    modem.UpdateProperties(MODEM_IFACE, {'State': dbus.Int32(state)})
+    modem.EmitSignal(MODEM_IFACE, 'StateChanged', 'iiu', [dbus.Int32(old_state), dbus.Int32(state), dbus.UInt32(reason)])
+
+    if MODEM3GPP_IFACE in modem.props:
+        if state <= ModemState.MM_MODEM_STATE_ENABLED.value:
+            registration_state = Modem3gppRegistrationState.MM_MODEM_3GPP_REGISTRATION_STATE_IDLE.value
+        elif state == ModemState.MM_MODEM_STATE_SEARCHING.value:
+            registration_state = Modem3gppRegistrationState.MM_MODEM_3GPP_REGISTRATION_STATE_SEARCHING.value
+        else:
+            registration_state = Modem3gppRegistrationState.MM_MODEM_3GPP_REGISTRATION_STATE_HOME.value
+        if modem.props[MODEM3GPP_IFACE]['RegistrationState'] != registration_state:
+            modem.UpdateProperties(MODEM3GPP_IFACE, {'RegistrationState': dbus.UInt32(registration_state)})
+
+def runStateTransition(modem, steps, reply_handler, error_handler):
+    # steps is a list of (delay in ms, state); reply_handler is called once the last state is reached
+    if modem.abort_state_transition:
+        error_handler(dbus.exceptions.DBusException('Modem state transition already in progress',
+                                                    name='org.freedesktop.ModemManager1.Error.Core.InProgress'))
+        return
+    modem.abort_state_transition = error_handler
+    nextStateTransitionStep(modem, list(steps), reply_handler)
+
+def nextStateTransitionStep(modem, steps, reply_handler):
+    modem.state_timer = 0
+    while steps:
+        delay, state = steps.pop(0)
+        if delay:
+            modem.state_timer = modem.add_timeout(delay, stateTransitionStep, modem, state, steps, reply_handler)
+            return
+        setModemState(modem, state)
+    modem.abort_state_transition = None
+    reply_handler()
+
+def stateTransitionStep(modem, state, steps, reply_handler):
+    setModemState(modem, state)
+    nextStateTransitionStep(modem, steps, reply_handler)
+    return False
+
+def cancelStateTransition(modem):
+    if modem.abort_state_transition:
+        modem.remove_timeout(modem.state_timer)
+        modem.state_timer = 0
+        abort, modem.abort_state_transition = modem.abort_state_transition, None
+        abort(dbus.exceptions.DBusException('Modem state transition was cancelled',
+                                            name='org.freedesktop.ModemManager1.Error.Core.Cancelled'))
+
+def enableSteps(modem):
+    return [(0, ModemState.MM_MODEM_STATE_ENABLING.value),
+            (modem.state_delays['enable'], ModemState.MM_MODEM_STATE_ENABLED.value)]
+
+def registrationSteps(modem):
+    return [(modem.state_delays['search'], ModemState.MM_MODEM_STATE_SEARCHING.value),
+            (modem.state_delays['register'], ModemState.MM_MODEM_STATE_REGISTERED.value)]
+
+def ignoreReply(*_):
+    pass
+
+@mockobject.deferred
+def modemEnable(self, reply_handler, error_handler, enable):
+    state = self.props[MODEM_IFACE]['State']
+    if enable:
+        if state >= ModemState.MM_MODEM_STATE_ENABLED.value:
+            reply_handler()
+            return
+        if state != ModemState.MM_MODEM_STATE_DISABLED.value:
+            error_handler(dbus.exceptions.DBusException('Cannot enable modem in state %i' % state,
+                                                        name='org.freedesktop.ModemManager1.Error.Core.WrongState'))
+            return
+
+        def enabled():
+            # like ModemManager, answer once enabled and register in the background
+            reply_handler()
+            runStateTransition(self, registrationSteps(self), ignoreReply, ignoreReply)
+
+        self.UpdateProperties(MODEM_IFACE, {'PowerState': dbus.UInt32(ModemPowerState.MM_MODEM_POWER_STATE_ON.value)})
+        runStateTransition(self, enableSteps(self), enabled, error_handler)
+        return
+
+    if state == ModemState.MM_MODEM_STATE_DISABLED.value:
+        reply_handler()
+        return
+    if state < ModemState.MM_MODEM_STATE_DISABLED.value:
+        error_handler(dbus.exceptions.DBusException('Cannot disable modem in state %i' % state,
+                                                    name='org.freedesktop.ModemManager1.Error.Core.WrongState'))
+        return
+
+    def disabled():
+        self.UpdateProperties(MODEM_IFACE, {'PowerState': dbus.UInt32(ModemPowerState.MM_MODEM_POWER_STATE_LOW.value)})
+        reply_handler()
+
+    cancelStateTransition(self)
+    runStateTransition(self, [(0, ModemState.MM_MODEM_STATE_DISABLING.value),
+                              (self.state_delays['disable'], ModemState.MM_MODEM_STATE_DISABLED.value)],
+                       disabled, error_handler)
+    for bearer_path in self.props[MODEM_IFACE]['Bearers']:
+        dropBearer(dbusmock.get_object(bearer_path))
+
+def dropBearer(bearer):
+    # tear down a bearer without the usual disconnection delay, e. g. when the modem gets disabled
+    if bearer.transition:
+        bearer.remove_timeout(bearer.transition)
+        bearer.transition = 0
+        bearer.abort_transition(dbus.exceptions.DBusException('Bearer connection was cancelled',
+                                                              name='org.freedesktop.ModemManager1.Error.Core.Cancelled'))
+    if bearer.props[BEARER_IFACE]['Connected']:
+        bearer.remove_timeout(bearer.stats_timer)
+        bearer.stats_timer = 0
+        bearerDisconnected(bearer, ignoreReply)
+
+@mockobject.deferred
+def modem3gppRegister(self, reply_handler, error_handler, operator_id):
+    state = self.props[MODEM_IFACE]['State']
+    if state < ModemState.MM_MODEM_STATE_ENABLED.value:
+        error_handler(dbus.exceptions.DBusException('Modem is not enabled',
+                                                    name='org.freedesktop.ModemManager1.Error.Core.WrongState'))
+        return
+
+    def registered():
+        if operator_id:
+            self.UpdateProperties(MODEM3GPP_IFACE, {'OperatorCode': operator_id})
+        reply_handler()
+
+    # a connected modem stays on its network
+    if state > ModemState.MM_MODEM_STATE_REGISTERED.value:
+        registered()
+        return
+    runStateTransition(self, registrationSteps(self), registered, error_handler)
+
+@mockobject.deferred
+def simpleConnect(self, reply_handler, error_handler, properties):
+    # the remaining keys of the Simple.Connect() properties are bearer properties
+    bearer_properties = {key: value for key, value in properties.items() if key not in ('pin', 'operator-id')}
+
+    def connect():
+        for bearer_path in self.props[MODEM_IFACE]['Bearers']:
+            if dbusmock.get_object(bearer_path).props[BEARER_IFACE]['Properties'] == bearer_properties:
+                break
+        else:
+            try:
+                bearer_path = createBearer(self, bearer_properties)
+            except dbus.exceptions.DBusException as e:
+                error_handler(e)
+                return
+        bearerConnect(dbusmock.get_object(bearer_path), lambda: reply_handler(dbus.ObjectPath(bearer_path)), error_handler)
+
+    state = self.props[MODEM_IFACE]['State']
+    if state == ModemState.MM_MODEM_STATE_DISABLED.value:
+        self.UpdateProperties(MODEM_IFACE, {'PowerState': dbus.UInt32(ModemPowerState.MM_MODEM_POWER_STATE_ON.value)})
+        runStateTransition(self, enableSteps(self) + registrationSteps(self), connect, error_handler)
+    elif state == ModemState.MM_MODEM_STATE_ENABLED.value:
+        runStateTransition(self, registrationSteps(self), connect, error_handler)
+    elif state >= ModemState.MM_MODEM_STATE_REGISTERED.value:
+        connect()
+    else:
+        error_handler(dbus.exceptions.DBusException('Cannot connect modem in state %i' % state,
+                                                    name='org.freedesktop.ModemManager1.Error.Core.WrongState'))
+
+@mockobject.deferred
+def simpleDisconnect(self, reply_handler, error_handler, bearer_path):
+    if bearer_path == '/':
+        bearer_paths = activeBearers(self)
+    elif bearer_path in self.props[MODEM_IFACE]['Bearers']:
+        bearer_paths = [bearer_path]
+    else:
+        error_handler(dbus.exceptions.DBusException('No bearer %s' % bearer_path,
+                                                    name='org.freedesktop.ModemManager1.Error.Core.NotFound'))
+        return
+
+    # answer once all bearers are done, with the first error if any failed
+    pending = [len(bearer_paths)]
+    errors = []
+
+    def finished(error=None):
+        if error is not None:
+            errors.append(error)
+        pending[0] -= 1
+        if pending[0] == 0:
+            if errors:
+                error_handler(errors[0])
+            else:
+                reply_handler()
+
+    if not bearer_paths:
+        reply_handler()
+    for path in bearer_paths:
+        bearerDisconnect(dbusmock.get_object(path), finished, finished)
+
+def simpleGetStatus(self):
+    modem_props = self.props[MODEM_IFACE]
+    status = {'state': dbus.UInt32(modem_props['State']),
+              'signal-quality': modem_props['SignalQuality'],
+              'current-bands': modem_props['CurrentBands'],
+              'access-technologies': dbus.UInt32(modem_props['AccessTechnologies'])}
+    if MODEM3GPP_IFACE in self.props:
+        status['m3gpp-registration-state'] = dbus.UInt32(self.props[MODEM3GPP_IFACE]['RegistrationState'])
+        status['m3gpp-operator-code'] = self.props[MODEM3GPP_IFACE]['OperatorCode']
+        status['m3gpp-operator-name'] = self.props[MODEM3GPP_IFACE]['OperatorName']
+    return dbus.Dictionary(status, signature='sv')
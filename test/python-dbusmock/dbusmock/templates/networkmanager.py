@@ -0,0 +1,651 @@
+'''NetworkManager mock template
+
+This creates the main org.freedesktop.NetworkManager object, the connection
+settings, and a configurable number of Wi-Fi and ethernet devices with
+access points and saved connection profiles, for exercising clients at scale.
+
+Parameters:
+  WifiDevices: number of Wi-Fi devices (default 1)
+  EthernetDevices: number of ethernet devices (default 1)
+  AccessPoints: number of access points per Wi-Fi device (default 5)
+  Ssids: number of distinct SSIDs the access points use (default 20)
+  Connections: number of saved connection profiles (default 4)
+  ApChurnInterval: every that many ms, ApChurnBurst access points of each
+                   Wi-Fi device disappear and as many new ones appear; 0
+                   (default) disables churn
+  ApChurnBurst: see ApChurnInterval (default 1)
+  StrengthInterval: update the Strength of all access points every that many
+                    ms; 0 (default) disables updates
+  ActivationDelay: time in ms for ActivateConnection to activate a
+                   connection (default 500)
+  Seed: master seed for generating access points and profiles, churn and
+        strength changes; see dbusmock.mockobject.get_random() (default: the
+        DBUSMOCK_SEED environment variable, or 0)
+'''
+
+# This program is free software you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation either version 3 of the License, or (at your option) any
+# later version.  See http://www.gnu.org/copyleft/lgpl.html for the full text
+# of the license.
+
+from enum import Enum
+
+import itertools
+import uuid
+
+import dbus
+import dbusmock
+from dbusmock import mockobject
+
+
+SYSTEM_BUS = True
+IS_OBJECT_MANAGER = False
+BUS_NAME = 'org.freedesktop.NetworkManager'
+MAIN_OBJ = '/org/freedesktop/NetworkManager'
+MAIN_IFACE = 'org.freedesktop.NetworkManager'
+SETTINGS_OBJ = '/org/freedesktop/NetworkManager/Settings'
+SETTINGS_IFACE = 'org.freedesktop.NetworkManager.Settings'
+CSETTINGS_IFACE = 'org.freedesktop.NetworkManager.Settings.Connection'
+DEVICE_IFACE = 'org.freedesktop.NetworkManager.Device'
+WIRELESS_DEVICE_IFACE = 'org.freedesktop.NetworkManager.Device.Wireless'
+WIRED_DEVICE_IFACE = 'org.freedesktop.NetworkManager.Device.Wired'
+ACCESS_POINT_IFACE = 'org.freedesktop.NetworkManager.AccessPoint'
+ACTIVE_CONNECTION_IFACE = 'org.freedesktop.NetworkManager.Connection.Active'
+DEVICE_BASE_OBJ = '/org/freedesktop/NetworkManager/Devices/'
+AP_BASE_OBJ = '/org/freedesktop/NetworkManager/AccessPoint/'
+CSETTINGS_BASE_OBJ = '/org/freedesktop/NetworkManager/Settings/'
+ACTIVE_CONNECTION_BASE_OBJ = '/org/freedesktop/NetworkManager/ActiveConnection/'
+
+WIRELESS_TYPE = '802-11-wireless'
+WIRED_TYPE = '802-3-ethernet'
+
+
+# https://networkmanager.dev/docs/api/latest/nm-dbus-types.html#NMState
+class NMState(Enum):
+    NM_STATE_UNKNOWN = 0
+    NM_STATE_ASLEEP = 10
+    NM_STATE_DISCONNECTED = 20
+    NM_STATE_DISCONNECTING = 30
+    NM_STATE_CONNECTING = 40
+    NM_STATE_CONNECTED_LOCAL = 50
+    NM_STATE_CONNECTED_SITE = 60
+    NM_STATE_CONNECTED_GLOBAL = 70
+
+
+# https://networkmanager.dev/docs/api/latest/nm-dbus-types.html#NMConnectivityState
+class NMConnectivityState(Enum):
+    NM_CONNECTIVITY_UNKNOWN = 0
+    NM_CONNECTIVITY_NONE = 1
+    NM_CONNECTIVITY_PORTAL = 2
+    NM_CONNECTIVITY_LIMITED = 3
+    NM_CONNECTIVITY_FULL = 4
+
+
+# https://networkmanager.dev/docs/api/latest/nm-dbus-types.html#NMDeviceType
+class NMDeviceType(Enum):
+    NM_DEVICE_TYPE_UNKNOWN = 0
+    NM_DEVICE_TYPE_ETHERNET = 1
+    NM_DEVICE_TYPE_WIFI = 2
+
+
+# https://networkmanager.dev/docs/api/latest/nm-dbus-types.html#NMDeviceState
+class NMDeviceState(Enum):
+    NM_DEVICE_STATE_UNKNOWN = 0
+    NM_DEVICE_STATE_UNMANAGED = 10
+    NM_DEVICE_STATE_UNAVAILABLE = 20
+    NM_DEVICE_STATE_DISCONNECTED = 30
+    NM_DEVICE_STATE_PREPARE = 40
+    NM_DEVICE_STATE_CONFIG = 50
+    NM_DEVICE_STATE_NEED_AUTH = 60
+    NM_DEVICE_STATE_IP_CONFIG = 70
+    NM_DEVICE_STATE_IP_CHECK = 80
+    NM_DEVICE_STATE_SECONDARIES = 90
+    NM_DEVICE_STATE_ACTIVATED = 100
+    NM_DEVICE_STATE_DEACTIVATING = 110
+    NM_DEVICE_STATE_FAILED = 120
+
+
+# https://networkmanager.dev/docs/api/latest/nm-dbus-types.html#NMDeviceStateReason
+class NMDeviceStateReason(Enum):
+    NM_DEVICE_STATE_REASON_NONE = 0
+    NM_DEVICE_STATE_REASON_UNKNOWN = 1
+    NM_DEVICE_STATE_REASON_USER_REQUESTED = 39
+
+
+# https://networkmanager.dev/docs/api/latest/nm-dbus-types.html#NMActiveConnectionState
+class NMActiveConnectionState(Enum):
+    NM_ACTIVE_CONNECTION_STATE_UNKNOWN = 0
+    NM_ACTIVE_CONNECTION_STATE_ACTIVATING = 1
+    NM_ACTIVE_CONNECTION_STATE_ACTIVATED = 2
+    NM_ACTIVE_CONNECTION_STATE_DEACTIVATING = 3
+    NM_ACTIVE_CONNECTION_STATE_DEACTIVATED = 4
+
+
+# https://networkmanager.dev/docs/api/latest/nm-dbus-types.html#NM80211ApFlags
+class NM80211ApFlags(Enum):
+    NM_802_11_AP_FLAGS_NONE = 0x00000000
+    NM_802_11_AP_FLAGS_PRIVACY = 0x00000001
+
+
+# https://networkmanager.dev/docs/api/latest/nm-dbus-types.html#NM80211ApSecurityFlags
+class NM80211ApSecurityFlags(Enum):
+    NM_802_11_AP_SEC_NONE = 0x00000000
+    NM_802_11_AP_SEC_PAIR_CCMP = 0x00000008
+    NM_802_11_AP_SEC_GROUP_CCMP = 0x00000080
+    NM_802_11_AP_SEC_KEY_MGMT_PSK = 0x00000100
+    NM_802_11_AP_SEC_KEY_MGMT_802_1X = 0x00000200
+    NM_802_11_AP_SEC_KEY_MGMT_SAE = 0x00000400
+
+
+# https://networkmanager.dev/docs/api/latest/nm-dbus-types.html#NM80211Mode
+class NM80211Mode(Enum):
+    NM_802_11_MODE_UNKNOWN = 0
+    NM_802_11_MODE_ADHOC = 1
+    NM_802_11_MODE_INFRA = 2
+    NM_802_11_MODE_AP = 3
+
+
+# (Flags, WpaFlags, RsnFlags) of the simulated network types
+AP_SECURITY = [(NM80211ApFlags.NM_802_11_AP_FLAGS_NONE.value, 0, 0),
+               (NM80211ApFlags.NM_802_11_AP_FLAGS_PRIVACY.value, 0,
+                NM80211ApSecurityFlags.NM_802_11_AP_SEC_PAIR_CCMP.value + NM80211ApSecurityFlags.NM_802_11_AP_SEC_GROUP_CCMP.value + NM80211ApSecurityFlags.NM_802_11_AP_SEC_KEY_MGMT_PSK.value),
+               (NM80211ApFlags.NM_802_11_AP_FLAGS_PRIVACY.value, 0,
+                NM80211ApSecurityFlags.NM_802_11_AP_SEC_PAIR_CCMP.value + NM80211ApSecurityFlags.NM_802_11_AP_SEC_GROUP_CCMP.value + NM80211ApSecurityFlags.NM_802_11_AP_SEC_KEY_MGMT_802_1X.value),
+               (NM80211ApFlags.NM_802_11_AP_FLAGS_PRIVACY.value, 0,
+                NM80211ApSecurityFlags.NM_802_11_AP_SEC_PAIR_CCMP.value + NM80211ApSecurityFlags.NM_802_11_AP_SEC_GROUP_CCMP.value + NM80211ApSecurityFlags.NM_802_11_AP_SEC_KEY_MGMT_SAE.value)]
+
+FREQUENCIES = [2412, 2437, 2462, 5180, 5200, 5220, 5240, 5745, 5765, 5785, 5805]
+
+ap_index = itertools.count(1)
+active_connection_index = itertools.count(1)
+connection_index = itertools.count(1)
+
+
+def load(mock, parameters):
+    global ap_index, active_connection_index, connection_index  # pylint: disable=global-statement
+    ap_index = itertools.count(1)
+    active_connection_index = itertools.count(1)
+    connection_index = itertools.count(1)
+
+    if 'Seed' in parameters:
+        mockobject.seed_random(parameters['Seed'])
+    rng = mockobject.get_random('networkmanager', restart=True)
+    mock.rng = rng
+    mock.ssids = ['mock-ap-%i' % i for i in range(int(parameters.get('Ssids', 20)))]
+    mock.activation_delay = int(parameters.get('ActivationDelay', 500))
+
+    # Main object
+    manager_props = {'Devices': dbus.Array([], signature='o'), # ao
+                     'AllDevices': dbus.Array([], signature='o'), # ao
+                     'Checkpoints': dbus.Array([], signature='o'), # ao
+                     'NetworkingEnabled': dbus.Boolean(True), # b
+                     'WirelessEnabled': dbus.Boolean(True), # b
+                     'WirelessHardwareEnabled': dbus.Boolean(True), # b
+                     'WwanEnabled': dbus.Boolean(True), # b
+                     'WwanHardwareEnabled': dbus.Boolean(True), # b
+                     'WimaxEnabled': dbus.Boolean(False), # b
+                     'WimaxHardwareEnabled': dbus.Boolean(False), # b
+                     'ActiveConnections': dbus.Array([], signature='o'), # ao
+                     'PrimaryConnection': dbus.ObjectPath('/'), # o
+                     'PrimaryConnectionType': '', # s
+                     'Metered': dbus.UInt32(0), # u
+                     'ActivatingConnection': dbus.ObjectPath('/'), # o
+                     'Startup': dbus.Boolean(False), # b
+                     'Version': parameters.get('Version', '1.30.0'), # s
+                     'Capabilities': dbus.Array([], signature='u'), # au
+                     'State': dbus.UInt32(NMState.NM_STATE_DISCONNECTED.value), # u
+                     'Connectivity': dbus.UInt32(NMConnectivityState.NM_CONNECTIVITY_NONE.value), # u
+                     'ConnectivityCheckAvailable': dbus.Boolean(True), # b
+                     'ConnectivityCheckEnabled': dbus.Boolean(True), # b
+                     'ConnectivityCheckUri': 'http://check.example.com/', # s
+                     'GlobalDnsConfiguration': dbus.Dictionary({}, signature='sv')} # a{sv}
+    manager_methods = [('GetDevices', '', 'ao', 'ret = self.props["%s"]["Devices"]' % MAIN_IFACE),
+                       ('GetAllDevices', '', 'ao', 'ret = self.props["%s"]["AllDevices"]' % MAIN_IFACE),
+                       ('GetDeviceByIpIface', 's', 'o', getDeviceByIpIface),
+                       ('ActivateConnection', 'ooo', 'o', activateConnection),
+                       ('DeactivateConnection', 'o', '', deactivateConnection),
+                       ('CheckConnectivity', '', 'u', 'ret = self.props["%s"]["Connectivity"]' % MAIN_IFACE),
+                       ('state', '', 'u', 'ret = self.props["%s"]["State"]' % MAIN_IFACE),
+                       ('GetPermissions', '', 'a{ss}', 'ret = {}')]
+    mock.AddProperties(MAIN_IFACE, manager_props)
+    mock.AddMethods(MAIN_IFACE, manager_methods)
+
+    # Connection settings
+    settings_props = {'Connections': dbus.Array([], signature='o'), # ao
+                      'Hostname': 'chadburn-mock', # s
+                      'CanModify': dbus.Boolean(True)} # b
+    settings_methods = [('ListConnections', '', 'ao', 'ret = self.props["%s"]["Connections"]' % SETTINGS_IFACE),
+                        ('GetConnectionByUuid', 's', 'o', getConnectionByUuid),
+                        ('AddConnection', 'a{sa{sv}}', 'o', addConnection),
+                        ('AddConnectionUnsaved', 'a{sa{sv}}', 'o', addConnection),
+                        ('SaveHostname', 's', '', 'self.UpdateProperties("%s", {"Hostname": args[0]})' % SETTINGS_IFACE)]
+    mock.AddObject(SETTINGS_OBJ,
+                   SETTINGS_IFACE,
+                   settings_props,
+                   settings_methods)
+
+    wifi_count = int(parameters.get('WifiDevices', 1))
+    for index in range(wifi_count):
+        addWifiDevice(mock, index, parameters)
+    for index in range(int(parameters.get('EthernetDevices', 1))):
+        addEthernetDevice(mock, wifi_count + index, index)
+
+    # alternate between wired and wireless profiles, starting with a wired one
+    settings = dbusmock.get_object(SETTINGS_OBJ)
+    # the main object only gets registered once the template is loaded
+    settings.manager = mock
+    # for the UUIDs of added profiles which do not have one
+    settings.uuid_rng = mockobject.get_random('connection-uuid', restart=True)
+    for index in range(int(parameters.get('Connections', 4))):
+        if index % 2 == 0:
+            addConnection(settings, connectionSettings(rng, 'Wired connection %i' % (index // 2 + 1), WIRED_TYPE))
+        else:
+            addConnection(settings, connectionSettings(rng, mock.ssids[(index // 2) % len(mock.ssids)], WIRELESS_TYPE))
+
+
+def connectionSettings(rng, name, connection_type):
+    settings = {'connection': {'id': name,
+                               'uuid': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                               'type': connection_type,
+                               'autoconnect': dbus.Boolean(True)},
+                'ipv4': {'method': 'auto'},
+                'ipv6': {'method': 'auto'}}
+    if connection_type == WIRELESS_TYPE:
+        settings[WIRELESS_TYPE] = {'ssid': dbus.ByteArray(name.encode('UTF-8')),
+                                   'mode': 'infrastructure'}
+        settings['802-11-wireless-security'] = {'key-mgmt': 'wpa-psk'}
+    else:
+        settings[WIRED_TYPE] = {'auto-negotiate': dbus.Boolean(True)}
+    return settings
+
+
+def deviceProps(interface, device_type, hw_address):
+    return {'Udi': '/sys/devices/virtual/net/' + interface, # s
+            'Path': '', # s
+            'Interface': interface, # s
+            'IpInterface': interface, # s
+            'Driver': 'mock', # s
+            'DriverVersion': '1.0', # s
+            'FirmwareVersion': '', # s
+            'Capabilities': dbus.UInt32(1), # u
+            'Ip4Address': dbus.UInt32(0), # u
+            'State': dbus.UInt32(NMDeviceState.NM_DEVICE_STATE_DISCONNECTED.value), # u
+            'StateReason': dbus.Struct((dbus.UInt32(NMDeviceState.NM_DEVICE_STATE_DISCONNECTED.value), dbus.UInt32(NMDeviceStateReason.NM_DEVICE_STATE_REASON_NONE.value)), signature='uu'), # (uu)
+            'ActiveConnection': dbus.ObjectPath('/'), # o
+            'Ip4Config': dbus.ObjectPath('/'), # o
+            'Dhcp4Config': dbus.ObjectPath('/'), # o
+            'Ip6Config': dbus.ObjectPath('/'), # o
+            'Dhcp6Config': dbus.ObjectPath('/'), # o
+            'Managed': dbus.Boolean(True), # b
+            'Autoconnect': dbus.Boolean(True), # b
+            'FirmwareMissing': dbus.Boolean(False), # b
+            'NmPluginMissing': dbus.Boolean(False), # b
+            'DeviceType': dbus.UInt32(device_type), # u
+            'AvailableConnections': dbus.Array([], signature='o'), # ao
+            'PhysicalPortId': '', # s
+            'Mtu': dbus.UInt32(1500), # u
+            'Metered': dbus.UInt32(0), # u
+            'LldpNeighbors': dbus.Array([], signature='a{sv}'), # aa{sv}
+            'Real': dbus.Boolean(True), # b
+            'Ip4Connectivity': dbus.UInt32(NMConnectivityState.NM_CONNECTIVITY_NONE.value), # u
+            'Ip6Connectivity': dbus.UInt32(NMConnectivityState.NM_CONNECTIVITY_NONE.value), # u
+            'InterfaceFlags': dbus.UInt32(0x1), # u
+            'HwAddress': hw_address} # s
+
+
+def hwAddress(prefix, index):
+    return '%s:%02X:%02X' % (prefix, index >> 8 & 0xff, index & 0xff)
+
+
+def addDevice(mock, index, interface, props, methods):
+    device_path = DEVICE_BASE_OBJ + str(index + 1)
+    mock.AddObject(device_path,
+                   interface,
+                   props,
+                   methods)
+
+    devices = mock.props[MAIN_IFACE]['Devices']
+    mock.UpdateProperties(MAIN_IFACE, {'Devices': dbus.Array(devices + [dbus.ObjectPath(device_path)], signature='o'),
+                                       'AllDevices': dbus.Array(devices + [dbus.ObjectPath(device_path)], signature='o')})
+    mock.EmitSignal(MAIN_IFACE, 'DeviceAdded', 'o', [dbus.ObjectPath(device_path)])
+    return dbusmock.get_object(device_path)
+
+
+def addWifiDevice(mock, index, parameters):
+    interface = 'wlan%i' % index
+    hw_address = hwAddress('02:00:00:00', index)
+    props = {'HwAddress': hw_address, # s
+             'PermHwAddress': hw_address, # s
+             'Mode': dbus.UInt32(NM80211Mode.NM_802_11_MODE_INFRA.value), # u
+             'Bitrate': dbus.UInt32(0), # u
+             'AccessPoints': dbus.Array([], signature='o'), # ao
+             'ActiveAccessPoint': dbus.ObjectPath('/'), # o
+             'WirelessCapabilities': dbus.UInt32(0x7ff), # u
+             'LastScan': dbus.Int64(-1)} # x
+    methods = [('GetAccessPoints', '', 'ao', 'ret = self.props["%s"]["AccessPoints"]' % WIRELESS_DEVICE_IFACE),
+               ('GetAllAccessPoints', '', 'ao', 'ret = self.props["%s"]["AccessPoints"]' % WIRELESS_DEVICE_IFACE),
+               ('RequestScan', 'a{sv}', '', 'self.UpdateProperties("%s", {"LastScan": dbus.Int64(int(virtual_clock.monotonic() * 1000))})' % WIRELESS_DEVICE_IFACE)]
+    device = addDevice(mock, index, WIRELESS_DEVICE_IFACE, props, methods)
+    device.AddProperties(DEVICE_IFACE, deviceProps(interface, NMDeviceType.NM_DEVICE_TYPE_WIFI.value, hw_address))
+    device.AddMethods(DEVICE_IFACE, [('Disconnect', '', '', deviceDisconnect)])
+    device.manager = mock
+
+    for _ in range(int(parameters.get('AccessPoints', 5))):
+        addAccessPoint(device)
+
+    churn_interval = int(parameters.get('ApChurnInterval', 0))
+    if churn_interval:
+        device.add_timeout(churn_interval, churnAccessPoints, device, int(parameters.get('ApChurnBurst', 1)))
+    strength_interval = int(parameters.get('StrengthInterval', 0))
+    if strength_interval:
+        device.add_timeout(strength_interval, refreshStrength, device)
+
+
+def addEthernetDevice(mock, index, ethernet_index):
+    interface = 'eth%i' % ethernet_index
+    hw_address = hwAddress('02:00:00:01', ethernet_index)
+    props = {'HwAddress': hw_address, # s
+             'PermHwAddress': hw_address, # s
+             'Speed': dbus.UInt32(1000), # u
+             'S390Subchannels': dbus.Array([], signature='s'), # as
+             'Carrier': dbus.Boolean(True)} # b
+    device = addDevice(mock, index, WIRED_DEVICE_IFACE, props, [])
+    device.AddProperties(DEVICE_IFACE, deviceProps(interface, NMDeviceType.NM_DEVICE_TYPE_ETHERNET.value, hw_address))
+    device.AddMethods(DEVICE_IFACE, [('Disconnect', '', '', deviceDisconnect)])
+    device.manager = mock
+
+
+def addAccessPoint(device):
+    rng = device.manager.rng
+    ap_path = AP_BASE_OBJ + str(next(ap_index))
+    flags, wpa_flags, rsn_flags = rng.choice(AP_SECURITY)
+    frequency = rng.choice(FREQUENCIES)
+    ap_props = {'Flags': dbus.UInt32(flags), # u
+                'WpaFlags': dbus.UInt32(wpa_flags), # u
+                'RsnFlags': dbus.UInt32(rsn_flags), # u
+                'Ssid': dbus.ByteArray(rng.choice(device.manager.ssids).encode('UTF-8')), # ay
+                'Frequency': dbus.UInt32(frequency), # u
+                'HwAddress': '%02X:%02X:%02X:%02X:%02X:%02X' % tuple([0x02] + [rng.randrange(256) for _ in range(5)]), # s
+                'Mode': dbus.UInt32(NM80211Mode.NM_802_11_MODE_INFRA.value), # u
+                'MaxBitrate': dbus.UInt32(866700 if frequency > 5000 else 144400), # u
+                'Strength': dbus.Byte(rng.randint(20, 100)), # y
+                'LastSeen': dbus.Int32(int(mockobject.virtual_clock.monotonic()))} # i
+
+    device.AddObject(ap_path,
+                     ACCESS_POINT_IFACE,
+                     ap_props,
+                     [])
+
+    access_points = device.props[WIRELESS_DEVICE_IFACE]['AccessPoints']
+    device.UpdateProperties(WIRELESS_DEVICE_IFACE, {'AccessPoints': dbus.Array(access_points + [dbus.ObjectPath(ap_path)], signature='o')})
+    device.EmitSignal(WIRELESS_DEVICE_IFACE, 'AccessPointAdded', 'o', [dbus.ObjectPath(ap_path)])
+
+
+def removeAccessPoint(device, ap_path):
+    access_points = device.props[WIRELESS_DEVICE_IFACE]['AccessPoints']
+    device.UpdateProperties(WIRELESS_DEVICE_IFACE, {'AccessPoints': dbus.Array([ap for ap in access_points if ap != ap_path], signature='o')})
+    device.EmitSignal(WIRELESS_DEVICE_IFACE, 'AccessPointRemoved', 'o', [dbus.ObjectPath(ap_path)])
+    device.RemoveObject(ap_path)
+
+
+def churnAccessPoints(device, burst):
+    # the access point of an active connection stays in range
+    active = device.props[WIRELESS_DEVICE_IFACE]['ActiveAccessPoint']
+    candidates = [ap for ap in device.props[WIRELESS_DEVICE_IFACE]['AccessPoints'] if ap != active]
+    for ap_path in mockobject.get_random('ap-churn:' + device.path).sample(candidates, min(burst, len(candidates))):
+        removeAccessPoint(device, ap_path)
+        addAccessPoint(device)
+    return True
+
+
+def refreshStrength(device):
+    last_seen = dbus.Int32(int(mockobject.virtual_clock.monotonic()))
+    rng = mockobject.get_random('ap-strength:' + device.path)
+    for ap_path in device.props[WIRELESS_DEVICE_IFACE]['AccessPoints']:
+        ap = dbusmock.get_object(ap_path)
+        strength = min(100, max(0, ap.props[ACCESS_POINT_IFACE]['Strength'] + rng.randint(-5, 5)))
+        ap.UpdateProperties(ACCESS_POINT_IFACE, {'Strength': dbus.Byte(strength),
+                                                 'LastSeen': last_seen})
+    return True
+
+
+def getDeviceByIpIface(self, interface):
+    for device_path in self.props[MAIN_IFACE]['AllDevices']:
+        if dbusmock.get_object(device_path).props[DEVICE_IFACE]['IpInterface'] == interface:
+            return device_path
+    raise dbus.exceptions.DBusException('No device found for the requested iface',
+                                        name='org.freedesktop.NetworkManager.UnknownDevice')
+
+
+def getConnectionByUuid(self, connection_uuid):
+    for connection_path in self.props[SETTINGS_IFACE]['Connections']:
+        if dbusmock.get_object(connection_path).settings['connection']['uuid'] == connection_uuid:
+            return connection_path
+    raise dbus.exceptions.DBusException('No connection with the UUID was found',
+                                        name='org.freedesktop.NetworkManager.Settings.InvalidConnection')
+
+
+def connectionType(settings):
+    return settings.get('connection', {}).get('type', '')
+
+
+def deviceConnectionType(device):
+    if device.props[DEVICE_IFACE]['DeviceType'] == NMDeviceType.NM_DEVICE_TYPE_WIFI.value:
+        return WIRELESS_TYPE
+    return WIRED_TYPE
+
+
+def updateAvailableConnections(manager, connection_path, settings, add):
+    for device_path in manager.props[MAIN_IFACE]['AllDevices']:
+        device = dbusmock.get_object(device_path)
+        if deviceConnectionType(device) != connectionType(settings):
+            continue
+        available = [path for path in device.props[DEVICE_IFACE]['AvailableConnections'] if path != connection_path]
+        if add:
+            available.append(dbus.ObjectPath(connection_path))
+        device.UpdateProperties(DEVICE_IFACE, {'AvailableConnections': dbus.Array(available, signature='o')})
+
+
+def addConnection(self, settings):
+    if 'connection' not in settings or not settings['connection'].get('type'):
+        raise dbus.exceptions.DBusException('connection.type: property is missing',
+                                            name='org.freedesktop.NetworkManager.Settings.Connection.MissingProperty')
+
+    settings = dbus.Dictionary({group: dbus.Dictionary(values, signature='sv') for group, values in settings.items()},
+                               signature='sa{sv}')
+    settings['connection'].setdefault('uuid', str(uuid.UUID(int=self.uuid_rng.getrandbits(128), version=4)))
+    settings['connection'].setdefault('id', settings['connection']['uuid'])
+
+    connection_path = CSETTINGS_BASE_OBJ + str(next(connection_index))
+    connection_props = {'Unsaved': dbus.Boolean(False), # b
+                        'Flags': dbus.UInt32(0), # u
+                        'Filename': '/etc/NetworkManager/system-connections/%s.nmconnection' % settings['connection']['id']} # s
+    connection_methods = [('GetSettings', '', 'a{sa{sv}}', 'ret = self.settings'),
+                          ('GetSecrets', 's', 'a{sa{sv}}', 'ret = dbus.Dictionary({}, signature="sa{sv}")'),
+                          ('Update', 'a{sa{sv}}', '', connectionUpdate),
+                          ('Delete', '', '', connectionDelete)]
+    self.AddObject(connection_path,
+                   CSETTINGS_IFACE,
+                   connection_props,
+                   connection_methods)
+    dbusmock.get_object(connection_path).settings = settings
+
+    connections = self.props[SETTINGS_IFACE]['Connections']
+    self.UpdateProperties(SETTINGS_IFACE, {'Connections': dbus.Array(connections + [dbus.ObjectPath(connection_path)], signature='o')})
+    updateAvailableConnections(self.manager, connection_path, settings, True)
+    self.EmitSignal(SETTINGS_IFACE, 'NewConnection', 'o', [dbus.ObjectPath(connection_path)])
+    return dbus.ObjectPath(connection_path)
+
+
+def connectionUpdate(self, settings):
+    self.settings = dbus.Dictionary({group: dbus.Dictionary(values, signature='sv') for group, values in settings.items()},
+                                    signature='sa{sv}')
+    self.EmitSignal(CSETTINGS_IFACE, 'Updated', '', [])
+
+
+def connectionDelete(self):
+    settings = dbusmock.get_object(SETTINGS_OBJ)
+    manager = settings.manager
+    for active_path in manager.props[MAIN_IFACE]['ActiveConnections']:
+        if dbusmock.get_object(active_path).props[ACTIVE_CONNECTION_IFACE]['Connection'] == self.path:
+            deactivateConnection(manager, active_path)
+
+    connections = settings.props[SETTINGS_IFACE]['Connections']
+    updateAvailableConnections(manager, self.path, self.settings, False)
+    settings.UpdateProperties(SETTINGS_IFACE, {'Connections': dbus.Array([c for c in connections if c != self.path], signature='o')})
+    self.EmitSignal(CSETTINGS_IFACE, 'Removed', '', [])
+    settings.EmitSignal(SETTINGS_IFACE, 'ConnectionRemoved', 'o', [dbus.ObjectPath(self.path)])
+    settings.RemoveObject(self.path)
+
+
+def setDeviceState(device, state, reason=NMDeviceStateReason.NM_DEVICE_STATE_REASON_NONE.value):
+    old_state = device.props[DEVICE_IFACE]['State']
+    device.UpdateProperties(DEVICE_IFACE, {'State': dbus.UInt32(state),
+                                           'StateReason': dbus.Struct((dbus.UInt32(state), dbus.UInt32(reason)), signature='uu')})
+    device.EmitSignal(DEVICE_IFACE, 'StateChanged', 'uuu', [dbus.UInt32(state), dbus.UInt32(old_state), dbus.UInt32(reason)])
+
+
+def setActiveConnectionState(active, state):
+    active.UpdateProperties(ACTIVE_CONNECTION_IFACE, {'State': dbus.UInt32(state)})
+    active.EmitSignal(ACTIVE_CONNECTION_IFACE, 'StateChanged', 'uu', [dbus.UInt32(state), dbus.UInt32(0)])
+
+
+def updateManagerState(manager):
+    active_connections = manager.props[MAIN_IFACE]['ActiveConnections']
+    activated = [path for path in active_connections
+                 if dbusmock.get_object(path).props[ACTIVE_CONNECTION_IFACE]['State'] == NMActiveConnectionState.NM_ACTIVE_CONNECTION_STATE_ACTIVATED.value]
+    if activated:
+        state = NMState.NM_STATE_CONNECTED_GLOBAL.value
+        connectivity = NMConnectivityState.NM_CONNECTIVITY_FULL.value
+        primary = activated[0]
+        primary_type = dbusmock.get_object(primary).props[ACTIVE_CONNECTION_IFACE]['Type']
+    else:
+        state = NMState.NM_STATE_CONNECTING.value if active_connections else NMState.NM_STATE_DISCONNECTED.value
+        connectivity = NMConnectivityState.NM_CONNECTIVITY_NONE.value
+        primary = '/'
+        primary_type = ''
+
+    old_state = manager.props[MAIN_IFACE]['State']
+    if old_state != state or manager.props[MAIN_IFACE]['PrimaryConnection'] != primary:
+        manager.UpdateProperties(MAIN_IFACE, {'State': dbus.UInt32(state),
+                                              'Connectivity': dbus.UInt32(connectivity),
+                                              'PrimaryConnection': dbus.ObjectPath(primary),
+                                              'PrimaryConnectionType': primary_type})
+    if old_state != state:
+        manager.EmitSignal(MAIN_IFACE, 'StateChanged', 'u', [dbus.UInt32(state)])
+
+
+def activateConnection(self, connection_path, device_path, specific_object):
+    if connection_path not in dbusmock.get_object(SETTINGS_OBJ).props[SETTINGS_IFACE]['Connections']:
+        raise dbus.exceptions.DBusException('Connection %s does not exist' % connection_path,
+                                            name='org.freedesktop.NetworkManager.UnknownConnection')
+    if device_path not in self.props[MAIN_IFACE]['AllDevices']:
+        raise dbus.exceptions.DBusException('Device %s does not exist' % device_path,
+                                            name='org.freedesktop.NetworkManager.UnknownDevice')
+
+    device = dbusmock.get_object(device_path)
+    settings = dbusmock.get_object(connection_path).settings
+    if connectionType(settings) != deviceConnectionType(device):
+        raise dbus.exceptions.DBusException('Connection %s is not compatible with device %s' % (connection_path, device_path),
+                                            name='org.freedesktop.NetworkManager.UnknownConnection')
+
+    # a device only has one active connection at a time
+    if device.props[DEVICE_IFACE]['ActiveConnection'] != '/':
+        deactivateConnection(self, device.props[DEVICE_IFACE]['ActiveConnection'])
+
+    if WIRELESS_DEVICE_IFACE in device.props and specific_object == '/':
+        if 'ssid' not in settings.get(WIRELESS_TYPE, {}):
+            raise dbus.exceptions.DBusException('%s.ssid: property is missing' % WIRELESS_TYPE,
+                                                name='org.freedesktop.NetworkManager.Settings.Connection.MissingProperty')
+        ssid = bytes(settings[WIRELESS_TYPE]['ssid'])
+        for ap_path in device.props[WIRELESS_DEVICE_IFACE]['AccessPoints']:
+            if bytes(dbusmock.get_object(ap_path).props[ACCESS_POINT_IFACE]['Ssid']) == ssid:
+                specific_object = ap_path
+                break
+        else:
+            raise dbus.exceptions.DBusException('No access point with SSID %s in range' % ssid.decode('UTF-8', 'replace'),
+                                                name='org.freedesktop.NetworkManager.UnknownConnection')
+
+    index = next(active_connection_index)
+    active_path = ACTIVE_CONNECTION_BASE_OBJ + str(index)
+    active_props = {'Connection': dbus.ObjectPath(connection_path), # o
+                    'SpecificObject': dbus.ObjectPath(specific_object), # o
+                    'Id': settings['connection']['id'], # s
+                    'Uuid': settings['connection']['uuid'], # s
+                    'Type': connectionType(settings), # s
+                    'Devices': dbus.Array([dbus.ObjectPath(device_path)], signature='o'), # ao
+                    'State': dbus.UInt32(NMActiveConnectionState.NM_ACTIVE_CONNECTION_STATE_ACTIVATING.value), # u
+                    'StateFlags': dbus.UInt32(0), # u
+                    'Default': dbus.Boolean(False), # b
+                    'Ip4Config': dbus.ObjectPath('/'), # o
+                    'Dhcp4Config': dbus.ObjectPath('/'), # o
+                    'Default6': dbus.Boolean(False), # b
+                    'Ip6Config': dbus.ObjectPath('/'), # o
+                    'Dhcp6Config': dbus.ObjectPath('/'), # o
+                    'Vpn': dbus.Boolean(False), # b
+                    'Master': dbus.ObjectPath('/')} # o
+    self.AddObject(active_path,
+                   ACTIVE_CONNECTION_IFACE,
+                   active_props,
+                   [])
+    active = dbusmock.get_object(active_path)
+    active.device = device
+    active.index = index
+
+    device.UpdateProperties(DEVICE_IFACE, {'ActiveConnection': dbus.ObjectPath(active_path)})
+    if WIRELESS_DEVICE_IFACE in device.props:
+        device.UpdateProperties(WIRELESS_DEVICE_IFACE, {'ActiveAccessPoint': dbus.ObjectPath(specific_object)})
+    setDeviceState(device, NMDeviceState.NM_DEVICE_STATE_PREPARE.value)
+    self.UpdateProperties(MAIN_IFACE, {'ActiveConnections': dbus.Array(self.props[MAIN_IFACE]['ActiveConnections'] + [dbus.ObjectPath(active_path)], signature='o'),
+                                       'ActivatingConnection': dbus.ObjectPath(active_path)})
+    updateManagerState(self)
+
+    active.activation_timer = active.add_timeout(self.activation_delay, connectionActivated, self, active)
+    return dbus.ObjectPath(active_path)
+
+
+def connectionActivated(manager, active):
+    active.activation_timer = 0
+    device = active.device
+    address = int.from_bytes(bytes([10, 42, active.index >> 8 & 0xff, active.index & 0xff]), 'little')
+    device.UpdateProperties(DEVICE_IFACE, {'Ip4Address': dbus.UInt32(address),
+                                           'Ip4Connectivity': dbus.UInt32(NMConnectivityState.NM_CONNECTIVITY_FULL.value)})
+    setDeviceState(device, NMDeviceState.NM_DEVICE_STATE_ACTIVATED.value)
+    active.UpdateProperties(ACTIVE_CONNECTION_IFACE, {'Default': dbus.Boolean(True)})
+    setActiveConnectionState(active, NMActiveConnectionState.NM_ACTIVE_CONNECTION_STATE_ACTIVATED.value)
+    manager.UpdateProperties(MAIN_IFACE, {'ActivatingConnection': dbus.ObjectPath('/')})
+    updateManagerState(manager)
+    return False
+
+
+def deactivateConnection(self, active_path):
+    if active_path not in self.props[MAIN_IFACE]['ActiveConnections']:
+        raise dbus.exceptions.DBusException('The connection was not active',
+                                            name='org.freedesktop.NetworkManager.ConnectionNotActive')
+
+    active = dbusmock.get_object(active_path)
+    device = active.device
+    setActiveConnectionState(active, NMActiveConnectionState.NM_ACTIVE_CONNECTION_STATE_DEACTIVATED.value)
+    self.RemoveObject(active_path)
+
+    device.UpdateProperties(DEVICE_IFACE, {'ActiveConnection': dbus.ObjectPath('/'),
+                                           'Ip4Address': dbus.UInt32(0),
+                                           'Ip4Connectivity': dbus.UInt32(NMConnectivityState.NM_CONNECTIVITY_NONE.value)})
+    if WIRELESS_DEVICE_IFACE in device.props:
+        device.UpdateProperties(WIRELESS_DEVICE_IFACE, {'ActiveAccessPoint': dbus.ObjectPath('/')})
+    setDeviceState(device, NMDeviceState.NM_DEVICE_STATE_DISCONNECTED.value, NMDeviceStateReason.NM_DEVICE_STATE_REASON_USER_REQUESTED.value)
+
+    update = {'ActiveConnections': dbus.Array([path for path in self.props[MAIN_IFACE]['ActiveConnections'] if path != active_path], signature='o')}
+    if self.props[MAIN_IFACE]['ActivatingConnection'] == active_path:
+        update['ActivatingConnection'] = dbus.ObjectPath('/')
+    self.UpdateProperties(MAIN_IFACE, update)
+    updateManagerState(self)
+
+
+def deviceDisconnect(self):
+    active_path = self.props[DEVICE_IFACE]['ActiveConnection']
+    if active_path == '/':
+        raise dbus.exceptions.DBusException('This device is not active',
+                                            name='org.freedesktop.NetworkManager.Device.NotActive')
+    deactivateConnection(self.manager, active_path)
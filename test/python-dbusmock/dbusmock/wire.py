@@ -0,0 +1,267 @@
+# coding: UTF-8
+'''D-Bus wire format (un)marshalling for dumps of mock data.
+
+This implements the little-endian D-Bus message body encoding from
+<https://dbus.freedesktop.org/doc/dbus-specification.html#message-protocol-marshaling>
+in pure Python, so that call logs and other dumps written by the mock can be
+read back for offline analysis without a bus.
+
+Unmarshalled values are plain Python types: integers, floats, bool, str,
+bytes (for "ay"), lists, dicts and tuples; variants are unwrapped.
+'''
+
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.  See http://www.gnu.org/copyleft/lgpl.html for the full text
+# of the license.
+
+import struct
+from typing import Any, BinaryIO, Iterator, List, Sequence
+
+# type code -> (struct format, alignment) for fixed size types
+_FIXED = {
+    'y': ('<B', 1),
+    'b': ('<I', 4),
+    'n': ('<h', 2),
+    'q': ('<H', 2),
+    'i': ('<i', 4),
+    'u': ('<I', 4),
+    'x': ('<q', 8),
+    't': ('<Q', 8),
+    'd': ('<d', 8),
+    'h': ('<I', 4),
+}
+
+_ALIGNMENT = {'s': 4, 'o': 4, 'g': 1, 'a': 4, '(': 8, '{': 8, 'v': 1}
+
+# dbus-python type name -> signature, for guessing variant contents
+_DBUS_TYPES = {
+    'Boolean': 'b', 'Byte': 'y', 'Int16': 'n', 'UInt16': 'q', 'Int32': 'i',
+    'UInt32': 'u', 'Int64': 'x', 'UInt64': 't', 'Double': 'd', 'UnixFd': 'h',
+    'ObjectPath': 'o', 'Signature': 'g', 'String': 's', 'ByteArray': 'ay',
+}
+
+
+def _type_end(signature: str, pos: int) -> int:
+    '''Return the end index of the single complete type starting at pos'''
+
+    code = signature[pos]
+    if code == 'a':
+        return _type_end(signature, pos + 1)
+    if code in '({':
+        close = ')' if code == '(' else '}'
+        pos += 1
+        while signature[pos] != close:
+            pos = _type_end(signature, pos)
+        return pos + 1
+    return pos + 1
+
+
+def split_signature(signature: str) -> List[str]:
+    '''Split a signature into its single complete types'''
+
+    types = []
+    pos = 0
+    while pos < len(signature):
+        end = _type_end(signature, pos)
+        types.append(signature[pos:end])
+        pos = end
+    return types
+
+
+def _alignment(type_code: str) -> int:
+    return _FIXED[type_code][1] if type_code in _FIXED else _ALIGNMENT[type_code]
+
+
+def guess_signature(value: Any) -> str:
+    '''Guess the D-Bus signature of a (dbus-python or plain Python) value'''
+
+    sig = _DBUS_TYPES.get(type(value).__name__)
+    if sig and type(value).__module__.startswith(('dbus', '_dbus')):
+        return sig
+    if getattr(value, 'signature', None) and isinstance(value, (list, dict)):
+        return ('a{' + value.signature + '}') if isinstance(value, dict) else ('a' + value.signature)
+    if isinstance(value, bool):
+        return 'b'
+    if isinstance(value, int):
+        return 'i' if -2 ** 31 <= value < 2 ** 31 else 'x'
+    if isinstance(value, float):
+        return 'd'
+    if isinstance(value, str):
+        return 's'
+    if isinstance(value, (bytes, bytearray)):
+        return 'ay'
+    if isinstance(value, dict):
+        key = guess_signature(next(iter(value))) if value else 's'
+        return 'a{' + key + 'v}'
+    if isinstance(value, list):
+        return 'av'
+    if isinstance(value, tuple) and value:
+        return '(' + ''.join(guess_signature(v) for v in value) + ')'
+    raise TypeError(f'cannot guess D-Bus signature of {type(value)}')
+
+
+class Marshaller:
+    '''Incrementally marshal values into a message body'''
+
+    def __init__(self) -> None:
+        self.buf = bytearray()
+
+    def write_values(self, signature: str, values: Sequence[Any]) -> None:
+        '''Append values according to signature'''
+
+        for sig, value in zip(split_signature(signature), values):
+            self.write(sig, value)
+
+    def align(self, n: int) -> None:
+        self.buf.extend(b'\0' * (-len(self.buf) % n))
+
+    def write(self, sig: str, value: Any) -> None:
+        code = sig[0]
+        if code in _FIXED:
+            fmt, align = _FIXED[code]
+            self.align(align)
+            self.buf.extend(struct.pack(fmt, bool(value) if code == 'b' else value))
+        elif code in 'so':
+            data = str(value).encode('UTF-8')
+            self.align(4)
+            self.buf.extend(struct.pack('<I', len(data)) + data + b'\0')
+        elif code == 'g':
+            data = str(value).encode('ASCII')
+            self.buf.extend(struct.pack('<B', len(data)) + data + b'\0')
+        elif code == 'v':
+            inner = guess_signature(value)
+            self.write('g', inner)
+            self.write(inner, value)
+        elif code == '(':
+            self.align(8)
+            for member_sig, member in zip(split_signature(sig[1:-1]), value):
+                self.write(member_sig, member)
+        elif code == 'a':
+            self._write_array(sig[1:], value)
+        else:
+            raise TypeError(f'cannot marshal D-Bus type {sig}')
+
+    def _write_array(self, element: str, value: Any) -> None:
+        self.align(4)
+        length_pos = len(self.buf)
+        self.buf.extend(b'\0\0\0\0')
+        # padding to the first element is not part of the array length
+        self.align(_alignment(element[0]))
+        start = len(self.buf)
+        if element[0] == '{':
+            key_sig, value_sig = split_signature(element[1:-1])
+            for k, v in value.items():
+                self.align(8)
+                self.write(key_sig, k)
+                self.write(value_sig, v)
+        elif element == 'y' and isinstance(value, (bytes, bytearray)):
+            self.buf.extend(value)
+        else:
+            for v in value:
+                self.write(element, v)
+        struct.pack_into('<I', self.buf, length_pos, len(self.buf) - start)
+
+
+class Unmarshaller:
+    '''Incrementally unmarshal values from a message body'''
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.pos = 0
+
+    def read_values(self, signature: str) -> List[Any]:
+        '''Read the next values according to signature'''
+
+        return [self.read(sig) for sig in split_signature(signature)]
+
+    def align(self, n: int) -> None:
+        self.pos += -self.pos % n
+
+    def read(self, sig: str) -> Any:
+        code = sig[0]
+        if code in _FIXED:
+            fmt, align = _FIXED[code]
+            self.align(align)
+            (value,) = struct.unpack_from(fmt, self.data, self.pos)
+            self.pos += struct.calcsize(fmt)
+            return bool(value) if code == 'b' else value
+        if code in 'so':
+            self.align(4)
+            (length,) = struct.unpack_from('<I', self.data, self.pos)
+            value = bytes(self.data[self.pos + 4:self.pos + 4 + length]).decode('UTF-8')
+            self.pos += length + 5
+            return value
+        if code == 'g':
+            length = self.data[self.pos]
+            value = bytes(self.data[self.pos + 1:self.pos + 1 + length]).decode('ASCII')
+            self.pos += length + 2
+            return value
+        if code == 'v':
+            return self.read(self.read('g'))
+        if code == '(':
+            self.align(8)
+            return tuple(self.read(member_sig) for member_sig in split_signature(sig[1:-1]))
+        if code == 'a':
+            return self._read_array(sig[1:])
+        raise TypeError(f'cannot unmarshal D-Bus type {sig}')
+
+    def _read_array(self, element: str) -> Any:
+        self.align(4)
+        (length,) = struct.unpack_from('<I', self.data, self.pos)
+        self.pos += 4
+        self.align(_alignment(element[0]))
+        end = self.pos + length
+        if element == 'y':
+            self.pos = end
+            return bytes(self.data[end - length:end])
+        if element[0] == '{':
+            key_sig, value_sig = split_signature(element[1:-1])
+            result = {}
+            while self.pos < end:
+                self.align(8)
+                key = self.read(key_sig)
+                result[key] = self.read(value_sig)
+            return result
+        items = []
+        while self.pos < end:
+            items.append(self.read(element))
+        return items
+
+
+def marshal(signature: str, values: Sequence[Any]) -> bytes:
+    '''Marshal values according to signature into a message body'''
+
+    marshaller = Marshaller()
+    marshaller.write_values(signature, values)
+    return bytes(marshaller.buf)
+
+
+def unmarshal(signature: str, data: bytes) -> List[Any]:
+    '''Unmarshal a message body with the given signature into a list of values'''
+
+    return Unmarshaller(data).read_values(signature)
+
+
+def frame(body: bytes) -> bytes:
+    '''Prefix a message body with its length, for writing it to a stream'''
+
+    return struct.pack('<I', len(body)) + body
+
+
+def iter_frames(f: BinaryIO) -> Iterator[bytes]:
+    '''Lazily iterate over the frame bodies in a stream
+
+    A frame which is cut short, e. g. by a writer which is still running or got
+    killed, ends the iteration.
+    '''
+    while True:
+        header = f.read(4)
+        if len(header) < 4:
+            return
+        (length,) = struct.unpack('<I', header)
+        body = f.read(length)
+        if len(body) < length:
+            return
+        yield body
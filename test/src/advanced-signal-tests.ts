@@ -0,0 +1,53 @@
+import { Modem, ModemManager, AdvancedSignal, ModemManagerTypes } from '../../src/index';
+import * as dbus from 'dbus';
+import { TestContext } from './hooks';
+import { expect } from 'chai';
+import { filter, first } from 'rxjs/operators';
+
+describe('AdvancedSignal tests', () => {
+
+    it('AdvancedSignal exists when it should', async function(this: TestContext) {
+        let advancedSignal = await (this.modem0?.getAdvancedSignal());
+
+        expect(advancedSignal).to.exist;
+    });
+
+    it('AdvancedSignal properties exist', async function(this: TestContext) {
+        let advancedSignal = await (this.modem0?.getAdvancedSignal());
+
+        expect(advancedSignal?.properties.Lte).to.have.property('rssi');
+        expect(advancedSignal?.properties.Nr5g).to.have.property('rsrp');
+        expect(advancedSignal?.properties.Umts).to.have.property('rscp');
+    });
+
+    it('setupPolling() updates the Rate property and starts updates', async function(this: TestContext) {
+        this.timeout(5000);
+        let advancedSignal = await (this.modem0?.getAdvancedSignal());
+
+        let updated = advancedSignal?.properties$.pipe(
+            filter(properties => properties.Rate === 1),
+            first()
+        ).toPromise();
+        await advancedSignal?.setupPolling(1);
+        await updated;
+
+        expect(advancedSignal?.properties.Rate).to.equal(1);
+
+        await advancedSignal?.setupPolling(0);
+    });
+
+    it('setupThreshold() updates the threshold properties', async function(this: TestContext) {
+        let advancedSignal = await (this.modem0?.getAdvancedSignal());
+
+        let updated = advancedSignal?.properties$.pipe(
+            filter(properties => properties.RssiThreshold === 5),
+            first()
+        ).toPromise();
+        await advancedSignal?.setupThreshold(5, true);
+        await updated;
+
+        expect(advancedSignal?.properties.ErrorRateThreshold).to.be.true;
+
+        await advancedSignal?.setupThreshold(0, false);
+    });
+});
@@ -0,0 +1,39 @@
+import { Modem, ModemManager, Bearer, ModemManagerTypes } from '../../src/index';
+import * as dbus from 'dbus';
+import { TestContext } from './hooks';
+import { expect } from 'chai';
+import { filter, first } from 'rxjs/operators';
+
+describe('Bearer tests', () => {
+
+    it('callCreateBearer() creates a disconnected bearer', async function(this: TestContext) {
+        let bearer = await this.modem0?.callCreateBearer({});
+
+        expect(bearer?.properties.Connected).to.be.false;
+        expect(bearer?.properties.Interface).to.equal('');
+
+        await this.modem0?.callDeleteBearer(this.modem0?.properties.Bearers[this.modem0?.properties.Bearers.length - 1]);
+    });
+
+    it('callConnect() connects the bearer and updates Stats', async function(this: TestContext) {
+        this.timeout(5000);
+        let bearer = await this.modem0?.callCreateBearer({});
+
+        await bearer?.callConnect();
+        let updated = bearer?.properties$.pipe(
+            filter(properties => properties.Stats != null && properties.Stats['duration'] > 0),
+            first()
+        ).toPromise();
+        let properties = await updated;
+
+        expect(properties?.Connected).to.be.true;
+        expect(properties?.Interface).to.equal('wwx000011121314');
+        expect(properties?.Ip4Config).to.have.property('address');
+        expect(properties?.Stats['rx-bytes']).to.be.above(0);
+
+        await bearer?.callDisconnect();
+        expect(bearer?.properties.Connected).to.be.false;
+
+        await this.modem0?.callDeleteBearer(this.modem0?.properties.Bearers[this.modem0?.properties.Bearers.length - 1]);
+    });
+});
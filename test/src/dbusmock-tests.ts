@@ -0,0 +1,243 @@
+import * as util from '../../src/util';
+import * as dbus from 'dbus';
+import { execFileSync } from 'child_process';
+import * as fs from 'fs';
+import * as os from 'os';
+import * as path from 'path';
+import { TestContext } from './hooks';
+import { expect } from 'chai';
+
+const SERVICE = 'org.freedesktop.ModemManager1';
+const MANAGER_PATH = '/org/freedesktop/ModemManager1';
+// the template's GetManagedObjects only lists objects below Modem/
+const TEST_PATH = '/org/freedesktop/ModemManager1/Modem/MockTest';
+const TEST_IFACE = 'org.example.MockTest';
+const MODEM0_PATH = '/org/freedesktop/ModemManager1/Modem/0';
+
+// node-dbus cannot receive file descriptors, so dumps get read with dbus-python, which the mock runs on anyway
+const DUMP_READER = [
+    'import os, sys, dbus',
+    `proxy = dbus.SystemBus().get_object('${SERVICE}', sys.argv[2])`,
+    "fd = proxy.get_dbus_method(sys.argv[1], 'org.freedesktop.DBus.Mock')().take()",
+    "with os.fdopen(fd, 'rb') as f:",
+    '    sys.stdout.buffer.write(f.read())'
+].join('\n');
+
+function readDump(methodName: string, objectPath: string): Buffer {
+    return execFileSync('python3', ['-c', DUMP_READER, methodName, objectPath]);
+}
+
+async function mockInterface(bus: dbus.DBusConnection, objectPath: string): Promise<dbus.DBusInterface> {
+    return util.objectInterface(bus, SERVICE, objectPath, 'org.freedesktop.DBus.Mock');
+}
+
+async function callError(objectInterface: dbus.DBusInterface, methodName: string, ...args: any[]): Promise<string> {
+    try {
+        await util.call(objectInterface, methodName, {}, ...args);
+    } catch(err) {
+        return `${err}`;
+    }
+    throw new Error(`${methodName} did not fail`);
+}
+
+async function managedObjects(bus: dbus.DBusConnection): Promise<any> {
+    let objectManager = await util.objectInterface(bus, SERVICE, MANAGER_PATH, 'org.freedesktop.DBus.ObjectManager');
+    return util.call(objectManager, 'GetManagedObjects', {});
+}
+
+describe('dbusmock memoization tests', () => {
+
+    it('memoized GetManagedObjects follows AddObject and RemoveObject', async function(this: TestContext) {
+        let mock = await mockInterface(this.bus, MANAGER_PATH);
+
+        expect(await managedObjects(this.bus)).to.not.have.property(TEST_PATH);
+
+        await util.call(mock, 'AddObject', {}, TEST_PATH, TEST_IFACE, {Value: 'a'}, []);
+        let objects = await managedObjects(this.bus);
+        expect(objects[TEST_PATH][TEST_IFACE].Value).to.equal('a');
+
+        await util.call(mock, 'RemoveObject', {}, TEST_PATH);
+        expect(await managedObjects(this.bus)).to.not.have.property(TEST_PATH);
+    });
+
+    it('memoized GetManagedObjects follows Set', async function(this: TestContext) {
+        let mock = await mockInterface(this.bus, MANAGER_PATH);
+        await util.call(mock, 'AddObject', {}, TEST_PATH, TEST_IFACE, {Value: 'a'}, []);
+        let properties = await util.objectInterface(this.bus, SERVICE, TEST_PATH, 'org.freedesktop.DBus.Properties');
+
+        expect((await managedObjects(this.bus))[TEST_PATH][TEST_IFACE].Value).to.equal('a');
+        await util.call(properties, 'Set', {}, TEST_IFACE, 'Value', 'b');
+        expect((await managedObjects(this.bus))[TEST_PATH][TEST_IFACE].Value).to.equal('b');
+
+        await util.call(mock, 'RemoveObject', {}, TEST_PATH);
+    });
+
+    it('memoized GetManagedObjects follows AddMethod', async function(this: TestContext) {
+        let mock = await mockInterface(this.bus, MANAGER_PATH);
+        await util.call(mock, 'AddObject', {}, TEST_PATH, TEST_IFACE, {Value: 'a'}, []);
+        let testMock = await mockInterface(this.bus, TEST_PATH);
+
+        expect((await managedObjects(this.bus))[TEST_PATH]).to.not.have.property('org.example.MockTestMethods');
+        await util.call(testMock, 'AddMethod', {}, 'org.example.MockTestMethods', 'Ping', '', '', '');
+        expect((await managedObjects(this.bus))[TEST_PATH]['org.example.MockTestMethods']).to.deep.equal({});
+
+        await util.call(mock, 'RemoveObject', {}, TEST_PATH);
+    });
+});
+
+describe('dbusmock fleet tests', () => {
+    const fleetFile = path.join(os.tmpdir(), 'chadburn-test-fleet.json');
+    const fleetPath = '/org/example/Fleet/0';
+
+    afterEach(() => {
+        fs.rmSync(fleetFile, {force: true});
+    });
+
+    it('LoadFleet adds objects with typed properties and canned replies', async function(this: TestContext) {
+        fs.writeFileSync(fleetFile, JSON.stringify({
+            objects: {
+                [fleetPath]: {
+                    'org.example.Fleet': {
+                        properties: {Name: ['s', 'fleet0'], Count: ['u', 3]},
+                        methods: {GetName: {out: 's', return: ['fleet0']}}
+                    }
+                }
+            }
+        }));
+        let mock = await mockInterface(this.bus, MANAGER_PATH);
+
+        let paths = await util.call(mock, 'LoadFleet', {}, fleetFile, false);
+        expect(paths).to.deep.equal([fleetPath]);
+
+        let fleetInterface = await util.objectInterface(this.bus, SERVICE, fleetPath, 'org.example.Fleet');
+        let properties = await util.getAllProperties(fleetInterface);
+        expect(properties).to.deep.equal({Name: 'fleet0', Count: 3});
+        expect(await util.call(fleetInterface, 'GetName', {})).to.equal('fleet0');
+
+        await util.call(mock, 'RemoveObject', {}, fleetPath);
+    });
+
+    it('LoadFleet rejects an invalid property signature', async function(this: TestContext) {
+        fs.writeFileSync(fleetFile, JSON.stringify({
+            objects: {[fleetPath]: {'org.example.Fleet': {properties: {Name: ['', 1]}}}}
+        }));
+        let mock = await mockInterface(this.bus, MANAGER_PATH);
+
+        let error = await callError(mock, 'LoadFleet', fleetFile, false);
+        expect(error).to.contain('Cannot load fleet');
+        expect(error).to.contain('not a valid D-Bus single complete type');
+    });
+
+    it('LoadFleet rejects a description which is not an object', async function(this: TestContext) {
+        fs.writeFileSync(fleetFile, JSON.stringify([fleetPath]));
+        let mock = await mockInterface(this.bus, MANAGER_PATH);
+
+        let error = await callError(mock, 'LoadFleet', fleetFile, false);
+        expect(error).to.contain('Cannot load fleet');
+        expect(error).to.contain('must be a JSON object');
+    });
+});
+
+describe('dbusmock call log tests', () => {
+
+    it('WaitForCall returns once a matching call is logged', async function(this: TestContext) {
+        let mock = await mockInterface(this.bus, MODEM0_PATH);
+        let simple = await util.objectInterface(this.bus, SERVICE, MODEM0_PATH, 'org.freedesktop.ModemManager1.Modem.Simple');
+        await util.call(mock, 'ClearCalls', {});
+
+        let waiting = util.call(mock, 'WaitForCall', {}, 'GetStatus', [], 5000);
+        setTimeout(() => util.call(simple, 'GetStatus', {}), 100);
+        let [timestamp, args] = await waiting;
+
+        expect(timestamp).to.be.above(0);
+        expect(args).to.deep.equal([]);
+    });
+
+    it('WaitForCall times out without a matching call', async function(this: TestContext) {
+        let mock = await mockInterface(this.bus, MODEM0_PATH);
+        await util.call(mock, 'ClearCalls', {});
+
+        let error = await callError(mock, 'WaitForCall', 'Enable', [], 100);
+        expect(error).to.contain('timed out waiting for call of Enable');
+    });
+
+    it('GetCallsSince continues after the last returned call', async function(this: TestContext) {
+        let mock = await mockInterface(this.bus, MODEM0_PATH);
+        let simple = await util.objectInterface(this.bus, SERVICE, MODEM0_PATH, 'org.freedesktop.ModemManager1.Modem.Simple');
+        await util.call(mock, 'ClearCalls', {});
+        await util.call(simple, 'GetStatus', {});
+
+        let calls = await util.call(mock, 'GetCallsSince', {}, 0, 'GetStatus', 0);
+        expect(calls).to.have.lengthOf(1);
+        let [sequence, , method] = calls[0];
+        expect(method).to.equal('GetStatus');
+
+        expect(await util.call(mock, 'GetCallsSince', {}, sequence, 'GetStatus', 0)).to.be.empty;
+        await util.call(simple, 'GetStatus', {});
+        let newCalls = await util.call(mock, 'GetCallsSince', {}, sequence, 'GetStatus', 0);
+        expect(newCalls).to.have.lengthOf(1);
+        expect(newCalls[0][0]).to.be.above(sequence);
+    });
+
+    it('DumpCalls returns the logged calls', async function(this: TestContext) {
+        let mock = await mockInterface(this.bus, MODEM0_PATH);
+        let simple = await util.objectInterface(this.bus, SERVICE, MODEM0_PATH, 'org.freedesktop.ModemManager1.Modem.Simple');
+        await util.call(mock, 'ClearCalls', {});
+        await util.call(simple, 'GetStatus', {});
+
+        let dump = readDump('DumpCalls', MODEM0_PATH);
+        expect(dump.subarray(0, 16).toString()).to.equal('DBUSMOCK-CALLS-1');
+        expect(dump.includes('GetStatus')).to.be.true;
+    });
+
+    it('DumpState returns the properties of the mock objects', function(this: TestContext) {
+        let dump = readDump('DumpState', MODEM0_PATH);
+
+        expect(dump.subarray(0, 16).toString()).to.equal('DBUSMOCK-STATE-1');
+        expect(dump.includes(MODEM0_PATH)).to.be.true;
+        expect(dump.includes('HarborDigital')).to.be.true;
+    });
+});
+
+describe('dbusmock paging and property version tests', () => {
+
+    it('GetManagedObjectsPaged pages join up to the GetManagedObjects reply', async function(this: TestContext) {
+        let mock = await mockInterface(this.bus, MANAGER_PATH);
+        let objectManager = await util.objectInterface(this.bus, SERVICE, MANAGER_PATH, 'org.freedesktop.DBus.ObjectManager');
+        await util.call(mock, 'AddObject', {}, TEST_PATH, TEST_IFACE, {Value: 'a'}, []);
+        await util.call(mock, 'AddObject', {}, TEST_PATH + '2', TEST_IFACE, {Value: 'b'}, []);
+
+        let joined: any = {};
+        let pages = 0;
+        let cursor = '';
+        do {
+            let [objects, nextCursor] = await util.call(objectManager, 'GetManagedObjectsPaged', {}, cursor, 1);
+            Object.assign(joined, objects);
+            cursor = nextCursor;
+            pages++;
+        } while(cursor);
+
+        expect(pages).to.equal(3);
+        expect(joined).to.deep.equal(await managedObjects(this.bus));
+
+        await util.call(mock, 'RemoveObject', {}, TEST_PATH);
+        await util.call(mock, 'RemoveObject', {}, TEST_PATH + '2');
+    });
+
+    it('GetPropertiesSince only returns properties changed after a version', async function(this: TestContext) {
+        let mock = await mockInterface(this.bus, MANAGER_PATH);
+        await util.call(mock, 'AddObject', {}, TEST_PATH, TEST_IFACE, {Value: 'a', Other: 'x'}, []);
+        let testMock = await mockInterface(this.bus, TEST_PATH);
+        let properties = await util.objectInterface(this.bus, SERVICE, TEST_PATH, 'org.freedesktop.DBus.Properties');
+
+        let [version, all] = await util.call(testMock, 'GetPropertiesSince', {}, '', 0);
+        expect(all).to.deep.equal({Value: 'a', Other: 'x'});
+
+        await util.call(properties, 'Set', {}, TEST_IFACE, 'Value', 'b');
+        let [newVersion, changed] = await util.call(testMock, 'GetPropertiesSince', {}, '', version);
+        expect(newVersion).to.be.above(version);
+        expect(changed).to.deep.equal({Value: 'b'});
+
+        await util.call(mock, 'RemoveObject', {}, TEST_PATH);
+    });
+});
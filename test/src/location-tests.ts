@@ -0,0 +1,52 @@
+import { Modem, ModemManager, Location, ModemManagerTypes } from '../../src/index';
+import * as dbus from 'dbus';
+import { TestContext } from './hooks';
+import { expect } from 'chai';
+import { filter, first } from 'rxjs/operators';
+
+describe('Location tests', () => {
+
+    it('Location exists when it should', async function(this: TestContext) {
+        let location = await (this.modem0?.getLocation());
+
+        expect(location).to.exist;
+    });
+
+    it('Location properties exist', async function(this: TestContext) {
+        let location = await (this.modem0?.getLocation());
+
+        expect(location?.properties).to.have.property('Capabilities');
+        expect(location?.properties.GpsRefreshRate).to.equal(30);
+    });
+
+    it('getLocation() returns the enabled sources', async function(this: TestContext) {
+        let location = await (this.modem0?.getLocation());
+
+        await location?.setup(ModemManagerTypes.ModemLocationSource.MM_MODEM_LOCATION_SOURCE_3GPP_LAC_CI | ModemManagerTypes.ModemLocationSource.MM_MODEM_LOCATION_SOURCE_GPS_NMEA);
+        let current = await location?.getLocation();
+
+        expect(current).to.have.property(`${ModemManagerTypes.ModemLocationSource.MM_MODEM_LOCATION_SOURCE_3GPP_LAC_CI}`).that.matches(/^310,410,/);
+        expect(current).to.have.property(`${ModemManagerTypes.ModemLocationSource.MM_MODEM_LOCATION_SOURCE_GPS_NMEA}`).that.matches(/^\$GPGGA,/);
+        expect(current).to.not.have.property(`${ModemManagerTypes.ModemLocationSource.MM_MODEM_LOCATION_SOURCE_GPS_RAW}`);
+
+        await location?.setup(ModemManagerTypes.ModemLocationSource.MM_MODEM_LOCATION_SOURCE_NONE);
+    });
+
+    it('setup() with signal_location publishes GPS fixes', async function(this: TestContext) {
+        this.timeout(5000);
+        let location = await (this.modem0?.getLocation());
+
+        await location?.setGpsRefreshRate(0);
+        let updated = location?.properties$.pipe(
+            filter(properties => properties.Location != null && `${ModemManagerTypes.ModemLocationSource.MM_MODEM_LOCATION_SOURCE_GPS_RAW}` in properties.Location),
+            first()
+        ).toPromise();
+        await location?.setup(ModemManagerTypes.ModemLocationSource.MM_MODEM_LOCATION_SOURCE_GPS_RAW, true);
+        let properties = await updated;
+
+        expect((properties?.Location as any)[ModemManagerTypes.ModemLocationSource.MM_MODEM_LOCATION_SOURCE_GPS_RAW]).to.have.property('latitude');
+
+        await location?.setup(ModemManagerTypes.ModemLocationSource.MM_MODEM_LOCATION_SOURCE_NONE);
+        await location?.setGpsRefreshRate(30);
+    });
+});
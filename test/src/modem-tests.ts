@@ -1,7 +1,9 @@
 import { Modem, ModemManager, ModemManagerTypes } from '../../src/index';
+import * as util from '../../src/util';
 import * as dbus from 'dbus';
 import { expect } from 'chai';
 import { TestContext } from './hooks';
+import { distinctUntilChanged, filter, first, map } from 'rxjs/operators';
 
 describe('Modem tests', () => {
 
@@ -87,4 +89,42 @@ describe('Modem tests', () => {
         let prettyProperties = this.modem0?.prettyProperties;
         expect(prettyProperties.SupportedIpFamilies).to.deep.equal([ 'MM_BEARER_IP_FAMILY_IPV4', 'MM_BEARER_IP_FAMILY_IPV6', 'MM_BEARER_IP_FAMILY_IPV4V6' ]);
     });
-});
\ No newline at end of file
+
+    it('GetAll returns the object path properties of the modem', async function(this: TestContext) {
+        let modemInterface = await util.objectInterface(this.bus, 'org.freedesktop.ModemManager1', '/org/freedesktop/ModemManager1/Modem/0', 'org.freedesktop.ModemManager1.Modem');
+        let properties = await util.getAllProperties(modemInterface);
+
+        expect(properties.Sim).to.equal('/org/freedesktop/ModemManager1/SIM/0');
+        expect(properties.SimSlots).to.deep.equal(['/org/freedesktop/ModemManager1/SIM/0']);
+    });
+
+    it('callEnable() moves the modem through the enable and registration states', async function(this: TestContext) {
+        this.timeout(10000);
+        let states: number[] = [];
+        let subscription = this.modem0?.properties$.pipe(
+            map(properties => properties.State),
+            distinctUntilChanged()
+        ).subscribe(state => states.push(state));
+
+        await this.modem0?.callEnable(false);
+        expect(this.modem0?.properties.State).to.equal(ModemManagerTypes.ModemState.MM_MODEM_STATE_DISABLED);
+
+        let registered = this.modem0?.properties$.pipe(
+            filter(properties => properties.State === ModemManagerTypes.ModemState.MM_MODEM_STATE_REGISTERED),
+            first()
+        ).toPromise();
+        await this.modem0?.callEnable(true);
+        await registered;
+        subscription?.unsubscribe();
+
+        expect(states).to.deep.equal([
+            ModemManagerTypes.ModemState.MM_MODEM_STATE_REGISTERED,
+            ModemManagerTypes.ModemState.MM_MODEM_STATE_DISABLING,
+            ModemManagerTypes.ModemState.MM_MODEM_STATE_DISABLED,
+            ModemManagerTypes.ModemState.MM_MODEM_STATE_ENABLING,
+            ModemManagerTypes.ModemState.MM_MODEM_STATE_ENABLED,
+            ModemManagerTypes.ModemState.MM_MODEM_STATE_SEARCHING,
+            ModemManagerTypes.ModemState.MM_MODEM_STATE_REGISTERED
+        ]);
+    });
+});
@@ -16,4 +16,15 @@ describe('Modem3gpp tests', () => {
 
         expect(modem3gpp?.properties).to.exist;
     });
+
+    it('scan() returns the available networks', async function(this: TestContext) {
+        this.timeout(10000);
+        let modem3gpp = await (this.modem0?.getModem3gpp());
+
+        let networks: any[] = await modem3gpp!.scan();
+
+        expect(networks.length).to.be.above(100);
+        expect(networks[0]).to.have.all.keys('status', 'operator-long', 'operator-short', 'operator-code', 'access-technology');
+        expect(networks.filter(network => network['status'] === ModemManagerTypes.Modem3gppNetworkAvailability.MM_MODEM_3GPP_NETWORK_AVAILABILITY_CURRENT)).to.have.lengthOf(1);
+    });
 });
\ No newline at end of file
@@ -0,0 +1,50 @@
+import { NetworkManager, NetworkManagerTypes } from '../../src/index';
+import * as util from '../../src/util';
+import * as dbus from 'dbus';
+import { TestContext } from './hooks';
+import { expect } from 'chai';
+import { filter, first } from 'rxjs/operators';
+
+describe('NetworkManager tests', () => {
+
+    it('NetworkManager lists the mock devices', async function(this: TestContext) {
+        let networkManager = await NetworkManager.init(this.bus);
+
+        expect(networkManager.properties.AllDevices).to.have.lengthOf(2);
+    });
+
+    it('WifiDevice has access points', async function(this: TestContext) {
+        let networkManager = await NetworkManager.init(this.bus);
+        let wifiDevices = await networkManager.wifiDevices();
+
+        expect(wifiDevices).to.have.lengthOf(1);
+        expect(Object.keys(wifiDevices[0].accessPoints)).to.have.lengthOf(5);
+        expect(Object.values(wifiDevices[0].accessPoints)[0].Ssid).to.match(/^mock-ap-/);
+    });
+
+    it('ConnectionSettingsManager loads the saved connection profiles', async function(this: TestContext) {
+        let networkManager = await NetworkManager.init(this.bus);
+        let connectionSettingsManager = await networkManager.connectionSettingsManager();
+
+        expect(Object.keys(connectionSettingsManager.connectionProfiles)).to.have.lengthOf(4);
+    });
+
+    it('ActivateConnection activates a wired connection profile', async function(this: TestContext) {
+        this.timeout(5000);
+        let networkManager = await NetworkManager.init(this.bus);
+        let managerInterface = await util.objectInterface(this.bus, 'org.freedesktop.NetworkManager', '/org/freedesktop/NetworkManager', 'org.freedesktop.NetworkManager');
+        let connected = networkManager.properties$.pipe(
+            filter(properties => properties.State === NetworkManagerTypes.NetworkManagerState.CONNECTED_GLOBAL),
+            first()
+        ).toPromise();
+
+        let devicePath = await util.call(managerInterface, 'GetDeviceByIpIface', {}, 'eth0');
+        let activePath = await util.call(managerInterface, 'ActivateConnection', {}, '/org/freedesktop/NetworkManager/Settings/1', devicePath, '/');
+        let properties = await connected;
+
+        expect(activePath).to.match(/^\/org\/freedesktop\/NetworkManager\/ActiveConnection\//);
+        expect(properties?.PrimaryConnection).to.equal(activePath);
+
+        await util.call(managerInterface, 'DeactivateConnection', {}, activePath);
+    });
+});